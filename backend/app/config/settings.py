@@ -45,6 +45,10 @@ version = os.getenv("version_BIZ")
 
 # SAM.GOV
 SAM_API_KEY = os.getenv("SAMAPIKEY")
+# On-disk (SQLite) cache of fetched SAM.gov notice descriptions; persisted between CI runs via actions/cache
+SAM_DESCRIPTION_CACHE_PATH=os.getenv("SAM_DESCRIPTION_CACHE_PATH_BIZ", os.path.join(os.path.expanduser("~"), ".cache", "bizradar", "sam_descriptions.sqlite3"))
+# Cached descriptions older than this are fetched again
+SAM_DESCRIPTION_CACHE_TTL_DAYS=int(os.getenv("SAM_DESCRIPTION_CACHE_TTL_DAYS_BIZ", "14"))
 
 
 #DB
@@ -53,15 +57,35 @@ DB_PORT=os.getenv("DBPORTBIZ")
 DB_NAME=os.getenv("DBNAMEBIZ")
 DB_USER=os.getenv("DBUSERBIZ")
 DB_PASSWORD=os.getenv("DBPASSWORDBIZ")
+# Upper bound on connections held by the shared psycopg2 pool (utils.db_utils.get_db_pool)
+DB_POOL_MAX_CONNECTIONS=int(os.getenv("DB_POOL_MAX_CONNECTIONS_BIZ", "5"))
 
 #AI
 OPENAI_API_KEY=os.getenv("OPENAIAPIKEYBIZ")
+# Connection pool shared by every OpenAI call in the process (utils.openai_client)
+OPENAI_MAX_CONNECTIONS=int(os.getenv("OPENAI_MAX_CONNECTIONS_BIZ", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS_BIZ", "20"))
+OPENAI_KEEPALIVE_EXPIRY=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_BIZ", "60"))
+OPENAI_TIMEOUT=float(os.getenv("OPENAI_TIMEOUT_BIZ", "60"))
+# Multiplex requests over HTTP/2 when the h2 package is installed
+OPENAI_HTTP2=os.getenv("OPENAI_HTTP2_BIZ", "true").lower() == "true"
 
 #VECTOR DB
 PINECONE_API_KEY=os.getenv("PINECONEAPIKEYBIZ");
 PINECONE_ENV=os.getenv("PINECONEENVBIZ")
 PINECONE_INDEX_NAME=os.getenv("PINECONEINDEXNAMEBIZ")
 EMBEDDING_MODEL=os.getenv("EMBEDDINGMODELBIZ")
+# When to load the local query-embedding model: "lifespan" (app startup), "import"
+# (module import, so `gunicorn --preload` loads it once before forking) or "off" (lazy)
+EMBEDDING_PRELOAD=os.getenv("EMBEDDING_PRELOAD_BIZ", "lifespan").lower()
+# Back model weights with an mmapped file so worker processes share one copy via the page cache
+EMBEDDING_MMAP_WEIGHTS=os.getenv("EMBEDDING_MMAP_WEIGHTS_BIZ", "true").lower() == "true"
+# Query-embedding inference backend: "torch" (sentence-transformers) or "onnx" (ONNX Runtime, CPU)
+EMBEDDING_BACKEND=os.getenv("EMBEDDING_BACKEND_BIZ", "torch").lower()
+# With the onnx backend, serve the int8 dynamically quantized graph
+EMBEDDING_ONNX_QUANTIZE=os.getenv("EMBEDDING_ONNX_QUANTIZE_BIZ", "true").lower() == "true"
+EMBEDDING_ONNX_THREADS=int(os.getenv("EMBEDDING_ONNX_THREADS_BIZ", "0"))
+EMBEDDING_WEIGHTS_CACHE_DIR=os.getenv("EMBEDDING_WEIGHTS_CACHE_DIR_BIZ", os.path.join(os.path.expanduser("~"), ".cache", "bizradar", "weights"))
 
 #GITHUB
 GITHUB_TOKEN=os.getenv("GITHUB_TOKEN")
@@ -27,22 +27,36 @@ from app.routes.reports_routes import router as reports_router
 from app.routes.responses_routes import router as responses_router
 from app.routes.rfp_usage_routes import router as rfp_usage_router
 from app.utils.logger import get_logger
+from app.utils.openai_client import close_openai_clients
 from app.services.parse_website import parse_company_website_mcp
+from app.config.settings import EMBEDDING_PRELOAD
+from app.utils.sentence_transformer import preload_model, get_model_metrics
 import asyncio
 
 
+# Load weights in the master process so forked workers share them copy-on-write
+if EMBEDDING_PRELOAD == "import":
+    preload_model()
+
+
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
+        if EMBEDDING_PRELOAD in ("lifespan", "import"):
+            try:
+                await asyncio.to_thread(preload_model)
+            except Exception as e:
+                # Search falls back to lazy loading on first use
+                get_logger(__name__).exception(f"Embedding model preload failed: {e}")
         await start_consumer_loop()
         yield
     finally:
         # Cleanup resources in finally block to ensure they run even on errors
         # await session_manager.disconnect()  # Disconnect from Redis
         # log_info("disconnected redis session manager...")
-        pass
+        await close_openai_clients()
 
 
 app = FastAPI(
@@ -108,6 +122,11 @@ async def healthz(deep: bool = Query(False)):
         logger.exception(f"/healthz: deep MCP readiness failed: {str(e)}")
         return {"status": "error", "mcp": "failed", "detail": str(e)}
 
+# Embedding model load time and memory for this worker
+@app.get("/metrics/embedding-model")
+async def embedding_model_metrics():
+    return get_model_metrics()
+
 # Include routers
 app.include_router(search_router)
 app.include_router(enhanced_search_router, prefix="/api", tags=["enhanced-search"])
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Request, HTTPException
 from typing import Any, Dict, List, Optional
 
 from app.utils.logger import get_logger
-from app.utils.openai_client import get_openai_client
+from app.utils.openai_client import get_async_openai_client
 from app.utils.db_utils import get_supabase_connection
 from app.config.settings import SEARCH_RESULT_LIMIT, PRO_SEARCH_RESULT_LIMIT
  
@@ -84,12 +84,12 @@ async def enhanced_vector_search(request: Request):
 
     # No user gating for this endpoint
 
-    client = get_openai_client()
+    client = get_async_openai_client()
     if not client:
         raise HTTPException(status_code=500, detail="OpenAI client not configured")
 
     try:
-        emb_resp = client.embeddings.create(model="text-embedding-3-small", input=query)
+        emb_resp = await client.embeddings.create(model="text-embedding-3-small", input=query)
         embedding: List[float] = emb_resp.data[0].embedding
     except Exception as e:
         logger.error(f"Embedding error: {e}")
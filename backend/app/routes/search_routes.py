@@ -16,7 +16,7 @@ from app.services.pdf_service import generate_rfp_pdf
 from app.services.recommendations import generate_recommendations
 from app.services.company_scraper import generate_company_markdown
 from app.services.helper import json_serializable
-from app.utils.openai_client import get_openai_client
+from app.utils.openai_client import get_async_openai_client
 from app.services.summary_service import process_opportunity_descriptions, fetch_description_from_sam, normalize_bulleted_summary
 from app.utils.redis_connection import RedisClient
 from app.utils.database import fetch_opportunities_from_db
@@ -498,12 +498,16 @@ async def generate_search_recommendations(request: Request):
         try:
             # Sanitize opportunity before passing to generate_recommendations
             sanitized_opp = sanitize(opportunity)
+            if opportunity_id and isinstance(sanitized_opp, dict):
+                # Match cache key
+                sanitized_opp.setdefault("id", opportunity_id)
             
             # Generate recommendation
             rec_result = await generate_recommendations(
                 company_url=None,
                 company_description=refined_query or query,
-                opportunities=[sanitized_opp]
+                opportunities=[sanitized_opp],
+                user_id=user_id
             )
             
             if not rec_result or not isinstance(rec_result, dict) or "recommendations" not in rec_result:
@@ -756,7 +760,8 @@ async def get_ai_recommendations(request: Request):
             generate_recommendations(
                 company_url=company_url,
                 company_description=company_description,
-                opportunities=sanitized_opportunities
+                opportunities=sanitized_opportunities,
+                user_id=user_id
             )
         )
 
@@ -933,9 +938,9 @@ async def ask_ai(request: Request):
 
 Please provide clear, concise, and professional responses focused on helping users understand and work with RFP documents."""
 
-        client = get_openai_client()
+        client = get_async_openai_client()
         # logger.info("OpenAI client initialized successfully")
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -972,9 +977,8 @@ async def process_document(request: Request):
             raise HTTPException(status_code=400, detail="Document content is required")
         
         # Use OpenAI to process document with enhanced validation
-        client = get_openai_client()
-        logger.info("OpenAI client initialized successfully")
-        response = client.chat.completions.create(
+        client = get_async_openai_client()
+        response = await client.chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=[
                 {
@@ -1592,7 +1596,7 @@ async def enhance_rfp_with_ai(request: Request):
             rfp_context_example = file.read()
         
         # Use OpenAI to enhance the content
-        client = get_openai_client()
+        client = get_async_openai_client()
         
         # Create a comprehensive prompt for AI enhancement
         system_prompt = """You are an expert RFP (Request for Proposal) enhancement specialist. 
@@ -1622,7 +1626,7 @@ async def enhance_rfp_with_ai(request: Request):
         
         Return the enhanced data in the same JSON format."""
         # logger.info("OpenAI client initialized successfully")
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4.1-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -8,7 +8,7 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 # from openai import OpenAI, APIError
 from app.services.doc_processing import format_document_context
-from app.utils.openai_client import get_openai_client
+from app.utils.openai_client import get_async_openai_client
 
 # Configure logging with more detailed format
 logger = get_logger(__name__)
@@ -258,7 +258,7 @@ async def process_bizradar_request(
         logger.info(full_context[:500] + "..." if len(full_context) > 500 else full_context)
         
         # Check if OpenAI client is available
-        openai_client = get_openai_client()
+        openai_client = get_async_openai_client()
         if not openai_client:
             logger.error("OpenAI client not available. Using default response.")
             return {
@@ -337,7 +337,7 @@ Answer the user's question concisely and professionally.{details_snippet}
             try:
                 # Call the OpenAI API
                 logger.info("Calling OpenAI API...")
-                response = openai_client.chat.completions.create(
+                response = await openai_client.chat.completions.create(
                     model="gpt-4o-mini",
                     messages=[
                         {"role": "system", "content": system_prompt},
@@ -0,0 +1,323 @@
+"""
+Set-based loading of opportunities into ai_enhanced_opportunities and sam_gov.
+
+A batch is COPY'd into a temporary staging table and merged with a handful of
+set-based statements in one transaction, instead of several round trips per row:
+rows whose row_hash changed are archived to history and replaced through
+INSERT ... ON CONFLICT (notice_id), new rows are inserted by the same statement,
+and duplicate solicitation numbers are collapsed to the latest row.
+"""
+import os
+import sys
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Sequence
+
+# Add the backend directory to Python path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if app_dir not in sys.path:
+    sys.path.insert(0, app_dir)
+
+from utils.db_utils import get_db_connection
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COPY_NULL = "\\N"
+
+# Columns loaded from the import; order is the COPY column order
+OPPORTUNITY_COLUMNS = [
+    "notice_id", "solicitation_number", "title", "department", "naics_code",
+    "published_date", "response_date", "description", "url", "point_of_contact",
+    "active", "sub_departments", "objective", "expected_outcome", "eligibility",
+    "key_facts", "due_date", "funding", "description_hash",
+    "embedding_text", "embedding", "embedding_model", "embedding_version",
+]
+EMBEDDING_COLUMNS = {"embedding_text", "embedding", "embedding_model", "embedding_version"}
+
+# Columns copied to ai_enhanced_opportunities_history (besides archived_at/archived_by)
+HISTORY_COLUMNS = [
+    "id", "notice_id", "solicitation_number", "title", "department",
+    "naics_code", "published_date", "response_date", "description",
+    "url", "active", "created_at", "updated_at", "additional_description",
+    "objective", "expected_outcome", "eligibility",
+    "key_facts", "due_date", "funding", "point_of_contact", "sub_departments",
+]
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, separators=(",", ":"))
+    if hasattr(value, "tolist"):
+        return json.dumps(value.tolist(), separators=(",", ":"))
+    return str(value)
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Dict[str, Any]]) -> None:
+    """Stream dict rows into `table` with COPY ... FROM STDIN (CSV, \\N as NULL)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in rows:
+        writer.writerow([_copy_value(row.get(col)) for col in columns])
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        buf,
+    )
+
+
+# Table-specific parts of the merge. Replaced rows take a fresh id from the shared
+# sequence, as the old archive/delete/insert did: history rows are keyed by id and
+# "latest id wins" decides solicitation_number duplicates.
+AI_OPPORTUNITIES_TABLE = {
+    "table": "ai_enhanced_opportunities",
+    "history": "ai_enhanced_opportunities_history",
+    "columns": OPPORTUNITY_COLUMNS,
+    "history_columns": HISTORY_COLUMNS,
+    "id_sequence": "sam_gov_id_seq",
+    # A replaced row re-enters the embedding backfill queue with a clean slate
+    "reset_on_replace": {
+        "embedding_attempts": "0",
+        "embedding_last_error": "NULL",
+        "embedding_last_attempt_at": "NULL",
+        "embedding_quarantined_at": "NULL",
+    },
+}
+
+SAM_GOV_TABLE = {
+    "table": "sam_gov",
+    "history": "sam_gov_history",
+    "columns": [
+        "notice_id", "solicitation_number", "title", "department", "naics_code",
+        "published_date", "response_date", "description", "url", "active",
+    ],
+    "history_columns": [
+        "id", "notice_id", "solicitation_number", "title", "department",
+        "naics_code", "published_date", "response_date", "description",
+        "url", "active", "created_at", "updated_at", "additional_description",
+    ],
+    "id_sequence": "sam_gov_id_seq",
+    "reset_on_replace": {},
+}
+
+# Not part of row_hash: derived from other columns, or (embeddings) only a change when supplied
+_UNHASHED_COLUMNS = EMBEDDING_COLUMNS | {"notice_id", "description_hash"}
+
+
+def _hash_columns(columns: Sequence[str]) -> List[str]:
+    return [col for col in columns if col not in _UNHASHED_COLUMNS]
+
+
+def _row_hash_sql(alias: str, columns: Sequence[str]) -> str:
+    """
+    md5 of the row's content columns, computed by Postgres on the typed values so
+    the staged row and the stored row hash identically when nothing changed.
+    """
+    parts = []
+    for col in _hash_columns(columns):
+        # json keeps its input text verbatim; jsonb normalises key order and whitespace
+        parts.append(f"{alias}.{col}::jsonb" if col == "point_of_contact" else f"{alias}.{col}")
+    return f"md5(ROW({', '.join(parts)})::text)"
+
+
+def _changed_predicate(existing: str, staged: str, columns: Sequence[str]) -> str:
+    """
+    True when the staged row differs from the stored one. Rows stored before
+    row_hash existed are hashed on the fly.
+    """
+    parts = [f"COALESCE({existing}.row_hash, {_row_hash_sql(existing, columns)}) IS DISTINCT FROM {staged}.row_hash"]
+    for col in columns:
+        if col in EMBEDDING_COLUMNS:
+            # Rows staged without an embedding don't count as a change to it
+            parts.append(f"({staged}.{col} IS NOT NULL AND {existing}.{col} IS DISTINCT FROM {staged}.{col})")
+    return "\n               OR ".join(parts)
+
+
+def _history_insert_sql(spec: Dict[str, Any], select_from: str) -> str:
+    cols = ", ".join(spec["history_columns"])
+    e_cols = ", ".join(f"e.{col}" for col in spec["history_columns"])
+    return f"""
+        INSERT INTO {spec['history']} ({cols}, archived_at, archived_by)
+        SELECT {e_cols}, CURRENT_TIMESTAMP, %s
+        {select_from}
+    """
+
+
+def bulk_upsert_with_history(
+    rows: List[Dict[str, Any]],
+    spec: Dict[str, Any],
+    archived_by: str = "upsert_script",
+    dedup_archived_by: str = "dedup_script",
+    connection=None,
+) -> Dict[str, Any]:
+    """
+    Upsert a batch into spec["table"] with history, set-based.
+
+    Same semantics as the old per-row upsert_with_history + deduplicate_solicitation_number:
+    unchanged rows are left alone, changed rows are archived and replaced, and for each
+    solicitation_number in the batch only the latest row (highest id) is kept. Change
+    detection compares row_hash instead of fetching and diffing every row in Python.
+
+    Returns:
+        dict with inserted (new + replaced), replaced, archived, deduplicated and skipped counts
+    """
+    result = {"inserted": 0, "replaced": 0, "archived": 0, "deduplicated": 0, "skipped": 0}
+
+    # Last occurrence wins for repeated notice_ids, as with sequential upserts
+    by_notice_id: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        notice_id = row.get("notice_id")
+        if not notice_id:
+            result["skipped"] += 1
+            continue
+        by_notice_id[str(notice_id)] = row
+    if not by_notice_id:
+        return result
+
+    table = spec["table"]
+    columns = spec["columns"]
+    col_list = ", ".join(columns)
+    replace_set = ",\n                    ".join(
+        [f"{col} = EXCLUDED.{col}" for col in columns if col != "notice_id"]
+        + [
+            "row_hash = EXCLUDED.row_hash",
+            f"id = nextval('{spec['id_sequence']}')",
+            "created_at = CURRENT_TIMESTAMP",
+            "updated_at = CURRENT_TIMESTAMP",
+        ]
+        + [f"{col} = {value}" for col, value in spec["reset_on_replace"].items()]
+    )
+
+    own_connection = connection is None
+    conn = connection or get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMP TABLE opp_stage ON COMMIT DROP AS
+                SELECT {col_list}, row_hash FROM {table} WITH NO DATA
+            """)
+            copy_rows(cursor, "opp_stage", columns, by_notice_id.values())
+            cursor.execute(f"UPDATE opp_stage s SET row_hash = {_row_hash_sql('s', columns)}")
+            cursor.execute("ANALYZE opp_stage")
+
+            # Archive the stored version of every changed row in one INSERT ... SELECT ... JOIN
+            cursor.execute(
+                _history_insert_sql(spec, f"""
+                    FROM {table} e
+                    JOIN opp_stage s ON s.notice_id = e.notice_id
+                    WHERE {_changed_predicate('e', 's', columns)}
+                """),
+                (archived_by,),
+            )
+            result["archived"] = cursor.rowcount
+
+            # New rows insert; changed rows are replaced in place; unchanged rows are skipped
+            cursor.execute(f"""
+                WITH upserted AS (
+                    INSERT INTO {table} AS e ({col_list}, row_hash)
+                    SELECT {col_list}, row_hash FROM opp_stage
+                    ON CONFLICT (notice_id) DO UPDATE SET
+                    {replace_set}
+                    WHERE {_changed_predicate('e', 'EXCLUDED', columns)}
+                    RETURNING (xmax = 0) AS is_new
+                )
+                SELECT count(*), count(*) FILTER (WHERE NOT is_new) FROM upserted
+            """)
+            result["inserted"], result["replaced"] = cursor.fetchone()
+
+            # One window-function pass: everything but the latest id per solicitation_number
+            cursor.execute(f"""
+                CREATE TEMP TABLE opp_dupes ON COMMIT DROP AS
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (PARTITION BY solicitation_number ORDER BY id DESC) AS rn
+                    FROM {table}
+                    WHERE solicitation_number IN (
+                        SELECT DISTINCT solicitation_number FROM opp_stage
+                        WHERE solicitation_number IS NOT NULL AND solicitation_number <> ''
+                    )
+                ) ranked
+                WHERE rn > 1
+            """)
+            cursor.execute(
+                _history_insert_sql(spec, f"FROM {table} e WHERE e.id IN (SELECT id FROM opp_dupes)"),
+                (dedup_archived_by,),
+            )
+            result["deduplicated"] = cursor.rowcount
+            cursor.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM opp_dupes)")
+        conn.commit()
+        logger.info(
+            f"Bulk upsert of {len(by_notice_id)} rows into {table}: inserted/replaced={result['inserted']} "
+            f"(replaced={result['replaced']}), archived={result['archived']}, "
+            f"deduplicated={result['deduplicated']}, skipped={result['skipped']}"
+        )
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_connection:
+            conn.close()
+
+
+def bulk_upsert_opportunities(
+    rows: List[Dict[str, Any]],
+    archived_by: str = "upsert_script",
+    dedup_archived_by: str = "dedup_script",
+    connection=None,
+) -> Dict[str, Any]:
+    """bulk_upsert_with_history for ai_enhanced_opportunities."""
+    return bulk_upsert_with_history(rows, AI_OPPORTUNITIES_TABLE, archived_by, dedup_archived_by, connection)
+
+
+def deactivate_missing_opportunities(notice_ids: Iterable[str], connection=None) -> Dict[str, int]:
+    """
+    Mark active opportunities whose notice_id is not in the latest feed as inactive.
+
+    The feed's notice_ids are COPY'd into a temp table and a single anti-join
+    UPDATE flips the rest, so the result is exact at any table size.
+
+    Returns:
+        dict with staged (distinct feed ids) and marked_inactive counts
+    """
+    ids = {str(nid) for nid in notice_ids if nid}
+    if not ids:
+        return {"staged": 0, "marked_inactive": 0}
+
+    own_connection = connection is None
+    conn = connection or get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE feed_notice_ids (notice_id TEXT PRIMARY KEY) ON COMMIT DROP")
+            copy_rows(cursor, "feed_notice_ids", ["notice_id"], ({"notice_id": nid} for nid in ids))
+            cursor.execute("ANALYZE feed_notice_ids")
+            # NOT EXISTS rather than NOT IN: same result here, and NULL-safe.
+            # active is hashed, so row_hash is cleared; otherwise a notice that comes
+            # back active would hash like the stored row and never be reactivated
+            cursor.execute("""
+                UPDATE ai_enhanced_opportunities e
+                SET active = FALSE, row_hash = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE e.active
+                  AND NOT EXISTS (SELECT 1 FROM feed_notice_ids f WHERE f.notice_id = e.notice_id)
+            """)
+            marked_inactive = cursor.rowcount
+        conn.commit()
+        logger.info(f"Marked {marked_inactive} opportunities inactive ({len(ids)} notice_ids in latest feed)")
+        return {"staged": len(ids), "marked_inactive": marked_inactive}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_connection:
+            conn.close()
@@ -2,6 +2,7 @@ import os
 import sys
 import json
 import csv
+import hashlib
 import pandas as pd
 import asyncio
 
@@ -24,48 +25,49 @@ load_dotenv()
 
 from utils.logger import get_logger
 from utils.db_utils import get_supabase_connection
-from services.summary_service import generate_description_summary
+from config.settings import DB_HOST
+from services.cron.bulk_loader import bulk_upsert_opportunities, deactivate_missing_opportunities
+from services.cron.embedding_backfill import (
+    EMBED_CONCURRENCY,
+    EMBED_MODEL,
+    build_embedding_text_full_row,
+    run_backfill,
+)
+from utils.embedding_batcher import EmbeddingBatcher
+from services.cron.pipeline import Pipeline, PipelineError, Stage
+from services.cron.update_etl_history import record_pipeline_run
+from utils.embedding_cache import get_embedding_cache
+from services.summary_service import generate_description_summaries, SUMMARY_MODEL
 
 # Configure logging
 logger = get_logger(__name__)
 
 # === Database Functions (from database.py) ===
 
-EMBED_MODEL = "text-embedding-3-small"
-
-def _canonicalize_value(v):
-    if v is None:
-        return ""
-    if isinstance(v, (list, tuple)):
-        return ", ".join(str(x) for x in v if x is not None)
-    if isinstance(v, dict):
-        return "; ".join(f"{k}={_canonicalize_value(v[k])}" for k in sorted(v.keys()))
-    return str(v)
-
-def build_embedding_text_full_row(opp: Dict[str, Any]) -> str:
-    """Create canonical text from the entire row to embed the whole record."""
-    fields_in_order = [
-        "title","description","objective","expected_outcome","eligibility","key_facts",
-        "department","sub_departments","naics_code","classification_code",
-        "published_date","response_date","due_date","funding","solicitation_number",
-        "notice_id","url","point_of_contact","active"
-    ]
-    lines, seen = [], set()
-    for f in fields_in_order:
-        if f in opp:
-            seen.add(f)
-            lines.append(f"{f}: {_canonicalize_value(opp.get(f))}")
-    for k, v in opp.items():
-        if k in seen:
-            continue
-        lines.append(f"{k}: {_canonicalize_value(v)}")
-    return "\n".join(lines)[:20000]
+# Opportunity fields filled from the AI summary; reused when description_hash matches
+SUMMARY_FIELDS = ["objective", "expected_outcome", "eligibility", "key_facts", "due_date", "funding"]
+LEDGER_LOOKUP_CHUNK = 100
+
+# Concurrent claim/embed loops for the post-import embedding backfill
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "2"))
+
+# Concurrent summary requests and per-attempt timeout (seconds)
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "60"))
+# Summary batches in flight at once in the import pipeline
+SUMMARY_WORKERS = 2
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    # Content-hash cache: unchanged embedding_text never goes back to the API
+    return EmbeddingBatcher(model=EMBED_MODEL, max_concurrency=EMBED_CONCURRENCY, cache=get_embedding_cache())
 
 async def generate_embedding(text: str) -> List[float]:
-    from utils.openai_client import get_openai_client
-    client = get_openai_client()
-    r = client.embeddings.create(model=EMBED_MODEL, input=text)
-    return r.data[0].embedding
+    return await get_embedding_batcher().embed(text)
+
+async def generate_embeddings(texts: List[str], batcher: EmbeddingBatcher = None) -> List[Any]:
+    """Embed many texts with packed, concurrent requests; result order matches `texts`."""
+    batcher = batcher or get_embedding_batcher()
+    return await batcher.embed_many(texts)
 
 def _make_json_serializable(value):
     """Coerce value into JSON-serializable form for Supabase client."""
@@ -227,11 +229,47 @@ def upsert_with_history_sb(supabase, row: Dict[str, Any], archived_by: str = "up
     return True
 
 
+# Rows per COPY + merge transaction in the bulk loader
+BULK_LOAD_BATCH_SIZE = int(os.getenv("BULK_LOAD_BATCH_SIZE", "5000"))
+
 def insert_data(rows):
+    """Insert or update rows with history and deduplication.
+
+    Uses the set-based COPY + merge loader when direct database credentials are
+    configured, and falls back to per-row Supabase REST calls otherwise. The result's
+    "persisted" lists the notice_ids that were written (or already up to date).
+    """
+    if DB_HOST:
+        try:
+            return insert_data_bulk(rows)
+        except Exception as e:
+            logger.error(f"Bulk load failed, falling back to Supabase REST upserts: {e}")
+    return insert_data_sb(rows)
+
+def insert_data_bulk(rows):
+    """Load rows in COPY batches and merge each batch with set-based SQL."""
+    inserted = 0
+    skipped = 0
+    for i in range(0, len(rows), BULK_LOAD_BATCH_SIZE):
+        result = bulk_upsert_opportunities(rows[i:i + BULK_LOAD_BATCH_SIZE])
+        inserted += result["inserted"]
+        skipped += result["skipped"]
+    return {"inserted": inserted, "skipped": skipped, "persisted": [r["notice_id"] for r in rows if r.get("notice_id")]}
+
+def mark_missing_inactive(latest_notice_ids) -> int:
+    """Deactivate active opportunities absent from the latest feed in one statement; returns the count."""
+    if DB_HOST:
+        return deactivate_missing_opportunities(latest_notice_ids)["marked_inactive"]
+    supabase = get_supabase_connection(use_service_key=True)
+    resp = supabase.rpc("deactivate_missing_opportunities", {"feed_ids": sorted(latest_notice_ids)}).execute()
+    return int(getattr(resp, "data", None) or 0)
+
+def insert_data_sb(rows):
     """Insert or update rows using Supabase client with history and deduplication."""
     supabase = get_supabase_connection(use_service_key=True)
     inserted = 0
     skipped = 0
+    persisted = []
     try:
         for row in rows:
             notice_id = row.get("notice_id")
@@ -246,15 +284,16 @@ def insert_data(rows):
                 solicitation_number = row.get("solicitation_number")
                 if solicitation_number:
                     deduplicate_solicitation_number_sb(supabase, solicitation_number)
+                persisted.append(notice_id)
             except Exception as e:
                 logger.error(f"Error upserting record {notice_id}: {e}")
                 skipped += 1
                 continue
         # logger.info(f"Database upsert complete. Inserted/Updated: {inserted}, Skipped: {skipped}")
-        return {"inserted": inserted, "skipped": skipped}
+        return {"inserted": inserted, "skipped": skipped, "persisted": persisted}
     except Exception as e:
         # logger.error(f"Error during Supabase operations: {e}")
-        return {"error": str(e), "inserted": inserted, "skipped": skipped}
+        return {"error": str(e), "inserted": inserted, "skipped": skipped, "persisted": persisted}
 
 # === CSV Processing Functions ===
 
@@ -311,6 +350,51 @@ def is_allowed_naics(naics_code):
     naics_str = str(naics_code).replace(".0", "").strip()
     return naics_str in ALLOWED_NAICS_CODES
 
+def description_hash(description: str) -> str:
+    """Ledger key for a summarized description; a model change invalidates stored summaries."""
+    return hashlib.sha256(f"{SUMMARY_MODEL}\n{description}".encode("utf-8")).hexdigest()
+
+def fetch_summary_ledger(notice_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Return {notice_id: row} with description_hash and summary fields for rows already imported."""
+    ledger: Dict[str, Dict[str, Any]] = {}
+    notice_ids = [nid for nid in dict.fromkeys(notice_ids) if nid]
+    if not notice_ids:
+        return ledger
+    try:
+        supabase = get_supabase_connection(use_service_key=True)
+        for i in range(0, len(notice_ids), LEDGER_LOOKUP_CHUNK):
+            resp = (
+                supabase
+                .table("ai_enhanced_opportunities")
+                .select("notice_id, description_hash, " + ", ".join(SUMMARY_FIELDS))
+                .in_("notice_id", notice_ids[i:i + LEDGER_LOOKUP_CHUNK])
+                .not_.is_("description_hash", None)
+                .execute()
+            )
+            for row in getattr(resp, "data", None) or []:
+                ledger[row["notice_id"]] = row
+    except Exception as e:
+        logger.warning(f"Summary ledger lookup failed, summarizing everything: {e}")
+    return ledger
+
+def apply_summary(opp: Dict[str, Any], summary: Any) -> None:
+    """Copy AI summary fields onto an opportunity; missing or failed summaries get empty defaults."""
+    summary = summary.get("summary", {}) if isinstance(summary, dict) else {}
+    if not isinstance(summary, dict):
+        summary = {}
+    opp["objective"] = summary.get("objective", "")
+    opp["expected_outcome"] = summary.get("goal", "")
+    opp["eligibility"] = summary.get("eligibility", "")
+    opp["key_facts"] = summary.get("key_facts", "")
+
+    # Parse due date from summary
+    due_date_str = summary.get("due_date", "")
+    if due_date_str and isinstance(due_date_str, str):
+        opp["due_date"] = parse_date(due_date_str)
+    else:
+        opp["due_date"] = None
+    opp["funding"] = summary.get("budget", "")
+
 def process_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
     """
     Process a single CSV row and convert it to the format expected by the database.
@@ -383,13 +467,207 @@ def process_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
     
     return processed_row
 
-async def process_csv_file(csv_file_path: str, batch_size: int = 1000) -> Dict[str, Any]:
+def _column(df: pd.DataFrame, name: str, default=None) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+def _map_unique(series: pd.Series, func) -> pd.Series:
+    """Apply func once per distinct value; extract columns repeat dates, agencies and contacts heavily."""
+    # NaN != NaN, so this drops missing values without another isna pass
+    uniques = [u for u in series.unique() if u is not None and u == u]
+    return series.map(dict(zip(uniques, map(func, uniques))))
+
+def _clean_str(series: pd.Series, default: str = "") -> pd.Series:
+    """Vectorized safe_string: NaN -> default, everything else str + strip."""
+    return _map_unique(series.astype(object).fillna(default), lambda v: str(v).strip())
+
+def _parse_date_column(series: pd.Series) -> pd.Series:
+    """parse_date over a column, evaluated once per distinct value."""
+    return _map_unique(series, parse_date).astype(object).where(series.notna(), None)
+
+CONTACT_FIELDS = (("title", "Title"), ("name", "Fullname"), ("email", "Email"), ("phone", "Phone"), ("fax", "Fax"))
+CONTACT_TEMPLATE = (
+    '{{"primary": {{"title": {}, "name": {}, "email": {}, "phone": {}, "fax": {}}}, '
+    '"secondary": {{"title": {}, "name": {}, "email": {}, "phone": {}, "fax": {}}}}}'
+)
+
+def _point_of_contact_column(df: pd.DataFrame) -> List[str]:
+    """point_of_contact JSON per row, byte-identical to json.dumps of the nested dict."""
+    encoded = [
+        _map_unique(_clean_str(_column(df, f"{prefix}Contact{suffix}")), json.dumps).tolist()
+        for prefix in ("Primary", "Secondary")
+        for _, suffix in CONTACT_FIELDS
+    ]
+    return [CONTACT_TEMPLATE.format(*values) for values in zip(*encoded)]
+
+def transform_csv_frame(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Column-wise equivalent of process_csv_row over a whole frame.
+
+    Applies the NAICS allow-list, parses dates, splits the department and
+    assembles the point_of_contact JSON with column operations, returning the
+    same records process_csv_row would build for each kept row.
+    """
+    if df.empty:
+        return []
+    naics_str = _clean_str(_column(df, "NaicsCode")).str.replace(".0", "", regex=False).str.strip()
+    notice_id = _clean_str(_column(df, "NoticeId"))
+    keep = naics_str.isin(ALLOWED_NAICS_CODES) & (notice_id != "")
+    df = df.loc[keep]
+    if df.empty:
+        return []
+    naics_str = naics_str[keep]
+    notice_id = notice_id[keep]
+
+    description = _column(df, "Description")
+    description = description.where(description.map(lambda v: isinstance(v, str)), "")
+
+    columns = {
+        "notice_id": notice_id,
+        "solicitation_number": _clean_str(_column(df, "Sol#")),
+        "title": _clean_str(_column(df, "Title"), "No title").str[:255],
+        "department": _map_unique(_clean_str(_column(df, "Department/Ind.Agency")), lambda v: v.split(".")[0]),
+        "naics_code": naics_str.astype(int),
+        "published_date": _parse_date_column(_column(df, "PostedDate")),
+        "response_date": _parse_date_column(_column(df, "ResponseDeadLine")),
+        "description": description,
+        "url": "https://sam.gov/opp/" + notice_id + "/view",
+        "point_of_contact": pd.Series(_point_of_contact_column(df), index=df.index),
+        "active": _clean_str(_column(df, "Active", "Yes")).str.lower() == "yes",
+        "sub_departments": _clean_str(_column(df, "Sub-Tier")),
+    }
+    constants = {
+        "objective": "",
+        "expected_outcome": "",
+        "eligibility": "",
+        "key_facts": "",
+        "due_date": None,
+        "funding": "",
+    }
+    # tolist() yields native Python values; zipping lists is much cheaper than DataFrame.to_dict
+    names = list(columns)
+    values = [series.tolist() for series in columns.values()]
+    return [dict(zip(names, row), **constants) for row in zip(*values)]
+
+# Columns process_csv_row reads; everything else in the extract is never loaded
+CSV_USECOLS = [
+    "NoticeId", "Sol#", "Title", "Department/Ind.Agency", "Sub-Tier", "NaicsCode",
+    "PostedDate", "ResponseDeadLine", "Description", "Active",
+    "PrimaryContactTitle", "PrimaryContactFullname", "PrimaryContactEmail",
+    "PrimaryContactPhone", "PrimaryContactFax",
+    "SecondaryContactTitle", "SecondaryContactFullname", "SecondaryContactEmail",
+    "SecondaryContactPhone", "SecondaryContactFax",
+]
+CSV_CHUNKSIZE = int(os.getenv("CSV_CHUNKSIZE", "50000"))
+# "c" (default) or "pyarrow"; pyarrow streams record batches through pyarrow.csv.open_csv
+CSV_ENGINE = os.getenv("CSV_ENGINE", "c")
+
+def _peak_rss_mb() -> float:
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def detect_csv_encoding(csv_file_path: str, sample_size: int = 1 << 20) -> str:
+    """Pick the first encoding that decodes a leading sample of the file."""
+    with open(csv_file_path, "rb") as f:
+        sample = f.read(sample_size)
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # A multi-byte character cut off at the end of the sample is still utf-8
+            if encoding == "utf-8" and e.start >= len(sample) - 3 and len(sample) == sample_size:
+                return encoding
+    return "latin-1"
+
+def filter_csv_chunk(chunk: pd.DataFrame, today: date) -> pd.DataFrame:
+    """Keep rows with a deadline today or later and an allowed NAICS code."""
+    deadline = pd.to_datetime(chunk["ResponseDeadLine"], errors="coerce", utc=True)
+    deadline = deadline.dt.tz_convert(None).dt.date
+    naics = chunk["NaicsCode"].fillna("").astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+    return chunk.loc[(deadline >= today) & naics.isin(ALLOWED_NAICS_CODES)]
+
+def _iter_csv_chunks(csv_file_path: str, encoding: str, usecols: List[str], engine: str):
+    if engine == "pyarrow":
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pa_csv
+
+            reader = pa_csv.open_csv(
+                csv_file_path,
+                read_options=pa_csv.ReadOptions(encoding=encoding, block_size=16 << 20),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=lambda row: "skip"),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=usecols,
+                    column_types={col: pa.string() for col in usecols},
+                ),
+            )
+            for batch in reader:
+                yield batch.to_pandas()
+            return
+        except ImportError:
+            logger.warning("pyarrow not installed; falling back to the C CSV engine")
+    yield from pd.read_csv(
+        csv_file_path,
+        encoding=encoding,
+        encoding_errors="replace",
+        usecols=usecols,
+        dtype=str,
+        chunksize=CSV_CHUNKSIZE,
+        on_bad_lines="skip",
+    )
+
+def iter_filtered_csv(csv_file_path: str, engine: str = None):
+    """
+    Stream the extract chunk by chunk, loading only CSV_USECOLS as strings and
+    yielding the rows of each chunk that pass filter_csv_chunk, so memory is
+    bounded by one chunk.
+    """
+    engine = engine or CSV_ENGINE
+    encoding = detect_csv_encoding(csv_file_path)
+    header = pd.read_csv(csv_file_path, encoding=encoding, encoding_errors="replace", nrows=0).columns
+    usecols = [c for c in CSV_USECOLS if c in header]
+    if not {"NoticeId", "NaicsCode", "ResponseDeadLine"}.issubset(usecols):
+        raise ValueError(f"CSV is missing required columns: {csv_file_path}")
+
+    today = datetime.utcnow().date()
+    total_rows = 0
+    kept_rows = 0
+    for chunk in _iter_csv_chunks(csv_file_path, encoding, usecols, engine):
+        total_rows += len(chunk)
+        filtered = filter_csv_chunk(chunk, today)
+        if len(filtered):
+            kept_rows += len(filtered)
+            yield filtered
+
+    logger.info(
+        f"Read CSV ({encoding}, {engine} engine, {len(usecols)} columns): filtered {total_rows} -> {kept_rows} rows "
+        f"(ResponseDeadLine >= {today}, allowed NAICS); peak RSS {_peak_rss_mb():.0f} MB"
+    )
+
+def read_filtered_csv(csv_file_path: str, engine: str = None) -> pd.DataFrame:
+    """All rows of iter_filtered_csv in one frame."""
+    kept = list(iter_filtered_csv(csv_file_path, engine))
+    return pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=CSV_USECOLS)
+
+async def process_csv_file(
+    csv_file_path: str, batch_size: int = 1000, resume: bool = False, run_id: str = None
+) -> Dict[str, Any]:
     """
     Process the CSV file and update the database with opportunities.
+
+    The import runs as a pipeline (read -> transform -> summarize -> embed -> load),
+    so summaries, embeddings and loads for early chunks overlap with reading the rest
+    of the extract.
     
     Args:
         csv_file_path: Path to the CSV file
-        batch_size: Number of rows to process in each batch
+        batch_size: Opportunities per summarize/embed call
+        resume: Skip opportunities already loaded by an interrupted run with the same run_id
+        run_id: Pipeline checkpoint id (default: today's date)
         
     Returns:
         Dictionary with results summary
@@ -399,270 +677,156 @@ async def process_csv_file(csv_file_path: str, batch_size: int = 1000) -> Dict[s
     
     # logger.info(f"Starting CSV import from: {csv_file_path}")
     
-    all_opportunities = []
-    total_processed = 0
-    
-    try:
-        # Use pandas to read the large CSV file efficiently with proper encoding
-        # logger.info("Reading CSV file with pandas...")
-        
-        # Try different encodings
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(csv_file_path, encoding=encoding, low_memory=False)
-                cols = df.columns.tolist()
-                # Filter: Published within last 3 days, and deadline today or later
-                today = datetime.utcnow().date()
-                three_days_ago = today - timedelta(days=7)
-
-                # Create parsed date helper columns without overwriting originals used later
-                posted = df.get("PostedDate")
-                deadline = df.get("ResponseDeadLine")
-
-                if posted is not None:
-                    df["PostedDate_dt"] = (
-                        pd.to_datetime(posted, errors="coerce", utc=True)
-                        .dt.tz_convert(None)
-                        .dt.date
-                    )
-                else:
-                    df["PostedDate_dt"] = pd.NaT
-
-                if deadline is not None:
-                    df["ResponseDeadLine_dt"] = (
-                        pd.to_datetime(deadline, errors="coerce", utc=True)
-                        .dt.tz_convert(None)
-                        .dt.date
-                    )
-                else:
-                    df["ResponseDeadLine_dt"] = pd.NaT
-
-                before_count = len(df)
-                mask = (
-                    # (df["PostedDate_dt"] >= three_days_ago) &
-                    (df["ResponseDeadLine_dt"] >= today)
-                )
-                df = df.loc[mask, cols].copy()
-
-                logger.info(
-                    f"Successfully read CSV with {encoding} encoding; filtered {before_count} -> {len(df)} rows "
-                    f"(PostedDate >= {three_days_ago}, ResponseDeadLine >= {today})"
-                )
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            return {"source": "csv_import", "count": 0, "error": "Could not read CSV file with any encoding"}
-        
-        logger.info(f"CSV loaded: {len(df)} total rows")
-        
-        # Process rows in batches
-        for start_idx in range(0, len(df), batch_size):
-            end_idx = min(start_idx + batch_size, len(df))
-            batch_df = df.iloc[start_idx:end_idx]
-            
-            # logger.info(f"Processing batch {start_idx//batch_size + 1}: rows {start_idx+1}-{end_idx}")
-            
-            batch_opportunities = []
-            for _, row in batch_df.iterrows():
-                # Convert pandas row to dictionary
-                row_dict = row.to_dict()
-                # print(f"Row dict: {row_dict}")
-                
-                # Process the row
-                processed_row = process_csv_row(row_dict)
-                if processed_row:
-                    batch_opportunities.append(processed_row)
-                    total_processed += 1
-            
-            all_opportunities.extend(batch_opportunities)
-            # logger.info(f"Batch complete: {len(batch_opportunities)} opportunities found, {total_processed} total processed")
-        
-        # logger.info(f"CSV processing complete: {total_processed} opportunities found out of {len(df)} total rows")
-        
-        # Generate AI summaries for all opportunities
-        logger.info("Generating AI summaries for opportunities...")
-        for opp in all_opportunities:
-            try:
-                description_text = opp.get("description", "")
-                # Handle cases where description might be float/NaN
-                if description_text and not pd.isna(description_text) and isinstance(description_text, str):
-                    # Generate AI summary exactly as in original code
-                    summary = await generate_description_summary("description: " + description_text)
-                    summary = summary.get("summary", {})
-                    
-                    opp["objective"] = summary.get("objective", "")
-                    opp["expected_outcome"] = summary.get("goal", "")
-                    opp["eligibility"] = summary.get("eligibility", "")
-                    opp["key_facts"] = summary.get("key_facts", "")
-                    
-                    # Parse due date from summary
-                    due_date_str = summary.get("due_date", "")
-                    if due_date_str and not pd.isna(due_date_str) and isinstance(due_date_str, str):
-                        opp["due_date"] = parse_date(due_date_str)
-                    else:
-                        opp["due_date"] = None
-                    opp["funding"] = summary.get("budget", "")
-                else:
-                    # Skip AI summary for invalid descriptions
-                    logger.warning(f"Skipping AI summary for {opp.get('notice_id')}: invalid description type")
-                    opp["objective"] = ""
-                    opp["expected_outcome"] = ""
-                    opp["eligibility"] = ""
-                    opp["key_facts"] = ""
-                    opp["due_date"] = None
-                    opp["funding"] = ""
-            except Exception as e:
-                # logger.error(f"Error generating AI summary for {opp.get('notice_id')}: {e}")
-                # Continue with default values
-                opp["objective"] = ""
-                opp["expected_outcome"] = ""
-                opp["eligibility"] = ""
-                opp["key_facts"] = ""
-                opp["due_date"] = None
-                opp["funding"] = ""
-            # After summary fields are set, generate full-row embedding
-            try:
-                text_for_embedding = build_embedding_text_full_row(opp)
+    latest_notice_ids = set()
+    stats = {"summaries_reused": 0, "summary_llm_calls": 0, "inserted": 0, "skipped": 0, "error": None}
+    batcher = get_embedding_batcher()
+
+    def transform(chunk: pd.DataFrame) -> List[Dict[str, Any]]:
+        opportunities = transform_csv_frame(chunk)
+        latest_notice_ids.update(opp["notice_id"] for opp in opportunities if opp.get("notice_id"))
+        return opportunities
+
+    async def summarize(opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        descriptions = []
+        for opp in opportunities:
+            description_text = opp.get("description", "")
+            # Handle cases where description might be float/NaN
+            if description_text and not pd.isna(description_text) and isinstance(description_text, str):
+                descriptions.append("description: " + description_text)
+            else:
+                logger.warning(f"Skipping AI summary for {opp.get('notice_id')}: invalid description type")
+                descriptions.append(None)
+
+        # Reuse stored summaries whose description hash is unchanged since the last import
+        hashes = [description_hash(d) if d else None for d in descriptions]
+        ledger = await asyncio.to_thread(
+            fetch_summary_ledger, [opp.get("notice_id") for opp, d in zip(opportunities, descriptions) if d]
+        )
+        pending = []
+        for i, (opp, h) in enumerate(zip(opportunities, hashes)):
+            stored = ledger.get(opp.get("notice_id"))
+            if h and stored and stored.get("description_hash") == h:
+                for field in SUMMARY_FIELDS:
+                    opp[field] = stored.get(field)
+                opp["description_hash"] = h
+                stats["summaries_reused"] += 1
+            else:
+                pending.append(i)
+
+        # Two batches in flight share the SUMMARY_CONCURRENCY budget
+        summaries = await generate_description_summaries(
+            [descriptions[i] for i in pending],
+            max_concurrency=max(1, SUMMARY_CONCURRENCY // SUMMARY_WORKERS),
+            timeout=SUMMARY_TIMEOUT,
+        )
+        for i, summary in zip(pending, summaries):
+            apply_summary(opportunities[i], summary)
+            if summary is not None:
+                opportunities[i]["description_hash"] = hashes[i]
+        stats["summary_llm_calls"] += sum(1 for i in pending if descriptions[i])
+        return opportunities
+
+    async def embed(opportunities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # After summary fields are set, generate full-row embeddings in packed batches
+        embedding_texts = [build_embedding_text_full_row(opp) for opp in opportunities]
+        try:
+            vectors = await generate_embeddings(embedding_texts, batcher)
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            vectors = [None] * len(opportunities)
+        for opp, text_for_embedding, vector in zip(opportunities, embedding_texts, vectors):
+            if vector is None:
                 if text_for_embedding.strip():
-                    opp["embedding_text"] = text_for_embedding
-                    opp["embedding"] = await generate_embedding(text_for_embedding)
-                    opp["embedding_model"] = EMBED_MODEL
-                    opp["embedding_version"] = 1
-            except Exception as e:
-                logger.error(f"Error generating embedding for {opp.get('notice_id')}: {e}")
-        
-        # Insert into database
-        if all_opportunities:
-            # logger.info(f"Preparing to insert {len(all_opportunities)} opportunities into database")
-            result = insert_data(all_opportunities)
-            
-            # Return detailed results exactly as in original code
-            db_results = {
-                "source": "csv_import", 
-                "total_fetched": total_processed,
-                "processed": len(all_opportunities),
-                "inserted": result.get("inserted", 0),
-                "skipped": result.get("skipped", 0),
-                "error": result.get("error")
-            }
-            
-            # Supabase vector refresh: fill embeddings for rows missing them (full reindex style)
-            try:
-                supabase = get_supabase_connection(use_service_key=True)
-                PAGE = 200
-                total_refreshed = 0
-                while True:
-                    q = (
-                        supabase
-                        .table("ai_enhanced_opportunities")
-                        .select(
-                            "id, notice_id, title, department, naics_code, description, url, "
-                            "objective, expected_outcome, eligibility, key_facts, response_date, due_date, "
-                            "sub_departments, funding, point_of_contact, published_date, active, embedding"
-                        )
-                        .is_("embedding", None)
-                        .limit(PAGE)
-                    ).execute()
-                    rows = getattr(q, "data", None) or []
-                    if not rows:
-                        break
-
-                    updates = []
-                    for r in rows:
-                        try:
-                            row_full = {
-                                "notice_id": r.get("notice_id"),
-                                "title": r.get("title"),
-                                "department": r.get("department"),
-                                "naics_code": r.get("naics_code"),
-                                "description": r.get("description"),
-                                "url": r.get("url"),
-                                "objective": r.get("objective"),
-                                "expected_outcome": r.get("expected_outcome"),
-                                "eligibility": r.get("eligibility"),
-                                "key_facts": r.get("key_facts"),
-                                "response_date": r.get("response_date"),
-                                "due_date": r.get("due_date"),
-                                "sub_departments": r.get("sub_departments"),
-                                "funding": r.get("funding"),
-                                "point_of_contact": r.get("point_of_contact"),
-                                "published_date": r.get("published_date"),
-                                "active": r.get("active"),
-                            }
-                            full_text = build_embedding_text_full_row(row_full)
-                            if not full_text.strip():
-                                continue
-                            emb = await generate_embedding(full_text)
-                            updates.append({
-                                "id": r["id"],
-                                "embedding_text": full_text[:20000],
-                                "embedding": emb,
-                                "embedding_model": EMBED_MODEL,
-                                "embedding_version": 1
-                            })
-                        except Exception as ee:
-                            logger.error(f"Embedding refresh failed for {r.get('notice_id')}: {ee}")
-                            continue
-
-                    if updates:
-                        supabase.table("ai_enhanced_opportunities").upsert(updates, on_conflict="id").execute()
-                        total_refreshed += len(updates)
-
-                db_results["indexed_count"] = total_refreshed
-                # logger.info(f"Supabase vector refresh complete. Embeddings updated: {total_refreshed}")
-            except Exception as e:
-                # logger.error(f"Error during Supabase vector refresh: {e}")
-                db_results["indexing_error"] = str(e)
+                    logger.error(f"Error generating embedding for {opp.get('notice_id')}")
+                continue
+            opp["embedding_text"] = text_for_embedding
+            opp["embedding"] = vector
+            opp["embedding_model"] = EMBED_MODEL
+            opp["embedding_version"] = 1
+        return opportunities
+
+    def load(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = insert_data(rows)
+        stats["inserted"] += result.get("inserted", 0)
+        stats["skipped"] += result.get("skipped", 0)
+        stats["error"] = stats["error"] or result.get("error")
+        # Only persisted rows are checkpointed as done, so --resume retries failed and skipped rows
+        persisted = set(result.get("persisted", []))
+        return [row for row in rows if row.get("notice_id") in persisted]
+
+    pipeline = Pipeline("csv_import_sam_gov", [
+        Stage("transform", transform, fan_out=True),
+        Stage("summarize", summarize, workers=SUMMARY_WORKERS, batch_size=batch_size, skip_done=True),
+        Stage("embed", embed, batch_size=batch_size),
+        Stage("load", load, batch_size=BULK_LOAD_BATCH_SIZE),
+    ], key=lambda opp: opp["notice_id"])
 
-            # --- Post-ETL: Mark records as inactive if not in latest CSV fetch (exactly as in original) ---
-            try:
-                latest_notice_ids = set(row["notice_id"] for row in all_opportunities if row.get("notice_id"))
-                supabase = get_supabase_connection(use_service_key=True)
-                if latest_notice_ids:
-                    active_resp = (
-                        supabase
-                        .table("ai_enhanced_opportunities")
-                        .select("notice_id")
-                        .eq("active", True)
-                        .execute()
-                    )
-                    active_rows = getattr(active_resp, "data", None) or []
-                    active_ids = {r["notice_id"] for r in active_rows if r.get("notice_id")}
-                    to_deactivate = list(active_ids - latest_notice_ids)
-                    marked_inactive = 0
-                    if to_deactivate:
-                        CHUNK = 500
-                        for i in range(0, len(to_deactivate), CHUNK):
-                            chunk = to_deactivate[i:i+CHUNK]
-                            supabase.table("ai_enhanced_opportunities").update({"active": False}).in_("notice_id", chunk).execute()
-                            marked_inactive += len(chunk)
-                    # logger.info(f"Marked {marked_inactive} records as inactive (not present in latest CSV fetch)")
-                    db_results["marked_inactive"] = marked_inactive
-                else:
-                    logger.warning("No notice_ids found in latest CSV fetch for inactive marking step.")
-            except Exception as e:
-                # logger.error(f"Error during post-ETL inactive marking step: {e}")
-                db_results["inactive_marking_error"] = str(e)
-                
-            return db_results
-        
-        return {"source": "csv_import", "count": 0, "status": "No opportunities found"}
-        
+    try:
+        run_summary = await pipeline.run(iter_filtered_csv(csv_file_path), run_id=run_id, resume=resume)
+    except PipelineError as e:
+        logger.error(f"Error processing CSV file: {e}")
+        return {"source": "csv_import", "count": 0, "error": str(e), "pipeline": e.summary}
     except Exception as e:
         logger.error(f"Error processing CSV file: {e}")
         return {"source": "csv_import", "count": 0, "error": str(e)}
 
-async def import_from_csv(csv_file_path: str = None) -> Dict[str, Any]:
+    total_processed = run_summary["stages"]["transform"]["records_out"]
+    processed = run_summary["records_out"]
+    logger.info(
+        f"Summaries: {stats['summaries_reused']} reused from the ledger (LLM calls skipped), "
+        f"{stats['summary_llm_calls']} sent for summarization"
+    )
+    logger.info(
+        f"Embedded {run_summary['stages']['embed']['records_out']} opportunities with {batcher.requests_made} "
+        f"embedding requests ({batcher.cache_hits} served from cache)"
+    )
+
+    # Post-load steps
+    if processed:
+        # Return detailed results exactly as in original code
+        db_results = {
+            "source": "csv_import", 
+            "total_fetched": total_processed,
+            "processed": processed,
+            "inserted": stats["inserted"],
+            "skipped": stats["skipped"],
+            "summaries_reused": stats["summaries_reused"],
+            "summary_llm_calls": stats["summary_llm_calls"],
+            "error": stats["error"],
+            "pipeline": run_summary,
+        }
+        
+        # Vector refresh: drain rows still missing embeddings through the backfill queue
+        try:
+            backfill = await run_backfill(workers=BACKFILL_WORKERS)
+            db_results["indexed_count"] = backfill["embedded"]
+            db_results["embedding_backfill"] = backfill
+        except Exception as e:
+            # logger.error(f"Error during embedding backfill: {e}")
+            db_results["indexing_error"] = str(e)
+
+        # --- Post-ETL: Mark records as inactive if not in latest CSV fetch (server-side anti-join) ---
+        try:
+            if latest_notice_ids:
+                db_results["marked_inactive"] = mark_missing_inactive(latest_notice_ids)
+            else:
+                logger.warning("No notice_ids found in latest CSV fetch for inactive marking step.")
+        except Exception as e:
+            # logger.error(f"Error during post-ETL inactive marking step: {e}")
+            db_results["inactive_marking_error"] = str(e)
+            
+        return db_results
+    
+    return {"source": "csv_import", "count": 0, "status": "No opportunities found", "pipeline": run_summary}
+
+async def import_from_csv(csv_file_path: str = None, resume: bool = False, run_id: str = None) -> Dict[str, Any]:
     """
     Main function to import opportunities from CSV file.
     
     Args:
         csv_file_path: Path to the CSV file. If None, uses default path.
+        resume: Continue an interrupted import (see process_csv_file)
+        run_id: Pipeline checkpoint id
         
     Returns:
         Dictionary with results summary
@@ -677,7 +841,7 @@ async def import_from_csv(csv_file_path: str = None) -> Dict[str, Any]:
     # logger.info(f"Starting CSV import process from: {csv_file_path}")
     
     # Process the CSV file
-    result = await process_csv_file(csv_file_path)
+    result = await process_csv_file(csv_file_path, resume=resume, run_id=run_id)
     
     # logger.info(f"CSV import process complete: {result}")
     return result
@@ -690,6 +854,8 @@ def parse_args():
     parser.add_argument('--record-id', type=int, help='ETL record ID')
     parser.add_argument('--trigger-type', type=str, help='Trigger type (scheduled or manual)')
     parser.add_argument('--csv-path', type=str, help='Path to CSV file')
+    parser.add_argument('--resume', action='store_true', help='Skip opportunities already loaded by an interrupted run')
+    parser.add_argument('--run-id', type=str, help='Pipeline checkpoint id to resume (default: today)')
     return parser.parse_args()
 
 # For running as a script (exactly as in original)
@@ -701,7 +867,9 @@ if __name__ == "__main__":
         logger.info(f"Running with ETL record ID: {args.record_id}, trigger type: {args.trigger_type}")
     
     # Run the async function
-    result = asyncio.run(import_from_csv(args.csv_path))
+    result = asyncio.run(import_from_csv(args.csv_path, resume=args.resume, run_id=args.run_id))
+    if result.get("pipeline"):
+        record_pipeline_run(result["pipeline"], args.record_id, args.trigger_type)
     
     # Calculate counts for output (exactly as in original)
     count = result.get("total_fetched", 0)
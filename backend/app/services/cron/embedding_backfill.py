@@ -0,0 +1,400 @@
+"""
+Embedding backfill worker for ai_enhanced_opportunities.
+
+Rows without an embedding are claimed in batches with a lease: a short
+transaction picks rows with FOR UPDATE SKIP LOCKED, stamps embedding_last_attempt_at
+and commits, so any number of workers (coroutines here, or separate processes/jobs)
+can drain the queue side by side without embedding the same row twice. The
+embedding call runs outside any transaction and results are written in a second
+short one; a worker that dies mid-batch releases its rows when the lease
+(BACKFILL_RETRY_AFTER_SECONDS) runs out. Each failure bumps embedding_attempts;
+after BACKFILL_MAX_ATTEMPTS the row is quarantined and no longer claimed, so a bad
+row can't stall the queue.
+
+Without direct database credentials (DB_HOST) the backfill runs as a single
+worker over Supabase REST with the same attempt and quarantine bookkeeping.
+
+Usage:
+    python services/cron/embedding_backfill.py --workers 4 --batch-size 200
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the backend directory to Python path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if app_dir not in sys.path:
+    sys.path.insert(0, app_dir)
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from config.settings import DB_HOST
+from utils.db_utils import get_db_connection, get_supabase_connection
+from utils.logger import get_logger
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_cache import get_embedding_cache
+
+logger = get_logger(__name__)
+
+EMBED_MODEL = "text-embedding-3-small"
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "200"))
+BACKFILL_MAX_ATTEMPTS = int(os.getenv("BACKFILL_MAX_ATTEMPTS", "5"))
+# A claimed or failed row is not claimed again until this many seconds have passed
+# (the claim lease; must outlast one batch's embedding call with its retries)
+BACKFILL_RETRY_AFTER_SECONDS = int(os.getenv("BACKFILL_RETRY_AFTER_SECONDS", "900"))
+
+# Columns that make up the embedding text, in order
+EMBEDDING_SOURCE_COLUMNS = [
+    "notice_id", "title", "department", "naics_code", "description", "url",
+    "objective", "expected_outcome", "eligibility", "key_facts", "response_date", "due_date",
+    "sub_departments", "funding", "point_of_contact", "published_date", "active",
+]
+
+
+def _canonicalize_value(v):
+    if v is None:
+        return ""
+    if isinstance(v, (list, tuple)):
+        return ", ".join(str(x) for x in v if x is not None)
+    if isinstance(v, dict):
+        return "; ".join(f"{k}={_canonicalize_value(v[k])}" for k in sorted(v.keys()))
+    return str(v)
+
+def build_embedding_text_full_row(opp: Dict[str, Any]) -> str:
+    """Create canonical text from the entire row to embed the whole record."""
+    fields_in_order = [
+        "title","description","objective","expected_outcome","eligibility","key_facts",
+        "department","sub_departments","naics_code","classification_code",
+        "published_date","response_date","due_date","funding","solicitation_number",
+        "notice_id","url","point_of_contact","active"
+    ]
+    lines, seen = [], set()
+    for f in fields_in_order:
+        if f in opp:
+            seen.add(f)
+            lines.append(f"{f}: {_canonicalize_value(opp.get(f))}")
+    for k, v in opp.items():
+        if k in seen:
+            continue
+        lines.append(f"{k}: {_canonicalize_value(v)}")
+    return "\n".join(lines)[:20000]
+
+
+def claim_batch(cursor, batch_size: int, retry_after_seconds: int) -> List[Dict[str, Any]]:
+    """
+    Lease up to batch_size unembedded, unquarantined rows whose lease has expired by
+    stamping embedding_last_attempt_at; the caller commits right away.
+    """
+    cursor.execute(
+        f"""
+        UPDATE ai_enhanced_opportunities AS o
+        SET embedding_last_attempt_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT id
+            FROM ai_enhanced_opportunities
+            WHERE embedding IS NULL
+              AND embedding_quarantined_at IS NULL
+              AND (embedding_last_attempt_at IS NULL
+                   OR embedding_last_attempt_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ) AS claimed
+        WHERE o.id = claimed.id
+        RETURNING {", ".join(f"o.{c}" for c in ["id"] + EMBEDDING_SOURCE_COLUMNS)}
+        """,
+        (retry_after_seconds, batch_size),
+    )
+    return cursor.fetchall()
+
+
+def record_embeddings(cursor, embedded: List[Tuple[int, str, List[float]]]) -> int:
+    if not embedded:
+        return 0
+    execute_values(
+        cursor,
+        """
+        UPDATE ai_enhanced_opportunities AS o
+        SET embedding = v.embedding::vector,
+            embedding_text = v.embedding_text,
+            embedding_model = v.embedding_model,
+            embedding_version = 1,
+            embedding_attempts = 0,
+            embedding_last_error = NULL,
+            embedding_last_attempt_at = CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS v(id, embedding_text, embedding, embedding_model)
+        WHERE o.id = v.id AND o.embedding IS NULL
+        """,
+        [
+            (row_id, text, json.dumps(vector, separators=(",", ":")), EMBED_MODEL)
+            for row_id, text, vector in embedded
+        ],
+    )
+    return len(embedded)
+
+
+def record_failures(cursor, failed: List[Tuple[int, str]], max_attempts: int) -> int:
+    """
+    Bump attempts for failed rows (cursor must be a RealDictCursor); returns how
+    many crossed max_attempts and were quarantined.
+    """
+    if not failed:
+        return 0
+    rows = execute_values(
+        cursor,
+        """
+        UPDATE ai_enhanced_opportunities AS o
+        SET embedding_attempts = o.embedding_attempts + 1,
+            embedding_last_error = v.error,
+            embedding_last_attempt_at = CURRENT_TIMESTAMP,
+            embedding_quarantined_at = CASE
+                WHEN o.embedding_attempts + 1 >= %d THEN CURRENT_TIMESTAMP ELSE NULL END
+        FROM (VALUES %%s) AS v(id, error)
+        WHERE o.id = v.id
+        RETURNING o.embedding_quarantined_at IS NOT NULL AS quarantined
+        """ % max_attempts,
+        [(row_id, error[:1000]) for row_id, error in failed],
+        fetch=True,
+    )
+    return sum(1 for row in rows if row["quarantined"])
+
+
+def backlog_counts(cursor) -> Dict[str, int]:
+    cursor.execute("""
+        SELECT
+            count(*) FILTER (WHERE embedding IS NULL AND embedding_quarantined_at IS NULL) AS pending,
+            count(*) FILTER (WHERE embedding_quarantined_at IS NOT NULL) AS quarantined
+        FROM ai_enhanced_opportunities
+    """)
+    pending, quarantined = cursor.fetchone()
+    return {"pending": pending, "quarantined": quarantined}
+
+
+async def _embed_rows(worker_id, batcher: EmbeddingBatcher, rows, texts):
+    """Embed claimed rows; returns ([(id, text, vector)], [(id, error)])."""
+    try:
+        vectors = await batcher.embed_many(texts)
+    except Exception as e:
+        logger.error(f"[worker {worker_id}] embedding batch failed: {e}")
+        vectors = [None] * len(rows)
+    embedded, failed = [], []
+    for r, text, vector in zip(rows, texts, vectors):
+        if vector is None:
+            failed.append((r["id"], "embedding request failed"))
+        else:
+            embedded.append((r["id"], text, vector))
+    return embedded, failed
+
+
+def _log_batch(worker_id, metrics, claimed, done, failed, quarantined) -> None:
+    metrics["claimed"] += claimed
+    metrics["embedded"] += done
+    metrics["failed"] += failed
+    metrics["quarantined"] += quarantined
+    elapsed = time.perf_counter() - metrics["_started"]
+    logger.info(
+        f"[worker {worker_id}] batch of {claimed}: embedded={done} failed={failed} "
+        f"quarantined={quarantined} | total embedded={metrics['embedded']} "
+        f"({metrics['embedded'] / elapsed:.1f} rows/s)"
+    )
+
+
+async def _worker(
+    worker_id: int,
+    batcher: EmbeddingBatcher,
+    metrics: Dict[str, Any],
+    batch_size: int,
+    max_attempts: int,
+    retry_after_seconds: int,
+    max_batches: Optional[int],
+) -> None:
+    conn = await asyncio.to_thread(get_db_connection)
+
+    def _in_transaction(fn):
+        # One short transaction; no locks or open transaction outlive the call
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                result = fn(cursor)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    try:
+        while max_batches is None or metrics["batches"] < max_batches:
+            metrics["batches"] += 1
+            rows = await asyncio.to_thread(
+                _in_transaction, lambda cursor: claim_batch(cursor, batch_size, retry_after_seconds)
+            )
+            if not rows:
+                metrics["batches"] -= 1
+                return
+
+            texts = [build_embedding_text_full_row({c: r[c] for c in EMBEDDING_SOURCE_COLUMNS}) for r in rows]
+            embedded, failed = await _embed_rows(worker_id, batcher, rows, texts)
+
+            def _write(cursor):
+                return record_embeddings(cursor, embedded), record_failures(cursor, failed, max_attempts)
+
+            done, quarantined = await asyncio.to_thread(_in_transaction, _write)
+            _log_batch(worker_id, metrics, len(rows), done, len(failed), quarantined)
+    finally:
+        conn.close()
+
+
+async def _rest_worker(
+    batcher: EmbeddingBatcher,
+    metrics: Dict[str, Any],
+    batch_size: int,
+    max_attempts: int,
+    retry_after_seconds: int,
+    max_batches: Optional[int],
+) -> None:
+    """Single-worker backfill over Supabase REST, for deployments without DB_HOST."""
+    supabase = get_supabase_connection(use_service_key=True)
+
+    def table():
+        return supabase.table("ai_enhanced_opportunities")
+
+    while max_batches is None or metrics["batches"] < max_batches:
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=retry_after_seconds)).isoformat()
+        resp = await asyncio.to_thread(
+            lambda: table()
+            .select(", ".join(["id", "embedding_attempts"] + EMBEDDING_SOURCE_COLUMNS))
+            .is_("embedding", None)
+            .is_("embedding_quarantined_at", None)
+            .or_(f"embedding_last_attempt_at.is.null,embedding_last_attempt_at.lt.{cutoff}")
+            .order("id")
+            .limit(batch_size)
+            .execute()
+        )
+        rows = getattr(resp, "data", None) or []
+        if not rows:
+            return
+        metrics["batches"] += 1
+
+        texts = [build_embedding_text_full_row({c: r.get(c) for c in EMBEDDING_SOURCE_COLUMNS}) for r in rows]
+        embedded, failed = await _embed_rows("rest", batcher, rows, texts)
+        now = datetime.now(timezone.utc).isoformat()
+        attempts = {r["id"]: (r.get("embedding_attempts") or 0) + 1 for r in rows}
+
+        def _write():
+            if embedded:
+                table().upsert([
+                    {
+                        "id": row_id, "embedding_text": text, "embedding": vector,
+                        "embedding_model": EMBED_MODEL, "embedding_version": 1,
+                        "embedding_attempts": 0, "embedding_last_error": None, "embedding_last_attempt_at": now,
+                    }
+                    for row_id, text, vector in embedded
+                ], on_conflict="id").execute()
+            # Failed rows are stamped, so the next select moves past them
+            for row_id, error in failed:
+                table().update({
+                    "embedding_attempts": attempts[row_id],
+                    "embedding_last_error": error[:1000],
+                    "embedding_last_attempt_at": now,
+                    "embedding_quarantined_at": now if attempts[row_id] >= max_attempts else None,
+                }).eq("id", row_id).execute()
+            return sum(1 for row_id, _ in failed if attempts[row_id] >= max_attempts)
+
+        quarantined = await asyncio.to_thread(_write)
+        _log_batch("rest", metrics, len(rows), len(embedded), len(failed), quarantined)
+
+
+def backlog_counts_rest() -> Dict[str, int]:
+    supabase = get_supabase_connection(use_service_key=True)
+    pending = (
+        supabase.table("ai_enhanced_opportunities").select("id", count="exact").is_("embedding", None).is_("embedding_quarantined_at", None)
+        .limit(1).execute().count
+    )
+    quarantined = (
+        supabase.table("ai_enhanced_opportunities").select("id", count="exact")
+        .not_.is_("embedding_quarantined_at", None).limit(1).execute().count
+    )
+    return {"pending": pending or 0, "quarantined": quarantined or 0}
+
+
+async def run_backfill(
+    workers: int = 1,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    max_attempts: int = BACKFILL_MAX_ATTEMPTS,
+    retry_after_seconds: int = BACKFILL_RETRY_AFTER_SECONDS,
+    max_batches: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Drain the embedding backlog with `workers` concurrent claimers.
+
+    Returns:
+        metrics: claimed, embedded, failed, quarantined, batches, requests, cache_hits,
+        elapsed_seconds, rows_per_second, and the remaining pending/quarantined backlog
+    """
+    batcher = EmbeddingBatcher(model=EMBED_MODEL, max_concurrency=EMBED_CONCURRENCY, cache=get_embedding_cache())
+    metrics: Dict[str, Any] = {
+        "claimed": 0, "embedded": 0, "failed": 0, "quarantined": 0, "batches": 0,
+        "_started": time.perf_counter(),
+    }
+    if DB_HOST:
+        await asyncio.gather(*(
+            _worker(i, batcher, metrics, batch_size, max_attempts, retry_after_seconds, max_batches)
+            for i in range(max(1, workers))
+        ))
+    else:
+        logger.warning("DB_HOST not set; running the embedding backfill as one worker over Supabase REST")
+        await _rest_worker(batcher, metrics, batch_size, max_attempts, retry_after_seconds, max_batches)
+
+    elapsed = time.perf_counter() - metrics.pop("_started")
+    metrics["requests"] = batcher.requests_made
+    metrics["cache_hits"] = batcher.cache_hits
+    metrics["elapsed_seconds"] = round(elapsed, 2)
+    metrics["rows_per_second"] = round(metrics["embedded"] / elapsed, 1) if elapsed > 0 else 0.0
+
+    if DB_HOST:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                metrics["backlog"] = backlog_counts(cursor)
+        finally:
+            conn.close()
+    else:
+        metrics["backlog"] = backlog_counts_rest()
+    logger.info(f"Embedding backfill finished: {metrics}")
+    return metrics
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill missing opportunity embeddings")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent claim/embed loops")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument("--max-attempts", type=int, default=BACKFILL_MAX_ATTEMPTS,
+                        help="Failures before a row is quarantined")
+    parser.add_argument("--retry-after", type=int, default=BACKFILL_RETRY_AFTER_SECONDS,
+                        help="Seconds before a failed row is claimed again")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = asyncio.run(run_backfill(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        max_attempts=args.max_attempts,
+        retry_after_seconds=args.retry_after,
+        max_batches=args.max_batches,
+    ))
+    print(json.dumps(result))
@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import hashlib
 
 # Add the backend directory to Python path
 backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -13,10 +14,7 @@ if app_dir not in sys.path:
 
 import urllib.parse
 from typing import Dict, Any
-import aiohttp
-import ssl
-import certifi
-from datetime import datetime, timedelta
+from datetime import datetime
 import asyncio
 import psycopg2
 from dotenv import load_dotenv
@@ -26,208 +24,31 @@ load_dotenv()
 
 from utils.logger import get_logger
 from utils.db_utils import get_db_connection
-from services.summary_service import fetch_description_from_sam, generate_description_summary
+from services.summary_service import generate_description_summary
+from utils.sam_client import SamClient, SAM_SEARCH_URL, SAM_API_CONCURRENCY
+from utils.description_cache import close_description_cache, get_description_cache
+from services.cron.sync_state import load_watermarks, save_watermark, sync_window
+from services.cron.bulk_loader import bulk_upsert_opportunities, deactivate_missing_opportunities
+from services.cron.pipeline import Pipeline, PipelineError, Stage
+from services.cron.update_etl_history import record_pipeline_run
 
 # Configure logging
 logger = get_logger(__name__)
 
 # === Database Functions (from database.py) ===
 
-def check_duplicate(cursor, notice_id):
-    """
-    Check if a record with the given notice_id already exists in the database.
-    
-    Args:
-        cursor: Database cursor
-        notice_id: The notice_id to check
-        
-    Returns:
-        bool: True if the record exists, False otherwise
-    """
-    query = "SELECT 1 FROM ai_enhanced_opportunities WHERE notice_id = %s LIMIT 1"
-    cursor.execute(query, (notice_id,))
-    return cursor.fetchone() is not None
-
-def deduplicate_solicitation_number(cursor, solicitation_number, archived_by="dedup_script"):
-    """
-    Detects duplicates for a given solicitation_number in ai_enhanced_opportunities.
-    If more than one exists, moves all except the latest (by id) to ai_enhanced_opportunities_history.
-    
-    Args:
-        cursor: psycopg2 cursor
-        solicitation_number: The solicitation_number to check
-        archived_by: Optional, sets who archived the record
-    """
-    
-    # Step 1: Get all matching IDs ordered by id descending (latest first)
-    fetch_query = """
-        SELECT id FROM ai_enhanced_opportunities
-        WHERE solicitation_number = %s
-        ORDER BY id DESC
-    """
-    cursor.execute(fetch_query, (solicitation_number,))
-    rows = cursor.fetchall()
-    
-    # If 0 or 1 records, nothing to do
-    if len(rows) <= 1:
-        return False  # No duplicates found
-
-    # Keep the first (latest), archive the rest
-    ids_to_archive = [row[0] for row in rows[1:]]  # Skip latest
-
-    # Step 2: Move to history
-    insert_query = f"""
-        INSERT INTO ai_enhanced_opportunities_history (
-            id, notice_id, solicitation_number, title, department,
-            naics_code, published_date, response_date, description,
-            url, active, created_at, updated_at, additional_description,
-            archived_at, archived_by, objective, expected_outcome, eligibility,
-            key_facts, due_date, funding, point_of_contact, sub_departments
-        )
-        SELECT
-            id, notice_id, solicitation_number, title, department,
-            naics_code, published_date, response_date, description,
-            url, active, created_at, updated_at, additional_description,
-            CURRENT_TIMESTAMP, %s, objective, expected_outcome, eligibility,
-            key_facts, due_date, funding, point_of_contact, sub_departments
-        FROM ai_enhanced_opportunities
-        WHERE id = ANY(%s)
-    """
-    cursor.execute(insert_query, (archived_by, ids_to_archive))
-
-    # Step 3: Delete from ai_enhanced_opportunities
-    delete_query = "DELETE FROM ai_enhanced_opportunities WHERE id = ANY(%s)"
-    cursor.execute(delete_query, (ids_to_archive,))
-
-    return True  # Duplicates handled
-
-def upsert_with_history(cursor, row, archived_by="upsert_script"):
-    """
-    Upsert a record into ai_enhanced_opportunities. If a record with the same notice_id exists and any field changes, move the old record to ai_enhanced_opportunities_history before inserting the new one.
-    """
-    # 1. Check if record exists
-    cursor.execute("SELECT * FROM ai_enhanced_opportunities WHERE notice_id = %s", (row["notice_id"],))
-    existing = cursor.fetchone()
-
-    # By default, we don't insert. We only insert if the record is new,
-    # or if it has changed and the old version has been deleted.
-    should_insert = False
-
-    if not existing:
-        # Case 1: Record is new. We should insert it.
-        should_insert = True
-    else:
-        # Case 2: Record exists. Check for changes.
-        colnames = [desc[0] for desc in cursor.description]
-        changed = False
-        for idx, colname in enumerate(colnames):
-            api_val = row.get(colname)
-            db_val = existing[idx]
-            
-            # psycopg2 returns date objects for date columns.
-            # Our `parse_date` also creates date objects, so types should match.
-            if colname in row and api_val != db_val:
-                logger.info(f"Change detected for notice_id {row['notice_id']} in field '{colname}'. DB: '{db_val}', API: '{api_val}'")
-                changed = True
-                break
-        
-        if changed:
-            # If changed, move old record to history...
-            insert_history_query = """
-                INSERT INTO ai_enhanced_opportunities_history (
-                    id, notice_id, solicitation_number, title, department,
-                    naics_code, published_date, response_date, description,
-                    url, active, created_at, updated_at, additional_description,
-                    archived_at, archived_by, objective, expected_outcome, eligibility,
-                    key_facts, due_date, funding, point_of_contact, sub_departments
-                )
-                SELECT
-                    id, notice_id, solicitation_number, title, department,
-                    naics_code, published_date, response_date, description,
-                    url, active, created_at, updated_at, additional_description,
-                    CURRENT_TIMESTAMP, %s, objective, expected_outcome, eligibility,
-                    key_facts, due_date, funding, point_of_contact, sub_departments
-                FROM ai_enhanced_opportunities WHERE notice_id = %s
-            """
-            cursor.execute(insert_history_query, (archived_by, row["notice_id"]))
-            
-            # ...delete the old record...
-            cursor.execute("DELETE FROM ai_enhanced_opportunities WHERE notice_id = %s", (row["notice_id"],))
-            
-            # ...and flag that the new version should be inserted.
-            should_insert = True
-    
-    # 3. Insert new/updated record ONLY if it's new or has changed.
-    if should_insert:
-        insert_query = """
-            INSERT INTO ai_enhanced_opportunities
-            (title, department, published_date, response_date, naics_code, description,
-             notice_id, solicitation_number, url, active, objective, expected_outcome, eligibility,
-             key_facts, due_date, funding, point_of_contact, sub_departments)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (
-            row["title"],
-            row["department"],
-            row["published_date"],
-            row["response_date"],
-            row["naics_code"],
-            row["description"],
-            row["notice_id"],
-            row["solicitation_number"],
-            row["url"],
-            row["active"],
-            row["objective"],
-            row["expected_outcome"],
-            row["eligibility"],
-            row["key_facts"],
-            row["due_date"],
-            row["funding"],
-            row["point_of_contact"],
-            row["sub_departments"]
-        ))
-
-
 def insert_data(rows):
     """
-    Inserts or updates multiple rows into the ai_enhanced_opportunities table, moving old records to history if any field changes.
+    Upserts rows into the ai_enhanced_opportunities table in one set-based pass: changed rows (by row_hash)
+    are archived to history and replaced, and duplicate solicitation numbers are collapsed.
     """
-    connection = get_db_connection()
-    if not connection:
-        return {"error": "Could not connect to database", "inserted": 0, "skipped": 0}
-    
-    inserted = 0
-    skipped = 0
-    
     try:
-        with connection.cursor() as cursor:
-            for row in rows:
-                notice_id = row.get("notice_id")
-                # Skip if notice_id is missing
-                if not notice_id:
-                    logger.warning("Skipping row with missing notice_id")
-                    skipped += 1
-                    continue
-                try:
-                    upsert_with_history(cursor, row)
-                    inserted += 1
-                    # Deduplicate any old solicitation_number entries before inserting new one
-                    solicitation_number = row.get("solicitation_number")
-                    if solicitation_number:
-                        deduplicate_solicitation_number(cursor, solicitation_number)
-                except Exception as e:
-                    logger.error(f"Error upserting record {notice_id}: {e}")
-                    skipped += 1
-                    continue
-        connection.commit()
-        logger.info(f"Database upsert complete. Inserted/Updated: {inserted}, Skipped: {skipped}")
-        return {"inserted": inserted, "skipped": skipped}
+        result = bulk_upsert_opportunities(rows)
     except Exception as e:
-        connection.rollback()
         logger.error(f"Error during database transaction: {e}")
-        return {"error": str(e), "inserted": inserted, "skipped": skipped}
-    finally:
-        connection.close()
+        return {"error": str(e), "inserted": 0, "skipped": 0}
+    logger.info(f"Database upsert complete. Inserted/Updated: {result['inserted']}, Skipped: {result['skipped']}")
+    return result
 
 # === SAM.gov Functions ===
 
@@ -247,9 +68,172 @@ def truncate_string(text, max_length=255):
         return text
     return text[:max_length]
 
-async def fetch_opportunities() -> Dict[str, Any]:
+SYNC_SOURCE = "enhanced_sam_gov"
+# Top NAICS codes to search (from our Colab implementation): "541512,541611,541519,541715,518210"
+NAICS_CODES = [c.strip() for c in os.getenv("SAM_NAICS_CODES", "541512").split(",") if c.strip()]
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+# Notices per stored-version lookup and per bulk upsert
+COMPARE_BATCH_SIZE = 500
+LOAD_BATCH_SIZE = 500
+
+async def fetch_naics_window(sam: SamClient, naics: str, posted_from, posted_to, page_size: int = 1000):
+    """
+    Page through one NAICS code's posted-date window.
+
+    Returns:
+        (opportunities, complete) where complete is False if paging stopped on an error
+    """
+    opportunities = []
+    offset = 0
+    while True:
+        params = {
+            "ncode": naics,
+            "postedFrom": posted_from.strftime('%m/%d/%Y'),
+            "postedTo": posted_to.strftime('%m/%d/%Y'),
+            "limit": page_size,
+            "offset": offset,
+            "ptype": "o,k,p,r,s" # Only contract opportunity types
+        }
+        log_url = f"{SAM_SEARCH_URL}?{urllib.parse.urlencode(params, safe='/')}"
+        logger.info(f"NAICS {naics} (offset {offset}): fetching {log_url}")
+
+        try:
+            status, data = await sam.search(params)
+        except Exception as e:
+            logger.error(f"Exception for NAICS {naics} (offset {offset}): {str(e)}")
+            return opportunities, False
+        if status != 200 or not isinstance(data, dict):
+            logger.error(f"Error fetching for NAICS {naics} (offset {offset}): HTTP {status}")
+            return opportunities, False
+
+        current_opps = data.get("opportunitiesData", [])
+        for opp in current_opps:
+            # Add NAICS code to each opportunity for reference
+            opp['naics_code'] = naics
+        opportunities.extend(current_opps)
+        logger.info(f"Fetched {len(current_opps)} opportunities for NAICS {naics} (offset {offset}), total {len(opportunities)}")
+
+        # If less than limit, this is the last page
+        if len(current_opps) < page_size:
+            return opportunities, True
+        offset += page_size
+
+# Columns filled from the search payload alone, and the ones derived from the description text
+SEARCH_COLUMNS = [
+    "notice_id", "solicitation_number", "title", "department", "naics_code", "published_date",
+    "response_date", "url", "point_of_contact", "active", "sub_departments",
+]
+SUMMARY_COLUMNS = ["objective", "expected_outcome", "eligibility", "key_facts", "due_date", "funding"]
+
+def search_fields(opp):
+    """The table columns a notice's search payload determines."""
+    # Get NAICS code (integer)
+    naics = opp.get("naics_code")
+    if naics:
+        try:
+            naics = int(naics)
+        except ValueError:
+            naics = None
+
+    notice_id = str(opp.get("noticeId", "")).strip()
+    return {
+        "notice_id": notice_id,
+        "solicitation_number": opp.get("solicitationNumber"),
+        "title": truncate_string(opp.get("title", "No title")),
+        "department": opp.get("fullParentPathName", opp.get("department", "")).split(".")[0],
+        "naics_code": naics,
+        "published_date": parse_date(opp.get("postedDate")),
+        "response_date": parse_date(opp.get("responseDeadLine")),
+        "url": f"https://sam.gov/opp/{notice_id}/view" if notice_id else None,
+        "point_of_contact": opp.get("pointOfContact", ""),
+        "active": True if str(opp.get("active", "Yes")).strip().lower() == "yes" else False,
+        "sub_departments": ", ".join(opp.get("fullParentPathName", opp.get("department", "")).split(".")[1:]),
+    }
+
+def search_payload_hash(opp) -> str:
+    """Fingerprint of the raw search payload; versions the cached description text."""
+    payload = {k: v for k, v in opp.items() if not k.startswith("_")}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+async def build_opportunity_row(opp):
+    """
+    Format a fetched notice (with its description text) for the table and add its AI summary.
+    A stored, non-empty summary is reused when the description text is the one already stored.
+    """
+    description = opp.get("_description_text", "")
+    # Format data to match table schema
+    row = {
+        **search_fields(opp),
+        "description": description,
+        "objective": "",
+        "expected_outcome": "",
+        "eligibility": "",
+        "key_facts": "",
+        "due_date": "",
+        "funding": ""
+    }
+    stored = opp.get("_stored")
+    if stored and stored.get("description") == description and any(stored.get(c) for c in SUMMARY_COLUMNS):
+        for column in SUMMARY_COLUMNS:
+            row[column] = stored.get(column)
+        return row
+    if not description:
+        # Notice without a description URL: nothing to summarize
+        return row
+    summary = await generate_description_summary("description: "+description+"\n"+opp.get("data", ""))
+    # A failed summary comes back as a plain message string; raising drops the notice
+    # instead of storing empty summary fields that would be reused as-is
+    if not isinstance(summary, dict):
+        raise RuntimeError(f"Summary failed for notice {row['notice_id']}: {summary}")
+    summary = summary.get("summary", {})
+    row["objective"] = summary.get("objective", "")
+    row["expected_outcome"] = summary.get("goal", "")
+    row["eligibility"] = summary.get("eligibility", "")
+    row["key_facts"] = summary.get("key_facts", "")
+    # this is in YYYY-MM-DD format, extract as date type
+    due_date_str = summary.get("due_date", "")
+    row["due_date"] = parse_date(due_date_str) if due_date_str else None
+    row["funding"] = summary.get("budget", "")
+    return row
+
+def attach_stored_versions(opportunities):
+    """
+    Attach each notice's stored row and flag notices whose search fields all match it.
+
+    Unchanged notices reuse a non-empty stored description and summary instead of fetching
+    and summarizing again, but still go through the load (a no-op when row_hash matches).
+    A failed lookup treats every notice as changed.
+    """
+    notice_ids = list({str(o.get("noticeId", "")).strip() for o in opportunities if o.get("noticeId")})
+    stored = {}
+    if notice_ids:
+        columns = SEARCH_COLUMNS + ["description"] + SUMMARY_COLUMNS
+        try:
+            connection = get_db_connection()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT {', '.join(columns)} FROM ai_enhanced_opportunities WHERE notice_id = ANY(%s)",
+                        (notice_ids,),
+                    )
+                    stored = {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+            finally:
+                connection.close()
+        except Exception as e:
+            logger.warning(f"Stored version lookup failed, treating {len(notice_ids)} notices as changed: {e}")
+    for opp in opportunities:
+        row = stored.get(str(opp.get("noticeId", "")).strip())
+        fields = search_fields(opp)
+        opp["_stored"] = row
+        opp["_unchanged"] = row is not None and all(row[c] == fields[c] for c in SEARCH_COLUMNS)
+    return opportunities
+
+async def fetch_opportunities(full: bool = False) -> Dict[str, Any]:
     """
     Fetch opportunities from SAM.gov API for multiple NAICS codes and save to database.
+
+    Each NAICS code only requests the window since its persisted watermark (minus a
+    small overlap); `full` re-requests the whole SAM_SYNC_FULL_WINDOW_DAYS window.
     
     Returns:
         Dictionary with results summary
@@ -262,207 +246,167 @@ async def fetch_opportunities() -> Dict[str, Any]:
         logger.error("SAM.gov API key not found in environment variables.")
         return {"source": "sam.gov", "count": 0, "error": "API key missing"}
 
-    base_url = "https://api.sam.gov/prod/opportunities/v2/search"
-    
-    # Fetch a full year window
-    posted_to = datetime.now().strftime('%m/%d/%Y')
-    posted_from = (datetime.now() - timedelta(days=180)).strftime('%m/%d/%Y')
-    
-    logger.info(f"Searching for opportunities from {posted_from} to {posted_to}")
+    today = datetime.now().date()
+    try:
+        watermarks = load_watermarks(SYNC_SOURCE)
+    except Exception as e:
+        logger.warning(f"Could not load sync watermarks, fetching full window: {e}")
+        watermarks = {}
+    windows = {naics: sync_window(watermarks.get(naics), today, full) for naics in NAICS_CODES}
+    for naics, (posted_from, posted_to, is_full) in windows.items():
+        logger.info(f"NAICS {naics}: requesting {posted_from} to {posted_to} ({'full window' if is_full else 'incremental'})")
 
-    # Top NAICS codes to search (from our Colab implementation)
-    # naics_list = ["541512", "541611", "541519","541715","518210"]
-    naics_list = ["541512"]#, "541611", "541519","541715","518210"]
-    
-    all_opportunities = []  # Store all collected opportunities here
-    total_fetched = 0
-    records_per_naics = 1000  # Number of records per API call (max allowed)
-
-    for i, naics in enumerate(naics_list, 1):
-        offset = 0
-        fetched_for_naics = 0
-        while True:
-            params = {
-                "api_key": api_key,
-                "ncode": naics,
-                "postedFrom": posted_from,
-                "postedTo": posted_to,
-                "limit": records_per_naics,  # Only request what we need
-                "offset": offset,
-                "ptype": "o,k,p,r,s" # Only contract opportunity types
-            }
-            
-            log_params = params.copy()
-            log_params["api_key"] = "***REDACTED***"
-            log_url = f"{base_url}?{urllib.parse.urlencode(log_params, safe='/')}"
-            logger.info(f"Call {i}/{len(naics_list)} (offset {offset}): Fetching for NAICS {naics} from {log_url}")
-
-            ssl_context = ssl.create_default_context(cafile=certifi.where())
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(base_url, params=params, ssl=ssl_context, timeout=60) as response:
-                        response_text = await response.text()
-                        if response.status == 200:
-                            try:
-                                data = await response.json()
-                                current_opps = data.get("opportunitiesData", [])
-                                
-                                if not current_opps:
-                                    logger.info(f"No more contract opportunities found for NAICS {naics} at offset {offset}")
-                                    break
-                                
-                                # Add NAICS code to each opportunity for reference
-                                for opp in current_opps:
-                                    opp['naics_code'] = naics
-                                
-                                all_opportunities.extend(current_opps)
-                                fetched_for_naics += len(current_opps)
-                                total_fetched += len(current_opps)
-                                logger.info(f"Fetched {len(current_opps)} opportunities for NAICS {naics} (offset {offset}), Total for NAICS: {fetched_for_naics}, Grand Total: {total_fetched}")
-                                
-                                # If less than limit, this is the last page
-                                if len(current_opps) < records_per_naics:
-                                    break
-                                else:
-                                    offset += records_per_naics
-                                
-                            except Exception as json_error:
-                                logger.error(f"Error parsing JSON response: {json_error}")
-                                logger.error(f"Response text: {response_text[:500]}")
-                                break
-                        elif response.status == 429:
-                            logger.error("Rate limit exceeded. Sleeping for 1 hour.")
-                            await asyncio.sleep(3600)
-                            continue
-                        else:
-                            logger.error(f"Error fetching for NAICS {naics} (offset {offset}): HTTP {response.status} - {response_text}")
-                            break
-                # Add a delay between requests to respect rate limits
-                await asyncio.sleep(1)
-            except Exception as e:
-                logger.error(f"Exception for NAICS {naics} (offset {offset}): {str(e)}")
-                break
-
-    # Format data for database insertion
-    if all_opportunities:
-        rows = []
-        for opp in all_opportunities:
-            # Get NAICS code (integer)
-            naics = opp.get("naics_code")
-            if naics:
-                try:
-                    naics = int(naics)
-                except ValueError:
-                    naics = None
-            
-            notice_id = str(opp.get("noticeId", "")).strip()
-            description = opp.get("description", "")
-            description = await fetch_description_from_sam(description) if description else ""
-            # Format data to match table schema
-            row = {
-                "notice_id": notice_id,
-                "solicitation_number": opp.get("solicitationNumber"),
-                "title": truncate_string(opp.get("title", "No title")),
-                "department": opp.get("fullParentPathName", opp.get("department", "")).split(".")[0],
-                "naics_code": naics,
-                "published_date": parse_date(opp.get("postedDate")),
-                "response_date": parse_date(opp.get("responseDeadLine")),
-                "description": description,
-                "url": f"https://sam.gov/opp/{notice_id}/view" if notice_id else None,
-                "point_of_contact": opp.get("pointOfContact", ""),
-                "active": True if str(opp.get("active", "Yes")).strip().lower() == "yes" else False,
-                "sub_departments": ", ".join(opp.get("fullParentPathName", opp.get("department", "")).split(".")[1:]),
-                "objective": "",
-                "expected_outcome": "",
-                "eligibility": "",
-                "key_facts": "",
-                "due_date": "",
-                "funding": ""
-            }
-            summary = await generate_description_summary("description: "+row["description"]+"\n"+opp.get("data", ""))
-            summary = summary.get("summary", {})
-            row["objective"] = summary.get("objective", "")
-            row["expected_outcome"] = summary.get("goal", "")
-            row["eligibility"] = summary.get("eligibility", "")
-            row["key_facts"] = summary.get("key_facts", "")
-            # this is in YYYY-MM-DD format, extract as date type
-            due_date_str = summary.get("due_date", "")
-            row["due_date"] = parse_date(due_date_str) if due_date_str else None
-            row["funding"] = summary.get("budget", "")
-            rows.append(row)
-        
-        if rows:
-            logger.info(f"Preparing to insert {len(rows)} opportunities into database")
+    # One pooled session, rate limiter and Retry-After backoff for every SAM.gov call in this run
+    description_cache = get_description_cache()
+    fetched_by_naics = {}
+    load_results = {"inserted": 0, "skipped": 0, "error": None}
+    persisted_ids = set()
+
+    async with SamClient(api_key=api_key, cache=description_cache) as sam:
+        async def fetch(naics):
+            posted_from, posted_to, _ = windows[naics]
+            fetched_by_naics[naics] = await fetch_naics_window(sam, naics, posted_from, posted_to)
+            return fetched_by_naics[naics][0]
+
+        async def describe(opp):
+            stored_description = (opp.get("_stored") or {}).get("description")
+            if opp.get("_unchanged") and stored_description:
+                opp["_description_text"] = stored_description
+                return opp
+            description_url = opp.get("description", "")
+            # Served from the on-disk cache when the search payload is unchanged since it was fetched
+            description = await sam.fetch_description(description_url, version=search_payload_hash(opp))
+            if description_url and not description:
+                raise RuntimeError(f"No description fetched for notice {opp.get('noticeId')}")
+            opp["_description_text"] = description
+            return opp
+
+        def load(rows):
             result = insert_data(rows)
-            
-            # Return detailed results
-            db_results = {
-                "source": "sam.gov", 
-                "total_fetched": total_fetched,
-                "processed": len(rows),
-                "inserted": result.get("inserted", 0),
-                "skipped": result.get("skipped", 0),
-                "error": result.get("error")
-            }
-            
-            # Always run indexing for ALL records in the database
-            try:
-                # Import indexing function and run indexing for ALL data
-                logger.info("Running Pinecone indexing for ALL records...")
-                try:
-                    from utils.index_to_pinecone import index_sam_gov_to_pinecone, cleanup_to_only_sam_gov_vectors
-                except ModuleNotFoundError:
-                    from app.utils.index_to_pinecone import index_sam_gov_to_pinecone, cleanup_to_only_sam_gov_vectors
-                # Run indexing for ALL SAM.gov records
-                index_result = index_sam_gov_to_pinecone(incremental=False)
-                db_results["indexed_count"] = index_result
-                logger.info(f"Successfully indexed {index_result} records to Pinecone")
-                # Run full vector cleanup (remove non-sam_gov and orphaned sam_gov vectors)
-                logger.info("Running Pinecone full cleanup (keep only valid sam_gov vectors)...")
-                deleted_count = cleanup_to_only_sam_gov_vectors()
-                logger.info(f"Deleted {deleted_count} Pinecone vectors (non-sam_gov and orphaned sam_gov).")
-            except ImportError as e:
-                logger.warning(f"Could not import utils.index_to_pinecone module: {e}")
-                logger.warning("Pinecone indexing will be skipped for this run")
-                db_results["indexed_count"] = 0
-                
-            except Exception as e:
-                logger.error(f"Error during Pinecone indexing: {e}")
-                db_results["indexing_error"] = str(e)
-
-            # --- Post-ETL: Mark records as inactive if not in latest API fetch ---
-            try:
-                latest_notice_ids = set(row["notice_id"] for row in rows if row.get("notice_id"))
-                connection = get_db_connection()
-                if connection and latest_notice_ids:
-                    with connection.cursor() as cursor:
-                        # Use tuple for SQL IN clause
-                        notice_id_tuple = tuple(latest_notice_ids)
-                        # If only one element, add a trailing comma for SQL syntax
-                        if len(notice_id_tuple) == 1:
-                            notice_id_tuple = (notice_id_tuple[0], "dummy")
-                        sql = f"""
-                            UPDATE ai_enhanced_opportunities
-                            SET active = FALSE
-                            WHERE active = TRUE
-                              AND notice_id NOT IN %s
-                        """
-                        cursor.execute(sql, (notice_id_tuple,))
-                        marked_inactive = cursor.rowcount
-                    connection.commit()
-                    logger.info(f"Marked {marked_inactive} records as inactive (not present in latest API fetch)")
-                    db_results["marked_inactive"] = marked_inactive
-                elif not latest_notice_ids:
-                    logger.warning("No notice_ids found in latest API fetch for inactive marking step.")
-                else:
-                    logger.error("Could not connect to database for inactive marking step.")
-            except Exception as e:
-                logger.error(f"Error during post-ETL inactive marking step: {e}")
-                db_results["inactive_marking_error"] = str(e)
-                
-            return db_results
-    
-    return {"source": "sam.gov", "count": 0, "status": "No opportunities found"}
+            load_results["inserted"] += result.get("inserted", 0)
+            load_results["skipped"] += result.get("skipped", 0)
+            load_results["error"] = load_results["error"] or result.get("error")
+            # Only persisted rows count as done; a failed batch is retried by --resume / the next run
+            if result.get("error"):
+                return []
+            loaded = [row for row in rows if row.get("notice_id")]
+            persisted_ids.update(row["notice_id"] for row in loaded)
+            return loaded
+
+        pipeline = Pipeline(SYNC_SOURCE, [
+            Stage("fetch", fetch, workers=len(windows), fan_out=True),
+            # Notices whose search fields match the stored row skip the description fetch and summary
+            Stage("compare", attach_stored_versions, batch_size=COMPARE_BATCH_SIZE),
+            # A notice whose description or summary fails is dropped; its NAICS watermark is
+            # held so the next run requests it again
+            Stage("describe", describe, workers=SAM_API_CONCURRENCY, on_error="skip"),
+            Stage("summarize", build_opportunity_row, workers=SUMMARY_CONCURRENCY, on_error="skip"),
+            Stage("load", load, batch_size=LOAD_BATCH_SIZE),
+        ], key=lambda row: row["notice_id"])
+        try:
+            run_summary = await pipeline.run(list(windows))
+        except PipelineError as e:
+            logger.error(f"SAM.gov sync failed: {e}")
+            return {"source": "sam.gov", "count": 0, "error": str(e), "pipeline": e.summary}
+    if description_cache is not None:
+        description_cache.prune()
+
+    all_opportunities = [opp for opps, _ in fetched_by_naics.values() for opp in opps]
+    total_fetched = len(all_opportunities)
+    processed = run_summary["records_out"]
+    unchanged = sum(1 for opp in all_opportunities if opp.get("_unchanged"))
+    logger.info(f"Fetched {total_fetched} opportunities; {total_fetched - unchanged} new or changed")
+
+    db_results = {
+        "source": "sam.gov",
+        "total_fetched": total_fetched,
+        "processed": processed,
+        "inserted": load_results["inserted"],
+        "skipped": load_results["skipped"],
+        "unchanged": unchanged,
+        "error": load_results["error"],
+        "pipeline": run_summary,
+    }
+
+    # --- Post-ETL: Mark records as inactive if not in latest API fetch ---
+    # Only a complete full-window fetch lists every live notice; a delta window would
+    # deactivate everything it didn't touch.
+    full_fetch = all(is_full for _, _, is_full in windows.values()) and all(
+        complete for _, complete in fetched_by_naics.values()
+    )
+    try:
+        latest_notice_ids = set(
+            str(opp.get("noticeId", "")).strip() for opp in all_opportunities if opp.get("noticeId")
+        )
+        if not full_fetch:
+            logger.info("Incremental fetch; skipping inactive marking (run with --full to reconcile)")
+        elif latest_notice_ids:
+            marked_inactive = deactivate_missing_opportunities(latest_notice_ids)["marked_inactive"]
+            logger.info(f"Marked {marked_inactive} records as inactive (not present in latest API fetch)")
+            db_results["marked_inactive"] = marked_inactive
+        else:
+            logger.warning("No notice_ids found in latest API fetch for inactive marking step.")
+    except Exception as e:
+        logger.error(f"Error during post-ETL inactive marking step: {e}")
+        db_results["inactive_marking_error"] = str(e)
+
+    if not load_results["error"]:
+        advance_watermarks(windows, fetched_by_naics, persisted_ids)
+
+    if not load_results["inserted"] and not db_results.get("marked_inactive"):
+        db_results["count"] = 0
+        db_results["status"] = "No new or changed opportunities found"
+        return db_results
+
+    # Always run indexing for ALL records in the database
+    try:
+        # Import indexing function and run indexing for ALL data
+        logger.info("Running Pinecone indexing for ALL records...")
+        try:
+            from utils.index_to_pinecone import index_sam_gov_to_pinecone, cleanup_to_only_sam_gov_vectors
+        except ModuleNotFoundError:
+            from app.utils.index_to_pinecone import index_sam_gov_to_pinecone, cleanup_to_only_sam_gov_vectors
+        # Run indexing for ALL SAM.gov records
+        index_result = index_sam_gov_to_pinecone(incremental=False)
+        db_results["indexed_count"] = index_result
+        logger.info(f"Successfully indexed {index_result} records to Pinecone")
+        # Run full vector cleanup (remove non-sam_gov and orphaned sam_gov vectors)
+        logger.info("Running Pinecone full cleanup (keep only valid sam_gov vectors)...")
+        deleted_count = cleanup_to_only_sam_gov_vectors()
+        logger.info(f"Deleted {deleted_count} Pinecone vectors (non-sam_gov and orphaned sam_gov).")
+    except ImportError as e:
+        logger.warning(f"Could not import utils.index_to_pinecone module: {e}")
+        logger.warning("Pinecone indexing will be skipped for this run")
+        db_results["indexed_count"] = 0
+
+    except Exception as e:
+        logger.error(f"Error during Pinecone indexing: {e}")
+        db_results["indexing_error"] = str(e)
+
+    return db_results
+
+def advance_watermarks(windows, fetched_by_naics, persisted_ids) -> None:
+    """
+    Persist posted_to / newest postedDate for every NAICS code whose window was fetched
+    completely and whose notices were all loaded (none dropped by describe/summarize).
+    """
+    for naics, (_, posted_to, _) in windows.items():
+        opportunities, complete = fetched_by_naics[naics]
+        if not complete:
+            logger.warning(f"NAICS {naics}: fetch incomplete, watermark not advanced")
+            continue
+        dropped = sum(
+            1 for o in opportunities
+            if o.get("noticeId") and str(o["noticeId"]).strip() not in persisted_ids
+        )
+        if dropped:
+            logger.warning(f"NAICS {naics}: {dropped} notices not loaded, watermark not advanced")
+            continue
+        posted_dates = [d for d in (parse_date(o.get("postedDate")) for o in opportunities) if d]
+        try:
+            save_watermark(SYNC_SOURCE, naics, posted_to, max(posted_dates) if posted_dates else None)
+        except Exception as e:
+            logger.error(f"Could not save sync watermark for NAICS {naics}: {e}")
 
 
 # Function to handle command line arguments
@@ -472,6 +416,7 @@ def parse_args():
     parser = argparse.ArgumentParser(description='SAM.gov data collection script')
     parser.add_argument('--record-id', type=int, help='ETL record ID')
     parser.add_argument('--trigger-type', type=str, help='Trigger type (scheduled or manual)')
+    parser.add_argument('--full', action='store_true', help='Ignore watermarks and fetch the full window')
     return parser.parse_args()
 
 # For running as a script
@@ -483,7 +428,12 @@ if __name__ == "__main__":
         logger.info(f"Running with ETL record ID: {args.record_id}, trigger type: {args.trigger_type}")
     
     # Run the async function
-    result = asyncio.run(fetch_opportunities())
+    try:
+        result = asyncio.run(fetch_opportunities(full=args.full))
+    finally:
+        close_description_cache()
+    if result.get("pipeline"):
+        record_pipeline_run(result["pipeline"], args.record_id, args.trigger_type)
     
     # Calculate counts for output
     count = result.get("total_fetched", 0)
@@ -1,17 +1,16 @@
 import os
 import sys
+import asyncio
 import logging
 import json
 import argparse
 from typing import List, Dict, Optional
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
+import aiohttp
+from lxml import html as lxml_html
 import pandas as pd
 import numpy as np
 import re
-from utils.db_utils import get_db_connection
+from psycopg2.extras import execute_values
 
 # Add the backend directory to Python path
 backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -22,6 +21,11 @@ app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 if app_dir not in sys.path:
     sys.path.insert(0, app_dir)
 
+from utils.db_utils import get_db_connection
+from utils.rate_limiter import TokenBucket
+from services.cron.pipeline import Pipeline, PipelineError, Stage
+from services.cron.update_etl_history import record_pipeline_run
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,67 +33,94 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def setup_session() -> requests.Session:
-    """Configure and return a requests session with retry strategy."""
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=2,
-        status_forcelist=[429, 500, 502, 503, 504],
-        raise_on_status=False
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session = requests.Session()
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    session.headers.update({"User-Agent": "Mozilla/5.0"})
-    return session
-
-def scrape_projects(session: requests.Session, base_url: str, max_pages: int = 10) -> List:
-    """Scrape project listings from multiple pages."""
-    projects = []
-    for page in range(1, max_pages + 1):
-        url = f"{base_url}{page}"
-        try:
-            response = session.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            page_projects = soup.find_all("div", class_="JobSearchCard-item")
-            
-            if not page_projects:
-                logger.warning(f"No projects found on page {page}")
-                break
-                
-            projects.extend(page_projects)
-            logger.info(f"Scraped page {page}: {len(page_projects)} projects")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to scrape page {page}: {e}")
-            continue
-    
-    logger.info(f"Total projects scraped from {page} pages: {len(projects)}")
-    return projects
+FREELANCER_BASE_URL = os.getenv(
+    "FREELANCER_BASE_URL", "https://www.freelancer.com/search/projects?projectLanguages=en&projectSkills=305&page="
+)
+FREELANCER_MAX_PAGES = int(os.getenv("FREELANCER_MAX_PAGES", "10"))
+# Politeness limit: page requests per second and pages in flight at once
+FREELANCER_RATE_PER_SECOND = float(os.getenv("FREELANCER_RATE_PER_SECOND", "2"))
+FREELANCER_CONCURRENCY = int(os.getenv("FREELANCER_CONCURRENCY", "3"))
+FREELANCER_TIMEOUT = float(os.getenv("FREELANCER_TIMEOUT", "10"))
+FREELANCER_MAX_RETRIES = 3
+FREELANCER_LOAD_BATCH_SIZE = 1000
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+INSERT_COLUMNS = (
+    "job_url", "title", "published_date", "skills_required", "price_budget",
+    "bids_so_far", "additional_details", "record_id", "trigger_type",
+)
+
+
+def _by_class(tag: str, cls: str) -> str:
+    """XPath matching `tag` elements carrying the CSS class `cls`."""
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
+
+
+def _first_text(element, tag: str, cls: str) -> Optional[str]:
+    found = element.xpath(_by_class(tag, cls))
+    return found[0].text_content().strip() if found else None
+
+
+async def fetch_page(
+    session: aiohttp.ClientSession,
+    bucket: TokenBucket,
+    semaphore: asyncio.Semaphore,
+    url: str,
+) -> Optional[str]:
+    """Fetch one listing page, retrying 429/5xx with exponential backoff."""
+    for attempt in range(FREELANCER_MAX_RETRIES + 1):
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return await response.text()
+                    if response.status not in RETRY_STATUSES:
+                        logger.error(f"Failed to scrape {url}: HTTP {response.status}")
+                        return None
+                    logger.warning(f"HTTP {response.status} for {url} (attempt {attempt + 1})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Request error for {url} (attempt {attempt + 1}): {e}")
+        if attempt < FREELANCER_MAX_RETRIES:
+            await asyncio.sleep(2 ** (attempt + 1))
+    logger.error(f"Failed to scrape {url} after {FREELANCER_MAX_RETRIES + 1} attempts")
+    return None
+
+
+def parse_listing_page(page_html: str) -> List[Dict]:
+    """Parse one search results page into project dicts."""
+    if not page_html:
+        return []
+    tree = lxml_html.fromstring(page_html)
+    cards = tree.xpath(_by_class("div", "JobSearchCard-item"))
+    return [data for card in cards if (data := extract_project_data(card))]
+
 
 def extract_project_data(project) -> Optional[Dict]:
-    """Extract relevant data from a single project listing."""
+    """Extract relevant data from a single project listing element."""
     try:
-        title_elem = project.find("a", class_="JobSearchCard-primary-heading-link")
-        title = title_elem.text.strip() if title_elem else "No Title"
-        job_url = f"https://www.freelancer.com{title_elem['href']}" if title_elem and title_elem.has_attr("href") else None
+        title_elems = project.xpath(_by_class("a", "JobSearchCard-primary-heading-link"))
+        title_elem = title_elems[0] if title_elems else None
+        title = title_elem.text_content().strip() if title_elem is not None else "No Title"
+        href = title_elem.get("href") if title_elem is not None else None
+        job_url = f"https://www.freelancer.com{href}" if href else None
 
-        published_elem = project.find("span", class_="JobSearchCard-primary-heading-days")
-        published_date = published_elem.text.strip() if published_elem else "No Published Date"
+        published_date = _first_text(project, "span", "JobSearchCard-primary-heading-days") or "No Published Date"
 
-        price_elem = project.find("div", class_="JobSearchCard-secondary-price")
-        price = re.sub(r"\s+Avg Bid\s*", "", price_elem.text.strip()) if price_elem else "No Price"
+        price = _first_text(project, "div", "JobSearchCard-secondary-price")
+        price = re.sub(r"\s+Avg Bid\s*", "", price) if price is not None else "No Price"
 
-        bids_elem = project.find("div", class_="JobSearchCard-secondary-entry")
-        bids = re.sub(r"\s+Bids\s*", "", bids_elem.text.strip()) if bids_elem else "No Bids"
+        bids = _first_text(project, "div", "JobSearchCard-secondary-entry")
+        bids = re.sub(r"\s+Bids\s*", "", bids) if bids is not None else "No Bids"
 
         skills = ", ".join(
-            skill.text.strip() for skill in project.find_all("a", class_="JobSearchCard-primary-tagsLink")
+            skill.text_content().strip()
+            for skill in project.xpath(_by_class("a", "JobSearchCard-primary-tagsLink"))
         ) or "No Skills Listed"
 
-        details_elem = project.find("p", class_="JobSearchCard-primary-description")
-        details = re.sub(r"\s+", " ", details_elem.text.strip()) if details_elem else "No Additional Details"
+        details = _first_text(project, "p", "JobSearchCard-primary-description")
+        details = re.sub(r"\s+", " ", details) if details is not None else "No Additional Details"
 
         return {
             "Job URL": job_url,
@@ -123,9 +154,8 @@ def convert_to_hours(text: str) -> float:
     num = int(match.group(1))
     return num if 'hour' in text else num * 24 if 'day' in text else np.nan
 
-def process_data(projects: List) -> pd.DataFrame:
+def process_data(projects_data: List[Dict]) -> pd.DataFrame:
     """Process and clean scraped project data."""
-    projects_data = [data for project in projects if (data := extract_project_data(project))]
     df = pd.DataFrame(projects_data)
     
     if df.empty:
@@ -178,70 +208,107 @@ def save_to_database(df: pd.DataFrame, record_id: str, trigger_type: str) -> tup
             conn.commit()
             logger.info("Table ensured: freelancer_data_table")
 
-            # Insert data and count new records
-            for _, row in df.iterrows():
-                insert_query = '''
-                    INSERT INTO freelancer_data_table (
-                        job_url, title, published_date, skills_required,
-                        price_budget, bids_so_far, additional_details,
-                        record_id, trigger_type
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            # One multi-row insert; RETURNING only yields rows that did not conflict
+            rows = [
+                (
+                    job_url, title, published, skills, str(price), str(bids), details,
+                    record_id, trigger_type,
+                )
+                for job_url, title, published, skills, price, bids, details in zip(
+                    df['Job URL'].tolist(),
+                    df['Title'].tolist(),
+                    df['Published Date'].tolist(),
+                    df['Skills Required'].tolist(),
+                    df['Price/Budget'].tolist(),
+                    df['Bids so Far'].tolist(),
+                    df['Additional Details'].tolist(),
+                )
+            ]
+            inserted = execute_values(
+                cursor,
+                f"""
+                    INSERT INTO freelancer_data_table ({", ".join(INSERT_COLUMNS)})
+                    VALUES %s
                     ON CONFLICT (job_url) DO NOTHING
-                    RETURNING id;
-                '''
-                cursor.execute(insert_query, (
-                    row['Job URL'],
-                    row['Title'],
-                    row['Published Date'],
-                    row['Skills Required'],
-                    str(row['Price/Budget']),
-                    str(row['Bids so Far']),
-                    row['Additional Details'],
-                    record_id,
-                    trigger_type
-                ))
-                if cursor.fetchone():  # If a row was inserted
-                    new_count += 1
-            
+                    RETURNING id
+                """,
+                rows,
+                page_size=max(len(rows), 1),
+                fetch=True,
+            )
+            new_count = len(inserted)
+
             conn.commit()
             logger.info(f"Inserted {new_count} new records out of {total_count} total records")
 
-            # Preview data
-            cursor.execute("SELECT * FROM freelancer_data_table LIMIT 5;")
-            rows = cursor.fetchall()
-            for row in rows:
-                logger.info(f"Preview row: {row}")
-                
     except Exception as e:
         logger.error(f"Database operation failed: {e}")
         raise
     
     return total_count, new_count
 
+async def run_pipeline(record_id: str, trigger_type: str, max_pages: int = FREELANCER_MAX_PAGES) -> Dict:
+    """
+    Scrape listing pages and load them as a pipeline: pages are fetched concurrently
+    under the politeness limit, parsed as they arrive and inserted in batches.
+    """
+    bucket = TokenBucket(FREELANCER_RATE_PER_SECOND, capacity=FREELANCER_CONCURRENCY)
+    semaphore = asyncio.Semaphore(FREELANCER_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=FREELANCER_TIMEOUT)
+    headers = {"User-Agent": "Mozilla/5.0"}
+    counts = {"count": 0, "new_count": 0}
+
+    async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
+        async def fetch(page: int) -> Optional[str]:
+            return await fetch_page(session, bucket, semaphore, f"{FREELANCER_BASE_URL}{page}")
+
+        def load(projects: List[Dict]) -> List[Dict]:
+            df = process_data(projects)
+            if df.empty:
+                return []
+            total_count, new_count = save_to_database(df, record_id, trigger_type)
+            counts["count"] += total_count
+            counts["new_count"] += new_count
+            return projects
+
+        pipeline = Pipeline("freelancer", [
+            Stage("fetch", fetch, workers=FREELANCER_CONCURRENCY),
+            Stage("parse", parse_listing_page, fan_out=True),
+            Stage("load", load, batch_size=FREELANCER_LOAD_BATCH_SIZE),
+        ], key=lambda project: project["Job URL"])
+        summary = await pipeline.run(range(1, max_pages + 1))
+
+    return {**counts, "pipeline": summary}
+
+
 def main(record_id: str, trigger_type: str) -> dict:
     """Main function to orchestrate the scraping process."""
     try:
-        session = setup_session()
-        base_url = "https://www.freelancer.com/search/projects?projectLanguages=en&projectSkills=305&page="
-        projects = scrape_projects(session, base_url)
-        if not projects:
+        result = asyncio.run(run_pipeline(record_id, trigger_type))
+        stages = result["pipeline"]["stages"]
+        scrape_seconds = stages["fetch"]["wall_seconds"]
+        db_seconds = stages["load"]["busy_seconds"]
+        if not result["count"]:
             logger.warning("No projects scraped")
-            return {"count": 0, "new_count": 0, "status": "success"}
-            
-        df = process_data(projects)
-        if df.empty:
-            logger.warning("No data processed")
-            return {"count": 0, "new_count": 0, "status": "success"}
-            
-        total_count, new_count = save_to_database(df, record_id, trigger_type)
-        
+        logger.info(f"Scrape took {scrape_seconds}s, database write took {db_seconds}s")
+
+        return {
+            "count": result["count"],
+            "new_count": result["new_count"],
+            "status": "success",
+            "scrape_seconds": scrape_seconds,
+            "db_seconds": db_seconds,
+            "pipeline": result["pipeline"],
+        }
+
+    except PipelineError as e:
+        logger.error(f"Scraping process failed: {e}")
         return {
-            "count": total_count,
-            "new_count": new_count,
-            "status": "success"
+            "count": 0,
+            "new_count": 0,
+            "status": f"failed: {str(e)}",
+            "pipeline": e.summary,
         }
-        
     except Exception as e:
         logger.error(f"Scraping process failed: {e}")
         return {
@@ -257,4 +324,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     result = main(args.record_id, args.trigger_type)
+    pipeline_summary = result.pop("pipeline", None)
+    if pipeline_summary:
+        record_pipeline_run(pipeline_summary, args.record_id, args.trigger_type)
     print(json.dumps(result))
\ No newline at end of file
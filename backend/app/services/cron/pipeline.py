@@ -0,0 +1,384 @@
+"""
+Staged ETL pipeline runner shared by the ingestion jobs.
+
+A pipeline is a list of stages. Each stage is a pool of async workers reading from
+a bounded queue and writing to the next one, so a slow stage applies backpressure
+instead of letting work pile up in memory. Every stage records records in/out,
+errors and per-call latency (p50/p95/max); the run summary is checkpointed to disk
+as each stage drains and can be written to etl_history.
+
+    pipeline = Pipeline("freelancer", [
+        Stage("fetch", fetch_page, workers=3),
+        Stage("parse", parse_listing_page, workers=2, fan_out=True),
+        Stage("load", save_batch, batch_size=1000),
+    ])
+    summary = await pipeline.run(range(1, 11))
+"""
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Set, Union
+
+# Add the backend directory to Python path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if app_dir not in sys.path:
+    sys.path.insert(0, app_dir)
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "1000"))
+PIPELINE_CHECKPOINT_DIR = os.getenv(
+    "PIPELINE_CHECKPOINT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bizradar", "pipelines")
+)
+
+_DONE = object()
+_SOURCE = "source"
+
+
+class PipelineError(Exception):
+    """A stage failed with on_error="raise"; the run summary is attached."""
+
+    def __init__(self, message: str, summary: Dict[str, Any]):
+        super().__init__(message)
+        self.summary = summary
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name: Stage name used in metrics and checkpoints
+        fn: Called once per item (or per batch when batch_size is set). Coroutine
+            functions are awaited; plain functions run in a worker thread.
+            Returning None drops the item.
+        workers: Concurrent calls of fn
+        batch_size: Hand fn lists of up to this many items; fn returns a list
+        fan_out: fn returns an iterable of items (e.g. one page -> many rows)
+        skip_done: Drop inputs whose pipeline key already completed in a resumed run
+        on_error: "raise" fails the run; "skip" logs, counts and drops the input
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        batch_size: Optional[int] = None,
+        fan_out: bool = False,
+        skip_done: bool = False,
+        on_error: str = "raise",
+    ):
+        if on_error not in ("raise", "skip"):
+            raise ValueError("on_error must be 'raise' or 'skip'")
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.fan_out = fan_out
+        self.skip_done = skip_done
+        self.on_error = on_error
+        self.is_async = asyncio.iscoroutinefunction(fn)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+class StageMetrics:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.records_in = 0
+        self.records_out = 0
+        self.errors = 0
+        self.skipped_done = 0
+        self.latencies: List[float] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        wall = (self.finished_at or time.perf_counter()) - self.started_at if self.started_at else 0.0
+        return {
+            "workers": self.workers,
+            "records_in": self.records_in,
+            "records_out": self.records_out,
+            "errors": self.errors,
+            "skipped_done": self.skipped_done,
+            "calls": len(latencies),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            "busy_seconds": round(sum(latencies), 2),
+            "wall_seconds": round(wall, 2),
+            "finished": self.finished_at is not None,
+        }
+
+
+class _Checkpoint:
+    """Run state (<run_id>.json) and keys that reached the end of the pipeline (<run_id>.keys)."""
+
+    def __init__(self, directory: str, pipeline: str, run_id: str):
+        base = os.path.join(directory, pipeline)
+        os.makedirs(base, exist_ok=True)
+        self.state_path = os.path.join(base, f"{run_id}.json")
+        self.keys_path = os.path.join(base, f"{run_id}.keys")
+
+    def done_keys(self) -> Set[str]:
+        try:
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                return {line.rstrip("\n") for line in f if line.strip()}
+        except OSError:
+            return set()
+
+    def reset(self) -> None:
+        for path in (self.state_path, self.keys_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def add_keys(self, keys: List[str]) -> None:
+        if keys:
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in keys))
+
+    def write_state(self, state: Dict[str, Any]) -> None:
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp, self.state_path)
+
+
+class Pipeline:
+    """
+    Args:
+        name: Pipeline name (etl_history key and checkpoint directory)
+        stages: Stages in order; the last stage's outputs are the pipeline's results
+        queue_size: Bound of every inter-stage queue
+        key: Maps a final output (and skip_done stage inputs) to a string key;
+            enables resuming a run without redoing finished items
+        checkpoint_dir: Where run state and finished keys are written (None disables)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stages: List[Stage],
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        key: Optional[Callable[[Any], Optional[str]]] = None,
+        checkpoint_dir: Optional[str] = PIPELINE_CHECKPOINT_DIR,
+    ):
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        self.name = name
+        self.stages = stages
+        self.queue_size = queue_size
+        self.key = key
+        self.checkpoint_dir = checkpoint_dir
+
+    async def run(
+        self,
+        source: Union[Iterable[Any], AsyncIterable[Any]],
+        run_id: Optional[str] = None,
+        resume: bool = False,
+        collect: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Push every source item through the stages.
+
+        Args:
+            source: Items for the first stage; a blocking iterator is advanced in a thread
+            run_id: Checkpoint id; a resumed run must reuse it (default: today's date, UTC)
+            resume: Skip items whose key finished in an earlier run with the same run_id
+            collect: Return the final outputs as summary["outputs"]
+
+        Returns:
+            Run summary: status, timings, source/output counts and per-stage metrics
+        """
+        run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%d")
+        checkpoint = _Checkpoint(self.checkpoint_dir, self.name, run_id) if self.checkpoint_dir else None
+        done_keys: Set[str] = set()
+        if checkpoint is not None:
+            if resume:
+                done_keys = checkpoint.done_keys()
+                logger.info(f"[{self.name}] resuming run {run_id}: {len(done_keys)} items already finished")
+            else:
+                checkpoint.reset()
+
+        metrics = {_SOURCE: StageMetrics(_SOURCE, 1)}
+        metrics.update({stage.name: StageMetrics(stage.name, stage.workers) for stage in self.stages})
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        outputs: List[Any] = []
+        started = time.perf_counter()
+        started_at = datetime.now(timezone.utc)
+
+        def summary(status: str, error: Optional[str] = None) -> Dict[str, Any]:
+            result = {
+                "pipeline": self.name,
+                "run_id": run_id,
+                "status": status,
+                "started_at": started_at.isoformat(),
+                "seconds": round(time.perf_counter() - started, 2),
+                "records_in": metrics[_SOURCE].records_out,
+                "records_out": metrics[self.stages[-1].name].records_out,
+                "resumed_items": len(done_keys),
+                "stages": {name: m.summary() for name, m in metrics.items()},
+            }
+            if error:
+                result["error"] = error
+            return result
+
+        def save_checkpoint(status: str) -> None:
+            if checkpoint is not None:
+                try:
+                    checkpoint.write_state(summary(status))
+                except OSError as e:
+                    logger.warning(f"[{self.name}] could not write checkpoint: {e}")
+
+        tasks = [asyncio.create_task(self._feed(source, queues[0], metrics[_SOURCE]))]
+        for i, stage in enumerate(self.stages):
+            tasks.append(asyncio.create_task(
+                self._run_stage(stage, queues[i], queues[i + 1], metrics[stage.name], done_keys, save_checkpoint)
+            ))
+        tasks.append(asyncio.create_task(self._drain(queues[-1], checkpoint, outputs if collect else None)))
+
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            failed = summary("failed", f"{type(e).__name__}: {e}")
+            save_checkpoint("failed")
+            self._log(failed)
+            raise PipelineError(f"pipeline {self.name} failed: {e}", failed) from e
+
+        result = summary("success")
+        save_checkpoint("success")
+        self._log(result)
+        if collect:
+            result["outputs"] = outputs
+        return result
+
+    async def _feed(self, source, outbox: asyncio.Queue, metrics: StageMetrics) -> None:
+        metrics.started_at = time.perf_counter()
+        if hasattr(source, "__aiter__"):
+            async for item in source:
+                metrics.records_out += 1
+                await outbox.put(item)
+        elif isinstance(source, (list, tuple, range)):
+            for item in source:
+                metrics.records_out += 1
+                await outbox.put(item)
+        else:
+            iterator = iter(source)
+            while True:
+                # Sources such as CSV readers block; keep the event loop free while they work
+                item = await asyncio.to_thread(next, iterator, _DONE)
+                if item is _DONE:
+                    break
+                metrics.records_out += 1
+                await outbox.put(item)
+        metrics.finished_at = time.perf_counter()
+        await outbox.put(_DONE)
+
+    async def _run_stage(self, stage, inbox, outbox, metrics, done_keys, save_checkpoint) -> None:
+        metrics.started_at = time.perf_counter()
+        await asyncio.gather(*(
+            self._worker(stage, inbox, outbox, metrics, done_keys) for _ in range(stage.workers)
+        ))
+        metrics.finished_at = time.perf_counter()
+        save_checkpoint("running")
+        await outbox.put(_DONE)
+
+    async def _worker(self, stage, inbox, outbox, metrics, done_keys) -> None:
+        batch: List[Any] = []
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                # Leave the marker for this stage's other workers
+                await inbox.put(_DONE)
+                break
+            metrics.records_in += 1
+            if stage.skip_done and done_keys and self.key and str(self.key(item)) in done_keys:
+                metrics.skipped_done += 1
+                continue
+            if stage.batch_size:
+                batch.append(item)
+                if len(batch) >= stage.batch_size:
+                    await self._call(stage, batch, outbox, metrics)
+                    batch = []
+            else:
+                await self._call(stage, item, outbox, metrics)
+        if batch:
+            await self._call(stage, batch, outbox, metrics)
+
+    async def _call(self, stage, payload, outbox, metrics) -> None:
+        started = time.perf_counter()
+        try:
+            if stage.is_async:
+                result = await stage.fn(payload)
+            else:
+                result = await asyncio.to_thread(stage.fn, payload)
+        except Exception as e:
+            metrics.latencies.append(time.perf_counter() - started)
+            if stage.on_error == "raise":
+                raise
+            metrics.errors += len(payload) if stage.batch_size else 1
+            logger.error(f"[{self.name}/{stage.name}] {type(e).__name__}: {e}")
+            return
+        metrics.latencies.append(time.perf_counter() - started)
+
+        if result is None:
+            return
+        produced = result if (stage.batch_size or stage.fan_out) else [result]
+        for item in produced:
+            metrics.records_out += 1
+            await outbox.put(item)
+
+    async def _drain(self, inbox, checkpoint, outputs) -> None:
+        pending_keys: List[str] = []
+        try:
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    break
+                if outputs is not None:
+                    outputs.append(item)
+                if checkpoint is not None and self.key:
+                    key = self.key(item)
+                    if key is not None:
+                        pending_keys.append(str(key))
+                    if len(pending_keys) >= 500:
+                        checkpoint.add_keys(pending_keys)
+                        pending_keys = []
+        finally:
+            # Also runs when a failed run cancels the drain, so finished items are not redone on resume
+            if checkpoint is not None:
+                checkpoint.add_keys(pending_keys)
+
+    def _log(self, result: Dict[str, Any]) -> None:
+        logger.info(
+            f"[{self.name}] {result['status']} in {result['seconds']}s: "
+            f"{result['records_in']} in, {result['records_out']} out"
+        )
+        for name, stage in result["stages"].items():
+            logger.info(
+                f"[{self.name}]   {name:<12} workers={stage['workers']} in={stage['records_in']} "
+                f"out={stage['records_out']} errors={stage['errors']} p50={stage['p50_ms']}ms "
+                f"p95={stage['p95_ms']}ms busy={stage['busy_seconds']}s wall={stage['wall_seconds']}s"
+            )
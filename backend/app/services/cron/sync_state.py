@@ -0,0 +1,87 @@
+"""
+Persisted high-water marks for incremental SAM.gov API syncs.
+
+One row per (source, naics_code) in sam_sync_state records the postedTo of the
+last successful run and the newest postedDate seen, so the next run only asks
+for the delta window (with a small overlap for late-indexed notices).
+"""
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+# Add the backend directory to Python path
+backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+if app_dir not in sys.path:
+    sys.path.insert(0, app_dir)
+
+from utils.db_utils import get_db_connection
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Longest window ever requested (first run or --full)
+SYNC_FULL_WINDOW_DAYS = int(os.getenv("SAM_SYNC_FULL_WINDOW_DAYS", "180"))
+# Re-request this many days before the watermark to catch notices indexed late
+SYNC_OVERLAP_DAYS = int(os.getenv("SAM_SYNC_OVERLAP_DAYS", "2"))
+
+
+def load_watermarks(source: str) -> Dict[str, Dict[str, Optional[date]]]:
+    """Return {naics_code: {"last_posted_to": date, "max_posted_date": date}} for a source."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT naics_code, last_posted_to, max_posted_date FROM sam_sync_state WHERE source = %s",
+                (source,),
+            )
+            return {
+                naics: {"last_posted_to": last_posted_to, "max_posted_date": max_posted_date}
+                for naics, last_posted_to, max_posted_date in cursor.fetchall()
+            }
+    finally:
+        connection.close()
+
+
+def save_watermark(source: str, naics_code: str, posted_to: date, max_posted_date: Optional[date]) -> None:
+    """Advance the watermark after a successful sync; max_posted_date never moves backwards."""
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO sam_sync_state (source, naics_code, last_posted_to, max_posted_date, updated_at)
+                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (source, naics_code) DO UPDATE SET
+                    last_posted_to = EXCLUDED.last_posted_to,
+                    max_posted_date = GREATEST(sam_sync_state.max_posted_date, EXCLUDED.max_posted_date),
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                (source, naics_code, posted_to, max_posted_date),
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def sync_window(
+    watermark: Optional[Dict[str, Optional[date]]],
+    today: date,
+    full: bool = False,
+) -> Tuple[date, date, bool]:
+    """
+    Posted-date window to request for one NAICS code.
+
+    Returns:
+        (posted_from, posted_to, is_full_window)
+    """
+    earliest = today - timedelta(days=SYNC_FULL_WINDOW_DAYS)
+    if full or not watermark or not watermark.get("last_posted_to"):
+        return earliest, today, True
+    marks = [d for d in (watermark.get("last_posted_to"), watermark.get("max_posted_date")) if d]
+    posted_from = max(min(marks) - timedelta(days=SYNC_OVERLAP_DAYS), earliest)
+    return posted_from, today, posted_from == earliest
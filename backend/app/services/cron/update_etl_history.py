@@ -21,6 +21,7 @@ dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.pa
 load_dotenv(dotenv_path)
     
 import argparse
+import json
 from utils.db_utils import get_db_connection
 from utils.logger import get_logger
 
@@ -132,6 +133,62 @@ def update_etl_history(
         logger.error(f"Error updating ETL history record: {str(e)}")
         return False
 
+def record_pipeline_run(summary, record_id=None, trigger_type=None):
+    """
+    Store a pipeline run summary (services.cron.pipeline) in etl_history.pipeline_metrics,
+    keyed by pipeline name.
+
+    Args:
+        summary (dict): Pipeline.run summary
+        record_id (int): ETL history record to attach to; a new record is created when None
+        trigger_type (str): Trigger type for a newly created record
+
+    Returns:
+        int: The etl_history record ID, or None if the write failed
+    """
+    payload = {k: v for k, v in summary.items() if k != "outputs"}
+    try:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                if record_id:
+                    cursor.execute(
+                        """
+                        UPDATE etl_history
+                        SET pipeline_metrics = COALESCE(pipeline_metrics, '{}'::jsonb) || jsonb_build_object(%s, %s::jsonb)
+                        WHERE id = %s
+                        RETURNING id
+                        """,
+                        (summary["pipeline"], json.dumps(payload, default=str), record_id),
+                    )
+                else:
+                    cursor.execute(
+                        """
+                        INSERT INTO etl_history (status, total_records, trigger_type, pipeline_metrics)
+                        VALUES (%s, %s, %s, jsonb_build_object(%s, %s::jsonb))
+                        RETURNING id
+                        """,
+                        (
+                            summary["status"],
+                            summary.get("records_out", 0),
+                            trigger_type or "manual",
+                            summary["pipeline"],
+                            json.dumps(payload, default=str),
+                        ),
+                    )
+                row = cursor.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if not row:
+            logger.error(f"ETL history record {record_id} not found; pipeline metrics not stored")
+            return None
+        logger.info(f"Stored {summary['pipeline']} pipeline metrics in ETL history record {row[0]}")
+        return row[0]
+    except Exception as e:
+        logger.error(f"Error storing pipeline metrics: {str(e)}")
+        return None
+
 def main():
     """
     Main function to parse arguments and update ETL history
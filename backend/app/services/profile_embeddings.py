@@ -2,6 +2,8 @@ from typing import Dict, Any, List, Optional
 
 from app.utils.logger import get_logger
 from app.utils.openai_client import get_openai_client
+from app.utils.embedding_cache import get_embedding_cache
+from app.utils.match_cache import get_match_cache
 
 
 logger = get_logger(__name__)
@@ -55,11 +57,17 @@ def build_embedding_text_from_profile(profile: Dict[str, Any]) -> str:
 
 
 def generate_embedding(text: str) -> List[float]:
+    cache = get_embedding_cache()
+    cached = cache.get(EMBED_MODEL, text)
+    if cached is not None:
+        return cached
     client = get_openai_client()
     if not client:
         raise RuntimeError("OpenAI client not configured")
     resp = client.embeddings.create(model=EMBED_MODEL, input=text)
-    return resp.data[0].embedding
+    vector = resp.data[0].embedding
+    cache.put(EMBED_MODEL, text, vector)
+    return vector
 
 
 def update_profile_embedding(supabase, user_id: str) -> Optional[Dict[str, Any]]:
@@ -75,6 +83,15 @@ def update_profile_embedding(supabase, user_id: str) -> Optional[Dict[str, Any]]
             logger.info(f"Skipping embedding update for user {user_id}: empty text")
             return None
 
+        # Profile saves that don't touch embedded fields keep the stored vector as-is
+        if (
+            profile.get("embedding") is not None
+            and profile.get("embedding_text") == text
+            and profile.get("embedding_model") == EMBED_MODEL
+        ):
+            logger.info(f"Skipping embedding update for user {user_id}: embedding text unchanged")
+            return profile
+
         vector = generate_embedding(text)
 
         upd = supabase.table("profiles").update({
@@ -84,6 +101,9 @@ def update_profile_embedding(supabase, user_id: str) -> Optional[Dict[str, Any]]
             "embedding_version": 1,
         }).eq("id", user_id).execute()
 
+        # Scores computed against the previous profile no longer apply
+        get_match_cache().invalidate_user(user_id)
+
         if upd.data:
             return upd.data[0]
         return None
@@ -1,11 +1,31 @@
+import asyncio
 import os
+import time
 from app.utils.logger import get_logger
 import json
-from typing import List, Dict, Any
-from app.utils.openai_client import get_openai_client
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from app.utils.openai_client import get_async_openai_client
+from app.utils.rate_limiter import get_model_rate_limiter
+from app.utils.match_cache import get_match_cache, profile_hash
 
 logger = get_logger(__name__)
 
+# Single-opportunity prompts (RECOMMENDATION_OPPORTUNITIES_PER_PROMPT=1) keep the original model;
+# multi-opportunity prompts need a model with structured outputs
+RECOMMENDATION_MODEL = "gpt-4"
+BATCH_RECOMMENDATION_MODEL = os.getenv("RECOMMENDATION_BATCH_MODEL", "gpt-4.1-mini")
+OPPORTUNITIES_PER_PROMPT = int(os.getenv("RECOMMENDATION_OPPORTUNITIES_PER_PROMPT", "5"))
+RECOMMENDATION_CONCURRENCY = int(os.getenv("RECOMMENDATION_CONCURRENCY", "4"))
+RECOMMENDATION_TIMEOUT = float(os.getenv("RECOMMENDATION_TIMEOUT", "90"))
+# Account limits per model; shared with every other caller of the same model in the process
+RECOMMENDATION_RPM = int(os.getenv("RECOMMENDATION_RPM", "500"))
+RECOMMENDATION_TPM = int(os.getenv("RECOMMENDATION_TPM", "200000"))
+FALLBACK_REASON = "System fallback"
+# Placeholder result when a single-opportunity reply can't be parsed
+PARSE_FALLBACK_REASON = "Partial fit based on limited analysis"
+# Stand-ins rather than real scores: never written to the match cache
+FALLBACK_REASONS = {FALLBACK_REASON, PARSE_FALLBACK_REASON}
+
 def build_prompt(company_url: str, company_description: str, full_markdown: str, opportunity: Dict[str, Any], include_reason: bool = True) -> List[Dict[str, str]]:
     system_prompt = """
     You are an expert in business opportunity evaluation. Your job is to assess how well a company matches a specific opportunity based on its full profile and the opportunity's requirements.
@@ -45,6 +65,103 @@ def build_prompt(company_url: str, company_description: str, full_markdown: str,
     ]
 
 
+BATCH_SYSTEM_PROMPT = """
+    You are an expert in business opportunity evaluation. Your job is to assess how well a company matches each of several opportunities based on its full profile and each opportunity's requirements.
+
+    Score every opportunity independently and return one entry in "matches" per opportunity, echoing its opportunityIndex:
+    - matchScore (30-95)
+    - title (short summary of the match)
+    - description (3-4 sentence rationale for the score)
+    - matchReason (1-line reason{reason_note})
+    - keyInsights: array of 3 specific points showing why this opportunity matches (or doesn't)
+    - matchCriteria: array of {{criterion, relevance (Strong/Partial/No match), notes}}
+
+    Focus on reasoning. Avoid vague or generic phrases.
+    """
+
+# Structured-output schema for multi-opportunity prompts (strict mode: every key required)
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "opportunity_matches",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "matches": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "opportunityIndex": {"type": "integer"},
+                            "matchScore": {"type": "integer"},
+                            "title": {"type": "string"},
+                            "description": {"type": "string"},
+                            "matchReason": {"type": "string"},
+                            "keyInsights": {"type": "array", "items": {"type": "string"}},
+                            "matchCriteria": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "criterion": {"type": "string"},
+                                        "relevance": {"type": "string", "enum": ["Strong", "Partial", "No match"]},
+                                        "notes": {"type": "string"},
+                                    },
+                                    "required": ["criterion", "relevance", "notes"],
+                                    "additionalProperties": False,
+                                },
+                            },
+                        },
+                        "required": [
+                            "opportunityIndex", "matchScore", "title", "description",
+                            "matchReason", "keyInsights", "matchCriteria",
+                        ],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["matches"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _format_opportunity(opportunity: Dict[str, Any]) -> str:
+    return f"""- Title: {opportunity.get('title')}
+    - Description: {opportunity.get('description')}
+    - Skills Required: {opportunity.get('skills_required', 'N/A')}
+    - Budget/Price: {opportunity.get('price_budget', 'N/A')}
+    - Bids: {opportunity.get('bids_so_far', 'N/A')}
+    - Additional: {opportunity.get('additional_details', '')}
+    - Published: {opportunity.get('published_date')}"""
+
+
+def build_batch_prompt(company_url: str, company_description: str, full_markdown: str, opportunities: Sequence[Tuple[int, Dict[str, Any]]], include_reason: bool = True) -> List[Dict[str, str]]:
+    """Prompt scoring several (opportunityIndex, opportunity) pairs against one company profile."""
+    system_prompt = BATCH_SYSTEM_PROMPT.format(reason_note="" if include_reason else "; may be empty")
+    sections = "\n\n".join(
+        f"    ### Opportunity (opportunityIndex: {index})\n    {_format_opportunity(opportunity)}"
+        for index, opportunity in opportunities
+    )
+    user_content = f"""
+    ### Company
+    - URL: {company_url}
+    - Description: {company_description}
+
+    ### Company Profile Markdown
+    {full_markdown}
+
+{sections}
+    """
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content.strip()}
+    ]
+
+
 def parse_response(response) -> Dict[str, Any]:
     try:
         # Check if response is empty or None
@@ -54,7 +171,7 @@ def parse_response(response) -> Dict[str, Any]:
                 "matchScore": 50,
                 "title": "Partial Match",
                 "description": "Could not generate full analysis due to empty response.",
-                "matchReason": "Partial fit based on limited analysis",
+                "matchReason": PARSE_FALLBACK_REASON,
                 "keyInsights": ["Empty response", "Check opportunity manually", "Some match expected"],
                 "matchCriteria": [
                     {"criterion": "Relevance", "relevance": "Partial match", "notes": "Empty response"}
@@ -69,7 +186,7 @@ def parse_response(response) -> Dict[str, Any]:
                 "matchScore": 50,
                 "title": "Partial Match",
                 "description": "Could not generate full analysis due to empty content.",
-                "matchReason": "Partial fit based on limited analysis",
+                "matchReason": PARSE_FALLBACK_REASON,
                 "keyInsights": ["Empty content", "Check opportunity manually", "Some match expected"],
                 "matchCriteria": [
                     {"criterion": "Relevance", "relevance": "Partial match", "notes": "Empty content"}
@@ -94,7 +211,7 @@ def parse_response(response) -> Dict[str, Any]:
                     "matchScore": 50,
                     "title": "Partial Match",
                     "description": "Could not parse AI response. Manual review recommended.",
-                    "matchReason": "Partial fit based on limited analysis",
+                    "matchReason": PARSE_FALLBACK_REASON,
                     "keyInsights": ["Parsing failed", "Check opportunity manually", "Some match expected"],
                     "matchCriteria": [
                         {"criterion": "Relevance", "relevance": "Partial match", "notes": "Parsing fallback"}
@@ -107,7 +224,7 @@ def parse_response(response) -> Dict[str, Any]:
             "matchScore": 50,
             "title": "Partial Match",
             "description": "Could not parse full response. Some relevance exists.",
-            "matchReason": "Partial fit based on limited analysis",
+            "matchReason": PARSE_FALLBACK_REASON,
             "keyInsights": ["Parsing failed", "Check opportunity manually", "Some match expected"],
             "matchCriteria": [
                 {"criterion": "Relevance", "relevance": "Partial match", "notes": "Parsing fallback"}
@@ -115,81 +232,187 @@ def parse_response(response) -> Dict[str, Any]:
         }
 
 
-async def generate_recommendations(company_url: str, company_description: str, opportunities: List[Dict[str, Any]], include_match_reason: bool = True):
-    recommendations = []
-    full_markdown = ""
+def _normalize_opportunity(opportunity: Any, i: int) -> Dict[str, Any]:
+    # If opportunity is just an ID or missing key fields, create a minimal object
+    if isinstance(opportunity, dict) and opportunity.get('title'):
+        return opportunity
+    return {
+        "id": opportunity if not isinstance(opportunity, dict) else opportunity.get('id', f'unknown-{i}'),
+        "title": f"Opportunity {i+1}",
+        "description": "No detailed description available",
+        "skills_required": "N/A",
+        "price_budget": "N/A",
+        "bids_so_far": "N/A",
+        "additional_details": "",
+        "published_date": "Unknown"
+    }
+
+
+def _fallback_recommendation(i: int) -> Dict[str, Any]:
+    return {
+        "id": f"rec-{i}",
+        "opportunityIndex": i,
+        "matchScore": 50,
+        "title": "Fallback Result",
+        "description": "Could not generate AI-based match.",
+        "matchReason": FALLBACK_REASON,
+        "keyInsights": ["No analysis", "Fallback used", "Review manually"],
+        "matchCriteria": [{"criterion": "System", "relevance": "No match", "notes": "System error"}]
+    }
+
+
+def _to_recommendation(i: int, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": f"rec-{i}",
+        "opportunityIndex": i,
+        "matchScore": result.get("matchScore", 50),
+        "title": result.get("title", "Match Analysis"),
+        "description": result.get("description", ""),
+        "matchReason": result.get("matchReason", ""),
+        "keyInsights": result.get("keyInsights", []),
+        "matchCriteria": result.get("matchCriteria", [])
+    }
+
+
+def _load_markdown(company_url: Optional[str]) -> str:
     try:
-        path = f"cache/company_{company_url.replace('https://', '').replace('http://', '').replace('/', '_')}.md"
+        path = f"cache/company_{(company_url or '').replace('https://', '').replace('http://', '').replace('/', '_')}.md"
         if os.path.exists(path):
             with open(path, "r") as f:
-                full_markdown = f.read()
+                return f.read()
     except Exception as e:
         logger.warning(f"Markdown loading failed: {e}")
+    return ""
 
-    for i, opportunity in enumerate(opportunities):
-        # If opportunity is just an ID or missing key fields, create a minimal object
-        if not isinstance(opportunity, dict) or not opportunity.get('title'):
-            opp_to_use = {
-                "id": opportunity if not isinstance(opportunity, dict) else opportunity.get('id', f'unknown-{i}'),
-                "title": f"Opportunity {i+1}",
-                "description": "No detailed description available",
-                "skills_required": "N/A",
-                "price_budget": "N/A",
-                "bids_so_far": "N/A",
-                "additional_details": "",
-                "published_date": "Unknown"
-            }
+
+async def _score_single(client, company_url, company_description, full_markdown, i, opportunity, include_match_reason) -> List[Dict[str, Any]]:
+    messages = build_prompt(company_url, company_description, full_markdown, opportunity, include_match_reason)
+    res = await client.chat.completions.create(
+        model=RECOMMENDATION_MODEL,
+        messages=messages,
+        temperature=0.4,
+        max_tokens=1000,
+        n=1
+    )
+    if not res or not res.choices:
+        logger.warning(f"No response received for opportunity {i}")
+        return [_fallback_recommendation(i)]
+    return [_to_recommendation(i, parse_response(res))]
+
+
+async def _score_batch(client, company_url, company_description, full_markdown, batch, include_match_reason) -> List[Dict[str, Any]]:
+    messages = build_batch_prompt(company_url, company_description, full_markdown, batch, include_match_reason)
+    res = await client.chat.completions.create(
+        model=BATCH_RECOMMENDATION_MODEL,
+        messages=messages,
+        temperature=0.4,
+        max_tokens=900 * len(batch),
+        response_format=BATCH_RESPONSE_FORMAT,
+    )
+    content = res.choices[0].message.content if res and res.choices else None
+    matches = json.loads(content).get("matches", []) if content else []
+    by_index = {m.get("opportunityIndex"): m for m in matches if isinstance(m, dict)}
+    recommendations = []
+    for i, _ in batch:
+        if i in by_index:
+            recommendations.append(_to_recommendation(i, by_index[i]))
         else:
-            opp_to_use = opportunity
-            
-        messages = build_prompt(company_url, company_description, full_markdown, opp_to_use, include_match_reason)
-        try:
-            openai_client = get_openai_client()
-            logger.info("OpenAI client initialized successfully")
-            res = openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                temperature=0.4,
-                max_tokens=1000,
-                n=1
-            )
-            logger.info("OpenAI response received")
-            if not res or not res.choices:
-                logger.warning(f"No response received for opportunity {i}")
-                recommendations.append({
-                    "id": f"rec-{i}",
-                    "opportunityIndex": i,
-                    "matchScore": 50,
-                    "title": "Fallback Result",
-                    "description": "Could not generate AI-based match.",
-                    "matchReason": "System fallback",
-                    "keyInsights": ["No analysis", "Fallback used", "Review manually"],
-                    "matchCriteria": [{"criterion": "System", "relevance": "No match", "notes": "System error"}]
-                })
-                continue
-
-            result = parse_response(res)
-            recommendations.append({
-                "id": f"rec-{i}",
-                "opportunityIndex": i,
-                "matchScore": result.get("matchScore", 50),
-                "title": result.get("title", "Match Analysis"),
-                "description": result.get("description", ""),
-                "matchReason": result.get("matchReason", ""),
-                "keyInsights": result.get("keyInsights", []),
-                "matchCriteria": result.get("matchCriteria", [])
-            })
-        except Exception as e:
-            logger.warning(f"OpenAI API failed for opportunity {i}: {e}")
-            recommendations.append({
-                "id": f"rec-{i}",
-                "opportunityIndex": i,
-                "matchScore": 50,
-                "title": "Fallback Result",
-                "description": "Could not generate AI-based match.",
-                "matchReason": "System fallback",
-                "keyInsights": ["No analysis", "Fallback used", "Review manually"],
-                "matchCriteria": [{"criterion": "System", "relevance": "No match", "notes": "System error"}]
-            })
-
-    return {"recommendations": recommendations}
\ No newline at end of file
+            logger.warning(f"No match returned for opportunity {i}")
+            recommendations.append(_fallback_recommendation(i))
+    return recommendations
+
+
+async def generate_recommendations(
+    company_url: str,
+    company_description: str,
+    opportunities: List[Dict[str, Any]],
+    include_match_reason: bool = True,
+    opportunities_per_prompt: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    on_batch: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    client=None,
+    user_id: Optional[str] = None,
+    cache=None,
+):
+    """
+    Score opportunities against a company profile.
+
+    Opportunities are grouped `opportunities_per_prompt` to a structured-output prompt
+    (1 keeps the original one-opportunity GPT-4 prompt) and at most `max_concurrency`
+    prompts are in flight. `on_batch` is awaited with each prompt's recommendations
+    as soon as it completes; an exception it raises cancels the remaining prompts.
+
+    With a `user_id`, results are cached per (user, profile hash, opportunity id):
+    pairs already scored for this profile are answered from the cache (delivered
+    to `on_batch` first) and only the rest reach the LLM.
+
+    Returns:
+        {"recommendations": [...]} ordered by opportunityIndex
+    """
+    per_prompt = max(1, opportunities_per_prompt or OPPORTUNITIES_PER_PROMPT)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or RECOMMENDATION_CONCURRENCY))
+    model = RECOMMENDATION_MODEL if per_prompt == 1 else BATCH_RECOMMENDATION_MODEL
+    limiter = get_model_rate_limiter(model, RECOMMENDATION_RPM, RECOMMENDATION_TPM)
+    full_markdown = _load_markdown(company_url)
+    client = client or get_async_openai_client()
+
+    indexed = [(i, _normalize_opportunity(opp, i)) for i, opp in enumerate(opportunities)]
+    opportunity_ids = {i: str(opp["id"]) for i, opp in indexed if opp.get("id") is not None}
+
+    cached_recs = []
+    if user_id and opportunity_ids:
+        cache = cache or get_match_cache()
+        profile_version = profile_hash(company_url, company_description, full_markdown, str(include_match_reason))
+        hits = await asyncio.to_thread(cache.get_many, user_id, profile_version, list(opportunity_ids.values()))
+        cached_recs = [_to_recommendation(i, hits[opportunity_ids[i]]) for i, _ in indexed if opportunity_ids.get(i) in hits]
+        cached_indexes = {r["opportunityIndex"] for r in cached_recs}
+        indexed = [(i, opp) for i, opp in indexed if i not in cached_indexes]
+    else:
+        cache = None
+    batches = [indexed[i:i + per_prompt] for i in range(0, len(indexed), per_prompt)]
+
+    async def score(batch) -> List[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                if client is None:
+                    raise RuntimeError("OpenAI client not configured")
+                await limiter.acquire(1000 * len(batch))
+                if per_prompt == 1:
+                    i, opportunity = batch[0]
+                    request = _score_single(client, company_url, company_description, full_markdown, i, opportunity, include_match_reason)
+                else:
+                    request = _score_batch(client, company_url, company_description, full_markdown, batch, include_match_reason)
+                return await asyncio.wait_for(request, RECOMMENDATION_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"OpenAI API failed for opportunities {[i for i, _ in batch]}: {e!r}")
+                return [_fallback_recommendation(i) for i, _ in batch]
+
+    started = time.perf_counter()
+    recommendations = list(cached_recs)
+    tasks = [asyncio.create_task(score(batch)) for batch in batches]
+    try:
+        if on_batch and cached_recs:
+            await on_batch(cached_recs)
+        for finished in asyncio.as_completed(tasks):
+            batch_recs = await finished
+            recommendations.extend(batch_recs)
+            if cache is not None:
+                scored = [
+                    (opportunity_ids[r["opportunityIndex"]], {k: v for k, v in r.items() if k not in ("id", "opportunityIndex")})
+                    for r in batch_recs
+                    if r["opportunityIndex"] in opportunity_ids and r.get("matchReason") not in FALLBACK_REASONS
+                ]
+                if scored:
+                    await asyncio.to_thread(cache.put_many, user_id, profile_version, scored)
+            if on_batch:
+                await on_batch(batch_recs)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    recommendations.sort(key=lambda r: r["opportunityIndex"])
+    logger.info(
+        f"Scored {len(recommendations) - len(cached_recs)} opportunities in {len(batches)} prompts in "
+        f"{time.perf_counter() - started:.1f}s ({per_prompt} per prompt, {len(cached_recs)} from match cache)"
+    )
+    return {"recommendations": recommendations}
@@ -3,13 +3,22 @@ import os
 try:
     from app.utils.db_utils import get_db_connection
     from app.utils.logger import get_logger
-    from app.utils.openai_client import get_openai_client
+    from app.utils.openai_client import get_async_openai_client, is_transient_openai_error
+    from app.utils.rate_limiter import get_model_rate_limiter
+    from app.utils.embedding_batcher import estimate_tokens
+    from app.utils.sam_client import SamClient
+    from app.utils.description_cache import get_description_cache
 except:
     from utils.db_utils import get_db_connection
     from utils.logger import get_logger
-    from utils.openai_client import get_openai_client
-import aiohttp
-from typing import List
+    from utils.openai_client import get_async_openai_client, is_transient_openai_error
+    from utils.rate_limiter import get_model_rate_limiter
+    from utils.embedding_batcher import estimate_tokens
+    from utils.sam_client import SamClient
+    from utils.description_cache import get_description_cache
+import random
+import time
+from typing import Dict, List, Optional, Sequence
 import psycopg2
 
 import json
@@ -36,40 +45,22 @@ def normalize_bulleted_summary(summary: dict) -> str:
     except Exception:
         return normalize_bulleted_summary(DEFAULT_SUMMARY)
 
-async def fetch_description_from_sam(description_url):
+async def fetch_description_from_sam(description_url, client=None):
     """
     Fetches the description from SAM.gov API.
     
     Args:
         description_url (str): The URL to fetch the description from
+        client (SamClient): Optional open client to share its session, limiter and backoff
         
     Returns:
-        str: The description text or None if failed
+        str: The description text, or "" if it could not be fetched
     """
     try:
-        # Get SAM.gov API key from environment variable
-        # api_key = os.getenv("SAM_API_KEY")
-        from config.settings import SAM_API_KEY as api_key
-        if not api_key:
-            logger.error("SAM.gov API key not found in environment variables")
-            return None
-
-        # Add API key to URL
-        separator = "&" if "?" in description_url else "?"
-        url_with_key = f"{description_url}{separator}api_key={api_key}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url_with_key) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get('description', '')
-                elif response.status == 429:
-                    logger.error("Rate limit exceeded. Sleeping for 1 hour.")
-                    await asyncio.sleep(3600)
-                    return await fetch_description_from_sam(description_url)
-                else:
-                    logger.error(f"Failed to fetch description from SAM.gov: {response.status}")
-                    return ""
+        if client is not None:
+            return await client.fetch_description(description_url)
+        async with SamClient(cache=get_description_cache()) as sam:
+            return await sam.fetch_description(description_url)
     except Exception as e:
         logger.error(f"Error fetching description from SAM.gov: {str(e)}")
         return ""
@@ -86,13 +77,55 @@ SUMMARY_TEMPLATE = """
 }
 """
 
-async def generate_description_summary(description_text, max_length=300):
+SUMMARY_MODEL = "gpt-4.1-mini"
+# Account limits for SUMMARY_MODEL; shared by every concurrent summarization in the process
+SUMMARY_RPM = int(os.getenv("SUMMARY_RPM", "500"))
+SUMMARY_TPM = int(os.getenv("SUMMARY_TPM", "200000"))
+
+async def _request_description_summary(client, description_text, max_length=300):
+    """Single chat completion for a description summary; raises on any failure."""
+    # Truncate very long descriptions
+    if len(description_text) > 6000:
+        description_text = description_text[:6000] + "..."
+
+    response = await client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        response_format={ "type": "json_object" },
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "You are an expert government contract analyst. Write a concise summary for a business audience.\n"
+                "Please analyze this opportunity and return a JSON object with the following structure:\n"
+                "{\n"
+                "   " + SUMMARY_TEMPLATE + "\n}\n"
+                "If any information is not available in the description, use 'Not specified' as the value.\n"
+                "For contact information and due date, leave as empty string if not specified."
+            )
+            },
+            {
+                "role": "user",
+                "content": (
+                    "Summarize this government contract opportunity for a business audience:\n\n"
+                    f"{description_text}"
+                )
+            }
+        ],
+        temperature=0.2, 
+        max_tokens=max_length,
+        n=1
+    )
+    summary = response.choices[0].message.content.strip()
+    return json.loads(summary)
+
+async def generate_description_summary(description_text, max_length=300, client=None):
     """
     Generates a clear, engaging summary of a contract description.
     
     Args:
         description_text (str): The original contract description text
         max_length (int): Maximum token length for the summary
+        client: Optional AsyncOpenAI client to reuse
         
     Returns:
         str: A clear, concise summary capturing key essentials
@@ -100,54 +133,88 @@ async def generate_description_summary(description_text, max_length=300):
     try:
         if not description_text or description_text.strip() == "":
             return "No description available."
-            
-        # Truncate very long descriptions
-        if len(description_text) > 6000:
-            description_text = description_text[:6000] + "..."
 
-        client = get_openai_client()   
-        logger.info("OpenAI client initialized successfully")
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            response_format={ "type": "json_object" },
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert government contract analyst. Write a concise summary for a business audience.\n"
-                    "Please analyze this opportunity and return a JSON object with the following structure:\n"
-                    "{\n"
-                    "   " + SUMMARY_TEMPLATE + "\n}\n"
-                    "If any information is not available in the description, use 'Not specified' as the value.\n"
-                    "For contact information and due date, leave as empty string if not specified."
-                )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        "Summarize this government contract opportunity for a business audience:\n\n"
-                        f"{description_text}"
-                    )
-                }
-            ],
-            temperature=0.2, 
-            max_tokens=max_length,
-            n=1
-        )
+        client = client or get_async_openai_client()
+        summary = await _request_description_summary(client, description_text, max_length)
         logger.info("OpenAI response received")
-        summary = response.choices[0].message.content.strip()
-        
-        # Ensure bullet list formatting
-        # summary = normalize_bulleted_summary(summary)
-        
-        # logger.info(f"Generated concise summary of {len(summary)} chars")
-        summary = json.loads(summary)
         return summary
         
     except Exception as e:
         logger.error(f"Summary generation error: {str(e)}")
         return "Unable to generate a summary. Direct review of the description is recommended."
 
+async def generate_description_summaries(
+    descriptions: Sequence[str],
+    max_concurrency: int = 8,
+    timeout: float = 60.0,
+    max_retries: int = 3,
+    max_length: int = 300,
+    client=None,
+) -> List[Optional[dict]]:
+    """
+    Summarize many descriptions concurrently.
+
+    At most `max_concurrency` requests are in flight, all requests share the
+    per-model rate limiter, and each attempt is bounded by `timeout` seconds.
+    Rate limits, timeouts and 5xx responses are retried with jittered backoff;
+    other API errors and unparseable output fail the item at once. Identical
+    descriptions are summarized once.
+
+    Returns:
+        list aligned with `descriptions`: the parsed summary dict, or None for empty
+        descriptions and items that still failed after retries
+    """
+    results: List[Optional[dict]] = [None] * len(descriptions)
+    unique: Dict[str, List[int]] = {}
+    for i, text in enumerate(descriptions):
+        if isinstance(text, str) and text.strip():
+            unique.setdefault(text, []).append(i)
+    if not unique:
+        return results
+
+    client = client or get_async_openai_client()
+    if client is None:
+        logger.error("OpenAI client not configured; skipping summarization")
+        return results
+    # Retries are ours (below); the SDK's own would multiply them
+    client = client.with_options(max_retries=0)
+    limiter = get_model_rate_limiter(SUMMARY_MODEL, SUMMARY_RPM, SUMMARY_TPM)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    stats = {"ok": 0, "failed": 0, "retries": 0}
+
+    async def summarize(text: str) -> Optional[dict]:
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                try:
+                    await limiter.acquire(min(estimate_tokens(text), 2000) + max_length)
+                    summary = await asyncio.wait_for(
+                        _request_description_summary(client, text, max_length), timeout
+                    )
+                    stats["ok"] += 1
+                    return summary
+                except Exception as e:
+                    if attempt >= max_retries or not is_transient_openai_error(e):
+                        stats["failed"] += 1
+                        logger.error(f"Summary generation failed after {attempt + 1} attempts: {e!r}")
+                        return None
+                    stats["retries"] += 1
+                    delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                    logger.warning(f"Summary request failed ({e!r}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    started = time.perf_counter()
+    texts = list(unique.keys())
+    summaries = await asyncio.gather(*(summarize(text) for text in texts))
+    for text, summary in zip(texts, summaries):
+        for i in unique[text]:
+            results[i] = summary
+
+    logger.info(
+        f"Summarized {stats['ok']}/{len(texts)} unique descriptions in {time.perf_counter() - started:.1f}s "
+        f"(concurrency {max_concurrency}, {stats['retries']} retries, {stats['failed']} failed)"
+    )
+    return results
+
 async def generate_title_and_summary(opportunity_title, description_text, max_length=400):
     """
     Generates an improved title (based on the original title and description) and a summary for a contract opportunity.
@@ -163,10 +230,10 @@ async def generate_title_and_summary(opportunity_title, description_text, max_le
         # Truncate very long descriptions to avoid excessive token usage
         truncated_desc = description_text #[:4000] if len(description_text) > 4000 else description_text
         
-        client = get_openai_client()
+        client = get_async_openai_client()
         
         # Generate structured data in JSON format
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4.1-mini",
             response_format={ "type": "json_object" },
             messages=[
@@ -1,15 +1,18 @@
 # backend/app/utils/db_utils.py
 import os
 import sys
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 
 # Add the app directory to Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 try:
-    from app.config.settings import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+    from app.config.settings import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, DB_POOL_MAX_CONNECTIONS
 except ImportError:
-    from config.settings import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+    from config.settings import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, DB_POOL_MAX_CONNECTIONS
 from utils.logger import get_logger
 try:
     # supabase-py client (install via: pip install supabase)
@@ -71,6 +74,45 @@ def get_db_connection():
         # logger.error(f"Database connection error: {e}")
         raise
 
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> ThreadedConnectionPool:
+    """
+    Return the process-wide psycopg2 connection pool, creating it on first use.
+    Connections are opened lazily, up to DB_POOL_MAX_CONNECTIONS.
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None or _db_pool.closed:
+            _db_pool = ThreadedConnectionPool(0, DB_POOL_MAX_CONNECTIONS, **get_db_connection_params())
+        return _db_pool
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the shared pool. An open transaction is rolled back
+    when the block raises; the connection goes back to the pool either way.
+    """
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+def close_db_pool():
+    """Close every pooled connection (end of a cron run)."""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None and not _db_pool.closed:
+            _db_pool.closeall()
+        _db_pool = None
+
 def get_supabase_connection(use_service_key: bool = True):
     """
     Initialize and return a Supabase client using settings from config.
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from app.utils.logger import get_logger
+    from app.config.settings import SAM_DESCRIPTION_CACHE_PATH, SAM_DESCRIPTION_CACHE_TTL_DAYS
+except ImportError:
+    from utils.logger import get_logger
+    from config.settings import SAM_DESCRIPTION_CACHE_PATH, SAM_DESCRIPTION_CACHE_TTL_DAYS
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS descriptions (
+    notice_id    TEXT NOT NULL,
+    url          TEXT NOT NULL,
+    version      TEXT,
+    content_hash TEXT NOT NULL,
+    body         BLOB NOT NULL,
+    fetched_at   REAL NOT NULL,
+    PRIMARY KEY (notice_id, url)
+)
+"""
+
+
+def notice_id_from_url(url: str) -> str:
+    """SAM.gov description URLs carry the notice id as ?noticeid=..."""
+    try:
+        values = parse_qs(urlparse(url).query).get("noticeid")
+        return values[0] if values else ""
+    except Exception:
+        return ""
+
+
+class DescriptionCache:
+    """
+    SQLite cache of SAM.gov notice descriptions, keyed by (notice_id, url).
+
+    Bodies are zlib-compressed. An entry is served while it is younger than the
+    TTL and, when the caller passes a version (e.g. the notice's postedDate),
+    only if that version matches what was cached; anything else is a miss and
+    gets refreshed from the network.
+    """
+
+    def __init__(self, path: str = SAM_DESCRIPTION_CACHE_PATH, ttl_days: int = SAM_DESCRIPTION_CACHE_TTL_DAYS):
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str, notice_id: Optional[str] = None, version: Optional[str] = None) -> Optional[str]:
+        notice_id = notice_id or notice_id_from_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, body, fetched_at FROM descriptions WHERE notice_id = ? AND url = ?",
+                (notice_id, url),
+            ).fetchone()
+        if (
+            row is None
+            or time.time() - row[2] > self.ttl_seconds
+            or (version is not None and row[0] != version)
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[1]).decode("utf-8")
+
+    def put(self, url: str, text: str, notice_id: Optional[str] = None, version: Optional[str] = None) -> None:
+        notice_id = notice_id or notice_id_from_url(url)
+        body = (text or "").encode("utf-8")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions (notice_id, url, version, content_hash, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (notice_id, url, version, hashlib.sha256(body).hexdigest(), zlib.compress(body, 6), time.time()),
+            )
+            self._conn.commit()
+
+    def prune(self, max_age_days: Optional[int] = None) -> int:
+        """Drop entries older than max_age_days (default: twice the TTL) to keep the CI cache small."""
+        max_age = (max_age_days * 86400) if max_age_days is not None else 2 * self.ttl_seconds
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM descriptions WHERE fetched_at < ?", (time.time() - max_age,))
+            self._conn.commit()
+        return cur.rowcount
+
+    def close(self) -> None:
+        """Fold the WAL back into the database file, then close; CI caches only the .sqlite3 file."""
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self._conn.close()
+
+
+_cache: Optional[DescriptionCache] = None
+
+
+def get_description_cache() -> Optional[DescriptionCache]:
+    """Process-wide cache; None (no caching) if the cache file can't be opened."""
+    global _cache
+    if _cache is None:
+        try:
+            _cache = DescriptionCache()
+        except Exception as e:
+            logger.warning(f"SAM.gov description cache unavailable: {e}")
+            return None
+    return _cache
+
+
+def close_description_cache() -> None:
+    """Close the process-wide cache (if opened) at the end of a job."""
+    global _cache
+    if _cache is not None:
+        cache, _cache = _cache, None
+        try:
+            cache.close()
+        except Exception as e:
+            logger.warning(f"Could not close SAM.gov description cache: {e}")
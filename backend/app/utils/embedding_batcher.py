@@ -0,0 +1,192 @@
+import asyncio
+import random
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from app.utils.logger import get_logger
+    from app.utils.openai_client import get_async_openai_client, is_transient_openai_error
+    from app.utils.embedding_cache import content_hash
+except ImportError:
+    from utils.logger import get_logger
+    from utils.openai_client import get_async_openai_client, is_transient_openai_error
+    from utils.embedding_cache import content_hash
+
+logger = get_logger(__name__)
+
+# OpenAI embeddings endpoint limits (per request)
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300000
+# Per-input cap of the embedding models
+MAX_TOKENS_PER_INPUT = 8191
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def estimate_tokens(text: str) -> int:
+        return len(_encoding.encode(text, disallowed_special=()))
+
+    def truncate_to_tokens(text: str, max_tokens: int = MAX_TOKENS_PER_INPUT) -> str:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens])
+except Exception:
+    _encoding = None
+
+    def estimate_tokens(text: str) -> int:
+        # Conservative fallback: ~3 chars per token for English prose
+        return len(text) // 3 + 1
+
+    def truncate_to_tokens(text: str, max_tokens: int = MAX_TOKENS_PER_INPUT) -> str:
+        # Without a tokenizer, 2 chars per token keeps dense text (numbers, codes) under the cap
+        return text[:max_tokens * 2]
+
+
+def pack_batches(
+    texts: Sequence[str],
+    max_inputs: int = MAX_INPUTS_PER_REQUEST,
+    max_tokens: int = MAX_TOKENS_PER_REQUEST,
+) -> List[List[int]]:
+    """
+    Greedily pack text indexes into request-sized batches that respect both the
+    input-count and the total-token limit. Empty texts are left out.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        tokens = min(estimate_tokens(text), MAX_TOKENS_PER_INPUT)
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingBatcher:
+    """
+    Embeds many texts with as few requests as possible.
+
+    Inputs are packed into batches under the per-request input and token limits,
+    a bounded number of batches run concurrently on the async client, and the
+    response vectors are mapped back to their input position by `index`. Inputs
+    over the model's per-input token cap are truncated rather than failing their
+    batch, and only transient errors (429, 5xx, timeouts, connection errors) are
+    retried.
+    With an EmbeddingCache, texts already embedded under the same model are served
+    from the cache and only the misses are sent to the API.
+    """
+
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        max_concurrency: int = 4,
+        max_inputs_per_request: int = 512,
+        max_tokens_per_request: int = 250000,
+        max_retries: int = 5,
+        client=None,
+        cache=None,
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_inputs_per_request = min(max_inputs_per_request, MAX_INPUTS_PER_REQUEST)
+        self.max_tokens_per_request = min(max_tokens_per_request, MAX_TOKENS_PER_REQUEST)
+        self.max_retries = max_retries
+        self._client = client
+        self.cache = cache
+        self.requests_made = 0
+        self.cache_hits = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            client = get_async_openai_client()
+            if client is None:
+                raise RuntimeError("OpenAI client not configured")
+            # Retries are ours (below); the SDK's own would multiply them
+            self._client = client.with_options(max_retries=0)
+        return self._client
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        inputs = [truncate_to_tokens(t) for t in texts]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.requests_made += 1
+                resp = await self.client.embeddings.create(model=self.model, input=inputs)
+                vectors: List[Optional[List[float]]] = [None] * len(texts)
+                for item in resp.data:
+                    vectors[item.index] = item.embedding
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_openai_error(e):
+                    raise
+                delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                logger.warning(f"Embedding request failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def embed_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Embed all texts. Returns a list aligned with `texts`; entries are None for empty
+        texts and for batches that still failed after retries.
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        pending = list(range(len(texts)))
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+            pending = []
+            for i, text in enumerate(texts):
+                vector = cached.get(content_hash(self.model, text)) if text else None
+                if vector is not None:
+                    results[i] = vector
+                    self.cache_hits += 1
+                else:
+                    pending.append(i)
+
+        # Identical texts in one call are sent once
+        unique: Dict[str, int] = {}
+        for i in pending:
+            unique.setdefault(texts[i], i)
+        to_send = list(unique.keys())
+
+        batches = pack_batches(to_send, self.max_inputs_per_request, self.max_tokens_per_request)
+        if not batches:
+            return results
+        fresh: List[Optional[List[float]]] = [None] * len(to_send)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch: List[int]):
+            async with semaphore:
+                try:
+                    vectors = await self._embed_batch([to_send[i] for i in batch])
+                except Exception as e:
+                    logger.error(f"Embedding batch of {len(batch)} inputs failed: {e}")
+                    return
+                for i, vector in zip(batch, vectors):
+                    fresh[i] = vector
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+
+        by_text = {text: vector for text, vector in zip(to_send, fresh) if vector is not None}
+        for i in pending:
+            results[i] = by_text.get(texts[i])
+        if self.cache is not None and by_text:
+            await asyncio.to_thread(self.cache.put_many, self.model, by_text.items())
+
+        logger.info(
+            f"Embedded {sum(v is not None for v in results)}/{len(texts)} texts "
+            f"({self.cache_hits} from cache) in {len(batches)} requests (concurrency {self.max_concurrency})"
+        )
+        return results
+
+    async def embed(self, text: str) -> List[float]:
+        vector = (await self.embed_many([text]))[0]
+        if vector is None:
+            raise RuntimeError("Embedding request failed")
+        return vector
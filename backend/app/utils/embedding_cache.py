@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from app.utils.logger import get_logger
+    from app.utils.db_utils import get_supabase_connection
+except ImportError:
+    from utils.logger import get_logger
+    from utils.db_utils import get_supabase_connection
+
+logger = get_logger(__name__)
+
+EMBEDDING_CACHE_TABLE = "embedding_cache"
+# Keeps `in_` filters well under PostgREST URL limits
+LOOKUP_CHUNK = 100
+# In-process memo size (a 1536-dim vector is ~50 KB as Python floats)
+MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "512"))
+
+
+def content_hash(model: str, text: str) -> str:
+    """Cache key for an embedding: sha256 over the model name and the exact input text."""
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _parse_vector(value) -> Optional[List[float]]:
+    # pgvector columns come back over REST as "[0.1,0.2,...]"
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return list(value)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store backed by the `embedding_cache` table.
+
+    Identical (model, text) pairs always map to the same row, so a text that has
+    been embedded once never reaches the API again. The most recently used vectors
+    are memoized in-process (up to `memory_items`, shared by the worker threads
+    that call in via asyncio.to_thread, hence the lock) and any cache failure
+    degrades to a miss rather than failing the caller.
+    """
+
+    def __init__(self, supabase=None, memory_items: int = MEMORY_ITEMS):
+        self._supabase = supabase
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._memory_items = memory_items
+        self._memory_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            self._supabase = get_supabase_connection(use_service_key=True)
+        return self._supabase
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        with self._memory_lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._memory_items:
+                self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, List[float]]:
+        """Return {content_hash: vector} for every text already in the cache."""
+        wanted = {content_hash(model, t) for t in texts if t and t.strip()}
+        with self._memory_lock:
+            found = {h: self._memory[h] for h in wanted if h in self._memory}
+            for h in found:
+                self._memory.move_to_end(h)
+        missing = [h for h in wanted if h not in found]
+        try:
+            for i in range(0, len(missing), LOOKUP_CHUNK):
+                chunk = missing[i:i + LOOKUP_CHUNK]
+                resp = (
+                    self.supabase
+                    .table(EMBEDDING_CACHE_TABLE)
+                    .select("content_hash, embedding")
+                    .in_("content_hash", chunk)
+                    .execute()
+                )
+                for row in getattr(resp, "data", None) or []:
+                    vector = _parse_vector(row.get("embedding"))
+                    if vector is not None:
+                        found[row["content_hash"]] = vector
+                        self._remember(row["content_hash"], vector)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, treating as misses: {e}")
+        with self._memory_lock:
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text]).get(content_hash(model, text))
+
+    def put_many(self, model: str, entries: Iterable[Tuple[str, List[float]]]) -> None:
+        """Store (text, vector) pairs; existing hashes are left as they are."""
+        rows = {}
+        for text, vector in entries:
+            if vector is None or not text:
+                continue
+            h = content_hash(model, text)
+            self._remember(h, vector)
+            rows[h] = {"content_hash": h, "model": model, "embedding": vector}
+        rows = list(rows.values())
+        try:
+            for i in range(0, len(rows), LOOKUP_CHUNK):
+                (
+                    self.supabase
+                    .table(EMBEDDING_CACHE_TABLE)
+                    .upsert(rows[i:i + LOOKUP_CHUNK], on_conflict="content_hash", ignore_duplicates=True)
+                    .execute()
+                )
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        self.put_many(model, [(text, vector)])
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache instance (shares the in-process memo between callers)."""
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
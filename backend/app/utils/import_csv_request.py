@@ -5,21 +5,17 @@ app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
 if app_dir not in sys.path:
     sys.path.insert(0, app_dir)
 
+import io
 import time
-import requests
-import threading
 import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
 
-from tqdm import tqdm
-from multiprocessing.pool import ThreadPool
-from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, Optional
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from utils.db_utils import get_db_connection, get_db_connection_params
+from utils.db_utils import pooled_connection, close_db_pool
+from utils.ranged_download import download_file
 from utils.logger import get_logger
 
 logger = get_logger("csv_importer",True,True,"csv_importer.log")
@@ -35,161 +31,75 @@ LOCAL_FILE = "temp/contract_opportunities.csv"
 NOTICE_ID_COL = "NoticeId"
 DESCRIPTION_COL = "Description"
 CHUNK_SIZE = 50000
-MAX_WORKERS = 5
-BATCH_SIZE = 1000
+STAGING_TABLE = "sam_gov_csv_stage"
+# Bytes handed to COPY per read() of the CSV stream
+COPY_READ_SIZE = 1 << 20
 
 def ensure_dir():
     os.makedirs(os.path.dirname(LOCAL_FILE), exist_ok=True)
 
-def should_download_new_file(filepath, max_age_days=1):
+class ChunkStream(io.TextIOBase):
     """
-    Determine if the file should be downloaded.
-    Download if the file does not exist or is older than max_age_days.
+    Read-only file object over an iterator of text blocks, so COPY FROM STDIN can
+    consume a generator without the whole payload being materialised.
     """
-    if not os.path.exists(filepath):
-        # logger.info(f"File {filepath} does not exist, will download.")
-        return True
-
-    modified_time = datetime.fromtimestamp(os.path.getmtime(filepath), tz=timezone.utc)
-    now = datetime.now(tz=timezone.utc)
-    age = now - modified_time
 
-    # logger.info(f"File last modified (UTC): {modified_time}")
-    # logger.info(f"Current time (UTC): {now}")
-    # logger.info(f"File age: {age}")
+    def __init__(self, blocks: Iterable[str]):
+        self._blocks: Iterator[str] = iter(blocks)
+        self._current = ""
+        self._pos = 0
 
-    if age > timedelta(days=max_age_days):
-        # logger.info(f"File {filepath} is older than {max_age_days} day(s), will download new file.")
+    def readable(self) -> bool:
         return True
 
-    # logger.info(f"File {filepath} is fresh; skipping download.")
-    return False
-
-def download_with_resume(url, filepath):
-    ensure_dir()
-    headers = {}
-    pos = 0
-
-    if os.path.exists(filepath):
-        pos = os.path.getsize(filepath)
-        headers["Range"] = f"bytes={pos}-"
-        logger.info(f"Resuming download from byte {pos}")
-
-    response = requests.get(url, headers=headers, stream=True)
-    total_size = int(response.headers.get("content-length", 0)) + pos
-    mode = "ab" if pos else "wb"
-    progress = tqdm(total=total_size, initial=pos, unit='iB', unit_scale=True, desc="Downloading CSV")
-
-    with open(filepath, mode) as f:
-        for chunk in response.iter_content(1024):
-            if chunk:
-                f.write(chunk)
-                progress.update(len(chunk))
-
-    progress.close()
-    # logger.info("Download complete.")
-
-def check_duplicates(cursor, notice_ids):
-    format_ids = tuple(notice_ids)
-    sql = f"SELECT notice_id FROM sam_gov_csv WHERE notice_id IN %s"
-    cursor.execute(sql, (format_ids,))
-    return set(row[0] for row in cursor.fetchall())
-
-def insert_records(records):
-    if not records:
-        return 0
-
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        execute_values(
-            cursor,
-            """
-            INSERT INTO sam_gov_csv (
-                notice_id, description, created_by, updated_by, updated_at
-            )
-            VALUES %s
-            ON CONFLICT (notice_id) DO UPDATE
-            SET
-                description = EXCLUDED.description,
-                updated_by = EXCLUDED.updated_by,
-                updated_at = EXCLUDED.updated_at
-            """,
-            [(nid, desc, IMPORT_USER, IMPORT_USER) for nid, desc in records],
-            template="(%s, %s, %s, %s, CURRENT_TIMESTAMP)"
-        )
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return len(records)
-    except Exception as e:
-        logger.error(f"Insert failed: {e}")
-        return 0
-
-
-def process_chunk(chunk, conn_params):
-    skipped = {
-        "empty_notice_id": 0,
-        "empty_description": 0,
-        "duplicates": 0
-    }
-    records = []
-
-    try:
-        conn = psycopg2.connect(**conn_params)
-        cursor = conn.cursor()
-
-        # Drop empty notice_id or description
-        original_count = len(chunk)
-        chunk = chunk.dropna(subset=[NOTICE_ID_COL, DESCRIPTION_COL])
-        cleaned_count = len(chunk)
-
-        skipped["empty_notice_id"] = original_count - cleaned_count
-
-        # Remove rows where description is just whitespace
-        before_desc_strip = len(chunk)
-        chunk = chunk[chunk[DESCRIPTION_COL].str.strip() != ""]
-        skipped["empty_description"] = before_desc_strip - len(chunk)
-
-        chunk[NOTICE_ID_COL] = chunk[NOTICE_ID_COL].astype(str)
-        chunk[DESCRIPTION_COL] = chunk[DESCRIPTION_COL].astype(str)
-
-        ids_to_check = chunk[NOTICE_ID_COL].tolist()
-        existing_ids = check_duplicates(cursor, ids_to_check)
-
-        for _, row in chunk.iterrows():
-            nid = row[NOTICE_ID_COL]
-            if nid in existing_ids:
-                skipped["duplicates"] += 1
-                logger.debug(f"Skipped duplicate: {nid}")
+    def read(self, size: Optional[int] = -1) -> str:
+        if size is None:
+            size = -1
+        parts = []
+        while size != 0:
+            if self._pos >= len(self._current):
+                block = next(self._blocks, None)
+                if block is None:
+                    break
+                self._current, self._pos = block, 0
                 continue
-            records.append((nid, row[DESCRIPTION_COL]))
-
-        cursor.close()
-        conn.close()
-
-    except Exception as e:
-        logger.error(f"Error processing chunk: {e}")
-
-    return records, skipped
-
-
-def import_csv_to_db():
-    start = time.time()
-    ensure_dir()
-    # logger.info("Starting import...")
-
-    # Step 1: Download if necessary
-    if should_download_new_file(LOCAL_FILE):
-        downloader = threading.Thread(target=download_with_resume, args=(CSV_URL, LOCAL_FILE))
-        downloader.start()
-        downloader.join()
-
-    # Step 2: Ensure DB and Table
-    conn = get_db_connection()
-    cursor = conn.cursor()
+            end = len(self._current) if size < 0 else min(len(self._current), self._pos + size)
+            parts.append(self._current[self._pos:end])
+            if size > 0:
+                size -= end - self._pos
+            self._pos = end
+        return "".join(parts)
+
+
+def clean_chunk(chunk: pd.DataFrame, skipped: Dict[str, int]) -> pd.DataFrame:
+    """Drop rows without a notice id or with a blank description; count what was dropped."""
+    notice_ids = chunk[NOTICE_ID_COL].str.strip()
+    has_id = notice_ids.notna() & (notice_ids != "")
+    has_desc = chunk[DESCRIPTION_COL].notna()
+    blank_desc = has_desc & (chunk[DESCRIPTION_COL].str.strip() == "")
+    skipped["empty_notice_id"] += int((~has_id | ~has_desc).sum())
+    skipped["empty_description"] += int((has_id & blank_desc).sum())
+
+    keep = has_id & has_desc & ~blank_desc
+    # Postgres text cannot hold NUL bytes
+    return pd.DataFrame({
+        NOTICE_ID_COL: notice_ids[keep],
+        DESCRIPTION_COL: chunk.loc[keep, DESCRIPTION_COL].str.replace("\x00", "", regex=False),
+    })
+
+
+def iter_csv_blocks(chunks: Iterable[pd.DataFrame], skipped: Dict[str, int], stats: Dict[str, int]) -> Iterator[str]:
+    """Yield each cleaned chunk as CSV text (no header) for COPY."""
+    for chunk_num, chunk in enumerate(chunks, start=1):
+        cleaned = clean_chunk(chunk, skipped)
+        stats["rows_read"] += len(chunk)
+        stats["rows_staged"] += len(cleaned)
+        logger.info(f"Chunk #{chunk_num}: {len(cleaned)} of {len(chunk)} rows staged")
+        if len(cleaned):
+            yield cleaned.to_csv(index=False, header=False, lineterminator="\n")
+
+
+def ensure_tables(cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS sam_gov_csv (
             notice_id VARCHAR(255) PRIMARY KEY,
@@ -201,53 +111,119 @@ def import_csv_to_db():
         );
         CREATE INDEX IF NOT EXISTS idx_notice_id ON sam_gov_csv(notice_id);
     """)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # Unlogged: the staging rows are rebuilt every run, so skip the WAL for them
+    cursor.execute(f"""
+        CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLE} (
+            seq BIGSERIAL,
+            notice_id TEXT,
+            description TEXT
+        );
+    """)
 
-    # Step 3: Process and insert with multiprocessing
-    conn_params = get_db_connection_params()
 
-    total_inserted = 0
-    total_skipped = {"empty_notice_id": 0, "empty_description": 0, "duplicates": 0}
-    pool = ThreadPool(MAX_WORKERS)
+def load_csv(filepath: str = LOCAL_FILE) -> Dict[str, int]:
+    """
+    Stream the CSV into the unlogged staging table with one COPY, then merge it
+    into sam_gov_csv with a single INSERT ... ON CONFLICT. Rows whose description
+    is unchanged are left alone; a notice id repeated in the file keeps its last row.
+    """
+    skipped = {"empty_notice_id": 0, "empty_description": 0}
+    stats = {"rows_read": 0, "rows_staged": 0}
 
-    for chunk_num, chunk in enumerate(pd.read_csv(
-        LOCAL_FILE,
+    chunks = pd.read_csv(
+        filepath,
         chunksize=CHUNK_SIZE,
         usecols=[NOTICE_ID_COL, DESCRIPTION_COL],
+        dtype=str,
         encoding="cp1252",
         encoding_errors="replace"
-    ), start=1):
-        # logger.info(f"Processing chunk #{chunk_num}...")
-        records,skipped  = process_chunk(chunk, conn_params)
-        records_len = len(records)
- 
-        logger.info(
-            f"Chunk #{chunk_num}: Skipped(Duplicates)={skipped['duplicates']}, "
-            f"Skipped(Empty ID)={skipped['empty_notice_id']}, Skipped(Empty Desc)={skipped['empty_description']}"
-        )
-        logger.info(f"Chunk #{chunk_num}: {records_len} records to insert")
- 
-        for i in range(0, records_len, BATCH_SIZE):
-            batch = records[i:i+BATCH_SIZE]
-            pool.apply_async(insert_records, args=(batch,), callback=lambda x: logger.info(f"Chunk #{chunk_num}: Inserted {x} records"))
- 
-        total_inserted += records_len
-        for key in total_skipped:
-            total_skipped[key] += skipped[key]
-       
-    pool.close()
-    pool.join() 
-
-    # logger.info(f"Import finished: Total inserted: {total_inserted}, Total skipped: {total_skipped}  in {time.time() - start:.2f}s")
-
-    # Step 4: Clean up file (optional: retain for a day)
+    )
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            ensure_tables(cursor)
+            conn.commit()
+
+            # TRUNCATE holds an exclusive lock until commit, so overlapping runs queue up
+            cursor.execute(f"TRUNCATE {STAGING_TABLE} RESTART IDENTITY")
+            copy_started = time.time()
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} (notice_id, description) FROM STDIN WITH (FORMAT csv)",
+                ChunkStream(iter_csv_blocks(chunks, skipped, stats)),
+                size=COPY_READ_SIZE,
+            )
+            copy_seconds = time.time() - copy_started
+
+            merge_started = time.time()
+            cursor.execute(f"""
+                WITH latest AS (
+                    SELECT DISTINCT ON (notice_id) notice_id, description
+                    FROM {STAGING_TABLE}
+                    ORDER BY notice_id, seq DESC
+                ), upserted AS (
+                    INSERT INTO sam_gov_csv (
+                        notice_id, description, created_by, updated_by, updated_at
+                    )
+                    SELECT notice_id, description, %(user)s, %(user)s, CURRENT_TIMESTAMP
+                    FROM latest
+                    ON CONFLICT (notice_id) DO UPDATE
+                    SET
+                        description = EXCLUDED.description,
+                        updated_by = EXCLUDED.updated_by,
+                        updated_at = EXCLUDED.updated_at
+                    WHERE sam_gov_csv.description IS DISTINCT FROM EXCLUDED.description
+                    RETURNING (xmax = 0) AS inserted
+                )
+                SELECT
+                    (SELECT count(*) FROM latest),
+                    count(*) FILTER (WHERE inserted),
+                    count(*) FILTER (WHERE NOT inserted)
+                FROM upserted
+            """, {"user": IMPORT_USER})
+            distinct_ids, inserted, updated = cursor.fetchone()
+            cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+            conn.commit()
+            merge_seconds = time.time() - merge_started
+
+    result = {
+        **stats,
+        "distinct_notice_ids": distinct_ids,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": distinct_ids - inserted - updated,
+        "skipped_empty_notice_id": skipped["empty_notice_id"],
+        "skipped_empty_description": skipped["empty_description"],
+        "copy_seconds": round(copy_seconds, 2),
+        "merge_seconds": round(merge_seconds, 2),
+    }
+    logger.info(f"sam_gov_csv load: {result}")
+    return result
+
+
+def import_csv_to_db():
+    start = time.time()
+    ensure_dir()
+    # logger.info("Starting import...")
+
+    # Step 1: Download unless the server copy is unchanged (ETag / Last-Modified)
+    download = download_file(CSV_URL, LOCAL_FILE)
+    logger.info(f"CSV download: {download}")
+
+    # Step 2: Stage with COPY and merge in one statement
+    try:
+        result = load_csv(LOCAL_FILE)
+    finally:
+        close_db_pool()
+
+    # Step 3: Clean up file (optional: retain for a day)
     # try:
     #     os.remove(LOCAL_FILE)
     #     logger.info(f"Deleted temp file: {LOCAL_FILE}")
     # except Exception as e:
     #     logger.warning(f"Failed to delete temp file: {e}")
 
+    logger.info(f"Import finished in {time.time() - start:.2f}s: {result}")
+    return result
+
 if __name__ == "__main__":
     import_csv_to_db()
@@ -6,12 +6,18 @@ if app_dir not in sys.path:
     sys.path.insert(0, app_dir)
     
 import time
+import math
+import hashlib
 
 import json
 from datetime import datetime, timedelta, date
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from typing import List, Dict, Optional
 import numpy as np
 from tqdm import tqdm
@@ -368,6 +374,20 @@ def get_vector_id(record, source):
         return f"freelancer_{record['job_url']}"
     return f"{source}_{record.get('notice_id', record.get('job_url', record.get('id', 'unknown')))}"
 
+def build_record_text(record: Dict, source: str) -> str:
+    """
+    Build the text that gets embedded for a record.
+    """
+    if source == "sam_gov":
+        description = record['description'] if record['description'] else ""
+        title = record['title'] if record['title'] else ""
+        return f"{title} {description}"
+    # freelancer
+    additional_details = record['additional_details'] if record['additional_details'] else ""
+    skills = record['skills_required'] if record['skills_required'] else ""
+    title = record['title'] if record['title'] else ""
+    return f"{title} {skills} {additional_details}"
+
 def index_records_to_pinecone(records: List[Dict], source: str, incremental: bool = True) -> int:
     """
     Common function to index records to Pinecone.
@@ -436,15 +456,7 @@ def index_records_to_pinecone(records: List[Dict], source: str, incremental: boo
                 continue
             
             # Create content to embed based on source
-            if source == "sam_gov":
-                description = record['description'] if record['description'] else ""
-                title = record['title'] if record['title'] else ""
-                text = f"{title} {description}"
-            else:  # freelancer
-                additional_details = record['additional_details'] if record['additional_details'] else ""
-                skills = record['skills_required'] if record['skills_required'] else ""
-                title = record['title'] if record['title'] else ""
-                text = f"{title} {skills} {additional_details}"
+            text = build_record_text(record, source)
             
             # Skip records with no meaningful content
             if not text.strip():
@@ -525,7 +537,184 @@ def index_records_to_pinecone(records: List[Dict], source: str, incremental: boo
     
     return stats["indexed"] + stats["updated"]
 
-def index_sam_gov_to_pinecone(incremental=True):
+def _init_embedding_worker():
+    """
+    Process-pool initializer: pin intra-op threads to one and load the model once per worker.
+    """
+    os.environ["OMP_NUM_THREADS"] = "1"
+    os.environ["MKL_NUM_THREADS"] = "1"
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    get_model()
+
+def _encode_shard(shard_index: int, texts: List[str], encode_batch_size: int = 64):
+    """
+    Encode one shard of texts in a worker and hand the float32 matrix back through shared memory.
+    Returns (shard_index, shared memory name, shape); the parent owns unlinking the block.
+    """
+    model = get_model()
+    embeddings = np.asarray(
+        model.encode(texts, batch_size=encode_batch_size, show_progress_bar=False),
+        dtype=np.float32,
+    )
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(embeddings.nbytes, 1))
+    try:
+        np.ndarray(embeddings.shape, dtype=np.float32, buffer=shm.buf)[:] = embeddings
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shard_index, shm.name, embeddings.shape
+
+def _release_unread_shards(futures, consumed) -> None:
+    """
+    Unlink the shared memory of shards that were encoded but never read because the
+    upload loop was aborted; otherwise the blocks outlive the run in /dev/shm.
+    """
+    for future in futures:
+        if future in consumed or not future.done() or future.cancelled() or future.exception() is not None:
+            continue
+        _, shm_name, _ = future.result()
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+
+def index_records_to_pinecone_parallel(
+    records: List[Dict],
+    source: str,
+    workers: Optional[int] = None,
+    shard_size: int = 512,
+    upsert_batch_size: int = 100,
+) -> int:
+    """
+    Full-reindex variant of index_records_to_pinecone that shards encoding across processes.
+
+    Record ranges are encoded in a process pool (one model per worker); embeddings come back
+    through shared memory and a single uploader in this process upserts them to Pinecone.
+    Unlike the incremental path it does not fetch existing vectors to skip unchanged records.
+
+    Args:
+        records: List of records to index
+        source: Source type ("sam_gov" or "freelancer")
+        workers: Number of worker processes (defaults to the CPU count)
+        shard_size: Number of records encoded per task
+        upsert_batch_size: Number of vectors per Pinecone upsert
+
+    Returns:
+        Number of records indexed
+    """
+    if not records:
+        logger.warning(f"No new records found in {source} to index.")
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    stats = {"indexed": 0, "failed": 0, "empty_content": 0, "batch_errors": 0, "shard_errors": 0}
+
+    index = get_index()
+    if not index:
+        logger.error("Failed to initialize Pinecone index")
+        return 0
+
+    # Build (id, text, metadata) in the parent; only the texts cross into the workers
+    items = []
+    for record in records:
+        try:
+            text = build_record_text(record, source)
+            if not text.strip():
+                stats["empty_content"] += 1
+                continue
+            items.append((get_vector_id(record, source), text, prepare_metadata(record, source)))
+        except Exception as e:
+            logger.error(f"Error preparing {source} record {record.get('id')}: {str(e)}")
+            stats["failed"] += 1
+
+    shards = [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+    logger.info(f"Encoding {len(items)} {source} records in {len(shards)} shards across {workers} worker processes...")
+    start_time = time.time()
+
+    def upsert(vectors):
+        try:
+            index.upsert(vectors=vectors)
+            stats["indexed"] += len(vectors)
+        except Exception as e:
+            logger.error(f"Error upserting batch: {e}")
+            stats["batch_errors"] += 1
+            stats["failed"] += len(vectors)
+
+    ctx = multiprocessing.get_context("spawn")
+    futures = {}
+    consumed = set()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_embedding_worker) as pool:
+            futures = {
+                pool.submit(_encode_shard, shard_index, [text for _, text, _ in shard]): shard_index
+                for shard_index, shard in enumerate(shards)
+            }
+            vectors = []
+            try:
+                for future in tqdm(as_completed(futures), total=len(futures), desc=f"Encoding {source} shards"):
+                    shard = shards[futures[future]]
+                    try:
+                        _, shm_name, shape = future.result()
+                    except Exception as e:
+                        logger.error(f"Error encoding shard {futures[future]}: {e}")
+                        stats["shard_errors"] += 1
+                        stats["failed"] += len(shard)
+                        continue
+
+                    shm = shared_memory.SharedMemory(name=shm_name)
+                    consumed.add(future)
+                    try:
+                        # tolist() copies out, so no view of the buffer outlives the block
+                        embeddings = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).tolist()
+                        for (record_id, _, metadata), embedding in zip(shard, embeddings):
+                            vectors.append((record_id, embedding, metadata))
+                            if len(vectors) >= upsert_batch_size:
+                                upsert(vectors)
+                                vectors = []
+                    finally:
+                        shm.close()
+                        shm.unlink()
+            except BaseException:
+                # Don't start shards nobody will read; leaving the with-block waits for running ones
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            if vectors:
+                upsert(vectors)
+    finally:
+        # Shards finished (or in flight) when the loop was aborted still own a block each
+        _release_unread_shards(futures, consumed)
+
+    elapsed = time.time() - start_time
+    if stats["indexed"] > 0:
+        state = load_index_state()
+        state[source]["last_indexed"] = datetime.now().isoformat()
+        state[source]["count"] += stats["indexed"]
+        save_index_state(state)
+
+    logger.info(f"\n{source} parallel indexing completed with detailed statistics:")
+    logger.info(f"  - Total records processed: {len(records)}")
+    logger.info(f"  - Records indexed: {stats['indexed']}")
+    logger.info(f"  - Records skipped (empty content): {stats['empty_content']}")
+    logger.info(f"  - Records failed: {stats['failed']}")
+    logger.info(f"  - Shard errors: {stats['shard_errors']}")
+    logger.info(f"  - Batch processing errors: {stats['batch_errors']}")
+    logger.info(f"  - Throughput: {len(items) / elapsed if elapsed > 0 else 0:.1f} records/s with {workers} workers")
+
+    return stats["indexed"]
+
+def index_sam_gov_to_pinecone(incremental=True, workers=None):
     """
     Generate embeddings for sam_gov records and upsert them to Pinecone.
     If incremental is True, only process records since the last indexing.
@@ -537,10 +726,14 @@ def index_sam_gov_to_pinecone(incremental=True):
     # Fetch records from sam_gov table
     records = fetch_sam_gov_records(last_indexed)
     
+    # Full reindex can shard encoding across processes
+    if not incremental and workers and workers > 1:
+        return index_records_to_pinecone_parallel(records, "sam_gov", workers=workers)
+    
     # Use common indexing function
     return index_records_to_pinecone(records, "sam_gov", incremental)
 
-def index_freelancer_data_table_to_pinecone(incremental=True):
+def index_freelancer_data_table_to_pinecone(incremental=True, workers=None):
     """
     Generate embeddings for freelancer_data_table records and upsert them to Pinecone.
     If incremental is True, only process records since the last indexing.
@@ -552,6 +745,10 @@ def index_freelancer_data_table_to_pinecone(incremental=True):
     # Fetch records from freelancer_data_table
     records = fetch_freelancer_data_table(last_indexed)
     
+    # Full reindex can shard encoding across processes
+    if not incremental and workers and workers > 1:
+        return index_records_to_pinecone_parallel(records, "freelancer", workers=workers)
+    
     # Use common indexing function
     return index_records_to_pinecone(records, "freelancer", incremental)
 
@@ -596,13 +793,14 @@ def check_search(query="cybersecurity"):
     except Exception as e:
         logger.error(f"Error during test search: {str(e)}")
 
-def index_all_to_pinecone(incremental=True, sources=None):
+def index_all_to_pinecone(incremental=True, sources=None, workers=None):
     """
     Index data to Pinecone with flexible options
     
     Args:
         incremental: If True, only index records since last indexing run
         sources: List of sources to index ["sam_gov", "freelancer"], or None for all
+        workers: For a full reindex, number of embedding worker processes (None or 1 = in-process)
     """
     start_time = time.time()
     
@@ -615,13 +813,13 @@ def index_all_to_pinecone(incremental=True, sources=None):
     # Index SAM.gov records if requested or if no specific sources are specified
     if not sources or "sam_gov" in sources:
         # logger.info("Starting to index SAM.gov records...")
-        sam_indexed = index_sam_gov_to_pinecone(incremental=incremental)
+        sam_indexed = index_sam_gov_to_pinecone(incremental=incremental, workers=workers)
         total_indexed += sam_indexed
     
     # Index Freelancer records if requested or if no specific sources are specified
     if not sources or "freelancer" in sources:
         # logger.info("\nStarting to index Freelancer projects...")
-        freelancer_indexed = index_freelancer_data_table_to_pinecone(incremental=incremental)
+        freelancer_indexed = index_freelancer_data_table_to_pinecone(incremental=incremental, workers=workers)
         total_indexed += freelancer_indexed
     
     # Check the index after indexing
@@ -642,131 +840,212 @@ def index_all_to_pinecone(incremental=True, sources=None):
     # logger.info(f"\nIndexing completed in {elapsed_time:.2f} seconds!")
     return {"total_indexed": total_indexed, "elapsed_time": elapsed_time}
 
-def cleanup_orphaned_sam_gov_vectors():
+class LiveIdBloomFilter:
     """
-    Remove Pinecone vectors for notice_ids that no longer exist in the sam_gov table.
-    Only deletes vectors that are not clearly from other sources (e.g., skips those starting with 'freelancer_').
+    Minimal Bloom filter over live notice_ids.
+    False positives only ever keep an orphan around for another pass; a live ID
+    is never reported as missing, so deletes driven by it are always safe.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def build_live_notice_id_filter(connection, error_rate: float = 0.001, fetch_size: int = 10000) -> LiveIdBloomFilter:
     """
-    # logger.info("Starting cleanup of orphaned Pinecone vectors for sam_gov...")
+    Stream every notice_id in sam_gov through a server-side cursor into a Bloom filter.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM sam_gov")
+        capacity = cursor.fetchone()[0]
+    bloom = LiveIdBloomFilter(capacity, error_rate)
+    with connection.cursor(name="live_notice_ids") as cursor:
+        cursor.itersize = fetch_size
+        cursor.execute("SELECT notice_id FROM sam_gov WHERE notice_id IS NOT NULL")
+        for (notice_id,) in cursor:
+            bloom.add(str(notice_id))
+    logger.info(f"Built Bloom filter for {capacity} live notice_ids ({len(bloom.bits) / 1024:.1f} KiB)")
+    return bloom
+
+
+def fetch_live_notice_ids(cursor, notice_ids: List[str]) -> set:
+    """Return the subset of notice_ids that still exist in sam_gov (one ANY() round trip)."""
+    if not notice_ids:
+        return set()
+    cursor.execute("SELECT notice_id FROM sam_gov WHERE notice_id = ANY(%s)", (notice_ids,))
+    return {str(row[0]) for row in cursor.fetchall()}
+
+
+def reconcile_sam_gov_vectors(
+    dry_run: bool = False,
+    delete_batch_size: int = 1000,
+    use_bloom_filter: bool = False,
+    bloom_error_rate: float = 0.001,
+    purge_non_sam_gov: bool = False,
+) -> Dict:
+    """
+    Stream Pinecone vector IDs page by page and delete the ones whose notice_id is gone from sam_gov.
+
+    Each page from index.list() is checked against the database with a single ANY() query
+    (or against a prebuilt Bloom filter of live IDs), and orphans are deleted in bounded
+    batches as the scan goes, so memory stays flat and an interrupted pass loses nothing.
+
+    Args:
+        dry_run: Only count what would be deleted
+        delete_batch_size: Maximum number of IDs per index.delete() call
+        use_bloom_filter: Check pages against a Bloom filter instead of querying per page
+        bloom_error_rate: False-positive rate of the Bloom filter
+        purge_non_sam_gov: Also delete every vector whose ID does not start with 'sam_gov_'
+
+    Returns:
+        Report dict with counts and throughput
+    """
+    report = {
+        "dry_run": dry_run,
+        "pages": 0,
+        "scanned": 0,
+        "live": 0,
+        "orphaned": 0,
+        "non_sam_gov": 0,
+        "deleted": 0,
+        "delete_batches": 0,
+        "delete_errors": 0,
+        "elapsed_seconds": 0.0,
+        "vectors_per_second": 0.0,
+    }
+    start_time = time.time()
+
     index = get_index()
-    pinecone_ids = set()
-    try:
-        # Each item yielded by index.list() is a list of vector IDs
-        for batch in index.list():
-            for vector_id in batch:
-                # Only consider IDs that do NOT start with 'freelancer_'
-                if not str(vector_id).startswith('freelancer_'):
-                    pinecone_ids.add(str(vector_id))
-    except Exception as e:
-        logger.error(f"Error listing Pinecone vectors: {e}")
-        return 0
-    logger.info(f"Found {len(pinecone_ids)} sam_gov-like vectors in Pinecone.")
-    # 2. Get all notice_ids in sam_gov table
+    if not index:
+        logger.error("Failed to initialize Pinecone index")
+        return report
+
     connection = get_db_connection()
-    db_ids = set()
+    pending: List[str] = []
+
+    def flush(force: bool = False):
+        nonlocal pending
+        while pending and (force or len(pending) >= delete_batch_size):
+            batch, pending = pending[:delete_batch_size], pending[delete_batch_size:]
+            if dry_run:
+                continue
+            try:
+                index.delete(ids=batch)
+                report["deleted"] += len(batch)
+                report["delete_batches"] += 1
+                logger.info(f"Deleted batch {report['delete_batches']}: {len(batch)} vectors.")
+            except Exception as e:
+                logger.error(f"Error deleting vector batch: {e}")
+                report["delete_errors"] += 1
+
     try:
+        bloom = build_live_notice_id_filter(connection, bloom_error_rate) if use_bloom_filter else None
         with connection.cursor() as cursor:
-            cursor.execute("SELECT notice_id FROM sam_gov")
-            db_ids = set(str(row[0]) for row in cursor.fetchall())
+            # Each item yielded by index.list() is a page of vector IDs
+            for page in index.list():
+                report["pages"] += 1
+                candidates = {}
+                for vector_id in page:
+                    vector_id = str(vector_id)
+                    report["scanned"] += 1
+                    if vector_id.startswith("sam_gov_"):
+                        candidates[vector_id] = vector_id[len("sam_gov_"):]
+                    elif purge_non_sam_gov:
+                        report["non_sam_gov"] += 1
+                        pending.append(vector_id)
+                    elif not vector_id.startswith("freelancer_"):
+                        # Legacy IDs were the bare notice_id
+                        candidates[vector_id] = vector_id
+
+                if bloom is not None:
+                    live_ids = {nid for nid in candidates.values() if nid in bloom}
+                else:
+                    live_ids = fetch_live_notice_ids(cursor, list(set(candidates.values())))
+
+                for vector_id, notice_id in candidates.items():
+                    if notice_id in live_ids:
+                        report["live"] += 1
+                    else:
+                        report["orphaned"] += 1
+                        pending.append(vector_id)
+                flush()
+        flush(force=True)
+    except KeyboardInterrupt:
+        logger.warning("Reconciliation interrupted; flushing confirmed orphans before exiting")
+        flush(force=True)
+        raise
     except Exception as e:
-        # logger.error(f"Error fetching notice_ids from sam_gov: {e}")
-        return 0
+        logger.error(f"Error reconciling Pinecone vectors: {e}")
+        report["error"] = str(e)
     finally:
         connection.close()
-    # logger.info(f"Found {len(db_ids)} notice_ids in sam_gov table.")
-    # 3. Find orphaned vectors
-    orphaned_ids = list(pinecone_ids - db_ids)
-    # logger.info(f"Found {len(orphaned_ids)} orphaned sam_gov vectors to delete.")
-    # 4. Delete orphaned vectors in batches of 1000
-    deleted = 0
-    batch_size = 1000
-    if orphaned_ids:
-        try:
-            for i in range(0, len(orphaned_ids), batch_size):
-                batch = orphaned_ids[i:i+batch_size]
-                index.delete(ids=batch)
-                deleted += len(batch)
-                logger.info(f"Deleted batch {i//batch_size+1}: {len(batch)} sam_gov vectors.")
-            # logger.info(f"Deleted {deleted} orphaned sam_gov vectors from Pinecone.")
-        except Exception as e:
-            logger.error(f"Error deleting orphaned vectors: {e}")
-    return deleted
+        report["elapsed_seconds"] = round(time.time() - start_time, 3)
+        if report["elapsed_seconds"] > 0:
+            report["vectors_per_second"] = round(report["scanned"] / report["elapsed_seconds"], 1)
+        logger.info(
+            f"{'[DRY RUN] ' if dry_run else ''}Reconciled {report['scanned']} vectors over {report['pages']} pages: "
+            f"live={report['live']}, orphaned={report['orphaned']}, non_sam_gov={report['non_sam_gov']}, "
+            f"deleted={report['deleted']} in {report['elapsed_seconds']}s ({report['vectors_per_second']} vectors/s)"
+        )
+    return report
+
+
+def cleanup_orphaned_sam_gov_vectors(dry_run: bool = False, use_bloom_filter: bool = False):
+    """
+    Remove Pinecone vectors for notice_ids that no longer exist in the sam_gov table.
+    Only deletes vectors that are not clearly from other sources (e.g., skips those starting with 'freelancer_').
+    """
+    report = reconcile_sam_gov_vectors(dry_run=dry_run, use_bloom_filter=use_bloom_filter)
+    return report["orphaned"] if dry_run else report["deleted"]
 
 
-def cleanup_to_only_sam_gov_vectors():
+def cleanup_to_only_sam_gov_vectors(dry_run: bool = False, use_bloom_filter: bool = False):
     """
     Delete all Pinecone vectors that are not valid sam_gov vectors (ID does not start with 'sam_gov_'),
     and also delete orphaned sam_gov vectors (those not present in the sam_gov table).
     Returns the total number of vectors deleted.
     """
-    import re
-    # logger.info("Starting full Pinecone cleanup: keep only valid sam_gov vectors (and remove orphans)...")
-    index = get_index()
-    pinecone_ids = set()
-    try:
-        for batch in index.list():
-            for vector_id in batch:
-                pinecone_ids.add(str(vector_id))
-    except Exception as e:
-        # logger.error(f"Error listing Pinecone vectors: {e}")
-        return 0
-    # logger.info(f"Found {len(pinecone_ids)} total vectors in Pinecone.")
-    # Separate sam_gov and non-sam_gov vectors
-    sam_gov_ids = set()
-    non_sam_gov_ids = set()
-    for vid in pinecone_ids:
-        if vid.startswith("sam_gov_"):
-            sam_gov_ids.add(vid)
-        else:
-            non_sam_gov_ids.add(vid)
-    # Delete all non-sam_gov vectors
-    total_deleted = 0
-    if non_sam_gov_ids:
-        non_sam_gov_ids = list(non_sam_gov_ids)
-        for i in range(0, len(non_sam_gov_ids), 1000):
-            batch_ids = non_sam_gov_ids[i:i+1000]
-            index.delete(ids=batch_ids)
-            logger.info(f"Deleted batch {i//1000+1}: {len(batch_ids)} non-sam_gov vectors.")
-            total_deleted += len(batch_ids)
-        # logger.info(f"Deleted {len(non_sam_gov_ids)} non-sam_gov vectors from Pinecone.")
-    # Get all notice_ids in sam_gov table
-    from utils.db_utils import get_db_connection
-    conn = get_db_connection()
-    db_notice_ids = set()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT notice_id FROM sam_gov")
-            db_notice_ids = set(str(row[0]) for row in cur.fetchall())
-    finally:
-        conn.close()
-    # logger.info(f"Found {len(db_notice_ids)} notice_ids in sam_gov table.")
-    # Delete orphaned sam_gov vectors
-    orphaned_ids = []
-    for vid in sam_gov_ids:
-        notice_id = vid[len("sam_gov_"):]
-        if notice_id not in db_notice_ids:
-            orphaned_ids.append(vid)
-    if orphaned_ids:
-        for i in range(0, len(orphaned_ids), 1000):
-            batch_ids = orphaned_ids[i:i+1000]
-            index.delete(ids=batch_ids)
-            logger.info(f"Deleted batch {i//1000+1}: {len(batch_ids)} orphaned sam_gov vectors.")
-            total_deleted += len(batch_ids)
-        # logger.info(f"Deleted {len(orphaned_ids)} orphaned sam_gov vectors from Pinecone.")
-    # logger.info(f"Total vectors deleted: {total_deleted} (non-sam_gov: {len(non_sam_gov_ids)}, orphaned sam_gov: {len(orphaned_ids)})")
-    return total_deleted
+    report = reconcile_sam_gov_vectors(
+        dry_run=dry_run, use_bloom_filter=use_bloom_filter, purge_non_sam_gov=True
+    )
+    return report["orphaned"] + report["non_sam_gov"] if dry_run else report["deleted"]
 
 if __name__ == "__main__":
     # By default, run incremental indexing (only new/updated records)
     # For a full reindex, run with: python index_to_pinecone.py --full
+    # Multi-core full reindex: --full --workers N
+    # Orphan cleanup: --cleanup [--dry-run] [--bloom]
     import sys
     incremental = "--full" not in sys.argv
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
     cleanup = "--cleanup" in sys.argv
+    dry_run = "--dry-run" in sys.argv
+    use_bloom_filter = "--bloom" in sys.argv
     if not incremental:
         logger.info("Running FULL reindexing of all records...")
     else:
         logger.info("Running INCREMENTAL indexing (new/updated records only)...")
     if cleanup:
         logger.info("Running orphaned vector cleanup before indexing...")
-        cleanup_orphaned_sam_gov_vectors()
-    index_all_to_pinecone(incremental=incremental)
\ No newline at end of file
+        report = reconcile_sam_gov_vectors(dry_run=dry_run, use_bloom_filter=use_bloom_filter)
+        print(json.dumps(report, indent=2))
+        if dry_run:
+            sys.exit(0)
+    index_all_to_pinecone(incremental=incremental, workers=workers)
\ No newline at end of file
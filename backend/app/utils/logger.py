@@ -1,4 +1,5 @@
 import logging
+import os
 
 def get_logger(
     name=__name__, 
@@ -29,6 +30,11 @@ def get_logger(
         logger.addHandler(ch)
     
     if to_file:
+        # LOG_DIR_BIZ redirects relative log files (the tests point it at a temp dir)
+        log_dir = os.getenv("LOG_DIR_BIZ")
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            filename = os.path.join(log_dir, filename)
         fh = logging.FileHandler(filename)
         fh.setFormatter(formatter)
         logger.addHandler(fh)
@@ -0,0 +1,108 @@
+import hashlib
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    from app.utils.logger import get_logger
+    from app.utils.db_utils import get_supabase_connection
+except ImportError:
+    from utils.logger import get_logger
+    from utils.db_utils import get_supabase_connection
+
+logger = get_logger(__name__)
+
+MATCH_CACHE_TABLE = "recommendation_match_cache"
+# Keeps `in_` filters well under PostgREST URL limits
+LOOKUP_CHUNK = 100
+
+
+def profile_hash(*parts: Optional[str]) -> str:
+    """Version of a company profile: sha256 over every piece of profile text the scoring prompt sees."""
+    return hashlib.sha256("\n\x1f".join(p or "" for p in parts).encode("utf-8")).hexdigest()
+
+
+class MatchScoreCache:
+    """
+    Match results per (user, profile hash, opportunity) in the `recommendation_match_cache` table.
+
+    A profile edit changes the hash, so stale scores are never read back; when the
+    profile embedding is regenerated the user's rows are deleted outright. Every
+    lookup reads the table (no in-process memo), so an invalidation is seen by all
+    API workers at once; any cache failure degrades to a miss.
+    """
+
+    def __init__(self, supabase=None):
+        self._supabase = supabase
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            self._supabase = get_supabase_connection(use_service_key=True)
+        return self._supabase
+
+    def get_many(self, user_id: str, profile_version: str, opportunity_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {opportunity_id: recommendation} for every pair already scored."""
+        wanted = sorted({str(o) for o in opportunity_ids if o is not None})
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            for i in range(0, len(wanted), LOOKUP_CHUNK):
+                resp = (
+                    self.supabase
+                    .table(MATCH_CACHE_TABLE)
+                    .select("opportunity_id, recommendation")
+                    .eq("user_id", user_id)
+                    .eq("profile_hash", profile_version)
+                    .in_("opportunity_id", wanted[i:i + LOOKUP_CHUNK])
+                    .execute()
+                )
+                for row in getattr(resp, "data", None) or []:
+                    if isinstance(row.get("recommendation"), dict):
+                        found[row["opportunity_id"]] = row["recommendation"]
+        except Exception as e:
+            logger.warning(f"Match cache lookup failed, treating as misses: {e}")
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, user_id: str, profile_version: str, entries: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Store (opportunity_id, recommendation) pairs, replacing earlier results for the same key."""
+        rows = {}
+        for opportunity_id, recommendation in entries:
+            if opportunity_id is None or not recommendation:
+                continue
+            rows[str(opportunity_id)] = {
+                "user_id": user_id,
+                "profile_hash": profile_version,
+                "opportunity_id": str(opportunity_id),
+                "recommendation": recommendation,
+            }
+        rows = list(rows.values())
+        try:
+            for i in range(0, len(rows), LOOKUP_CHUNK):
+                (
+                    self.supabase
+                    .table(MATCH_CACHE_TABLE)
+                    .upsert(rows[i:i + LOOKUP_CHUNK], on_conflict="user_id,profile_hash,opportunity_id")
+                    .execute()
+                )
+        except Exception as e:
+            logger.warning(f"Match cache write failed: {e}")
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every cached match for a user (profile embedding or text changed)."""
+        try:
+            self.supabase.table(MATCH_CACHE_TABLE).delete().eq("user_id", user_id).execute()
+        except Exception as e:
+            logger.warning(f"Match cache invalidation failed for user {user_id}: {e}")
+
+
+_cache: Optional[MatchScoreCache] = None
+
+
+def get_match_cache() -> MatchScoreCache:
+    """Process-wide cache instance (shares one Supabase client between callers)."""
+    global _cache
+    if _cache is None:
+        _cache = MatchScoreCache()
+    return _cache
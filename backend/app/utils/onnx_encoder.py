@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Union
+
+import numpy as np
+
+try:
+    from app.utils.logger import get_logger
+except ImportError:
+    from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+CONFIG_FILE = "encoder_config.json"
+
+
+def export_onnx_model(model_name: str, export_dir: str, quantize: bool = True) -> str:
+    """
+    Export a sentence-transformers model to ONNX (plus tokenizer and pooling config)
+    and optionally write an int8 dynamically quantized copy next to it.
+    Only this one-off step needs torch; serving needs just onnxruntime and the tokenizer.
+
+    The export is written to a private temp dir and moved into export_dir file by file
+    with os.replace, model files last, so workers exporting at the same time never see
+    a half-written model.
+    """
+    parent = os.path.dirname(os.path.abspath(export_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(export_dir)}.", suffix=".tmp", dir=parent)
+    try:
+        _export(model_name, tmp_dir, quantize)
+        os.makedirs(export_dir, exist_ok=True)
+        model_files = [name for name in (FP32_FILE, INT8_FILE) if os.path.exists(os.path.join(tmp_dir, name))]
+        for name in [n for n in os.listdir(tmp_dir) if n not in model_files] + model_files:
+            os.replace(os.path.join(tmp_dir, name), os.path.join(export_dir, name))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    logger.info(f"Exported {model_name} to ONNX at {export_dir} (int8={quantize})")
+    return export_dir
+
+
+def _export(model_name: str, export_dir: str, quantize: bool) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    auto_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+
+    pooling = "mean"
+    normalize = False
+    for module in st_model:
+        if hasattr(module, "get_pooling_mode_str"):
+            pooling = module.get_pooling_mode_str()
+        if type(module).__name__ == "Normalize":
+            normalize = True
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling}")
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(export_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(export_dir)
+    with open(os.path.join(export_dir, CONFIG_FILE), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": st_model.max_seq_length,
+            "pooling": pooling,
+            "normalize": normalize,
+            "input_names": input_names,
+        }, f)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(export_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime on CPU.
+    Reproduces the exported model's pooling (mean or CLS) and normalisation.
+    """
+
+    def __init__(self, export_dir: str, quantized: bool = True, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(export_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.max_seq_length = self.config["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        model_path = os.path.join(export_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.quantized = quantized
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = tokens["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: Optional[bool] = None,
+        normalize_embeddings: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Sort by length so padding inside each batch stays small
+        order = np.argsort([-len(t) for t in texts])
+        chunks = [
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.empty((len(texts), chunks[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(chunks)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def load_onnx_encoder(model_name: str, cache_dir: str, quantized: bool = True, intra_op_threads: int = 0) -> OnnxSentenceEncoder:
+    """Load the ONNX encoder for model_name, exporting it into cache_dir on first use."""
+    export_dir = os.path.join(cache_dir, model_name.replace("/", "__") + "-onnx")
+    needed = INT8_FILE if quantized else FP32_FILE
+    if not os.path.exists(os.path.join(export_dir, needed)):
+        export_onnx_model(model_name, export_dir, quantize=quantized)
+    return OnnxSentenceEncoder(export_dir, quantized=quantized, intra_op_threads=intra_op_threads)
@@ -1,33 +1,122 @@
-import os
-import sys
-from dotenv import load_dotenv
+import asyncio
+import importlib.util
+import threading
+import weakref
 
-# Add the app directory to Python path
-# sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import httpx
 
 try:
-    from app.config.settings import OPENAI_API_KEY as api_key
+    from app.config.settings import (
+        OPENAI_API_KEY as api_key,
+        OPENAI_HTTP2,
+        OPENAI_KEEPALIVE_EXPIRY,
+        OPENAI_MAX_CONNECTIONS,
+        OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        OPENAI_TIMEOUT,
+    )
 except ImportError:
-    from config.settings import OPENAI_API_KEY as api_key
+    from config.settings import (
+        OPENAI_API_KEY as api_key,
+        OPENAI_HTTP2,
+        OPENAI_KEEPALIVE_EXPIRY,
+        OPENAI_MAX_CONNECTIONS,
+        OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        OPENAI_TIMEOUT,
+    )
 
 try:
     from app.utils.logger import get_logger
 except ImportError:
     from utils.logger import get_logger
-from openai import OpenAI
+import openai
+from openai import OpenAI, AsyncOpenAI
 
 logger = get_logger(__name__)
 
+# One client per process (sync) and per event loop (async): an httpx pool's
+# connections belong to the loop that opened them, and scripts call asyncio.run
+# more than once.
+_lock = threading.Lock()
+_sync_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _http2_enabled() -> bool:
+    return OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _http_client_options() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+        "http2": _http2_enabled(),
+    }
+
 
 def get_openai_client():
+    """Process-wide sync OpenAI client with a pooled keep-alive connection; None if no API key."""
+    global _sync_client
+    if _sync_client is not None:
+        return _sync_client
+    if not api_key:
+        logger.warning("OPENAI_API_KEY environment variable not set")
+        return None
+    with _lock:
+        if _sync_client is None:
+            try:
+                options = _http_client_options()
+                _sync_client = OpenAI(api_key=api_key, http_client=httpx.Client(**options))
+                logger.info(f"OpenAI client initialized (http2={options['http2']})")
+            except Exception as e:
+                logger.error(f"Failed to initialize OpenAI client: {str(e)}")
+    return _sync_client
+
+
+def get_async_openai_client():
+    """Shared AsyncOpenAI client for the running event loop; None if no API key."""
+    if not api_key:
+        logger.warning("OPENAI_API_KEY environment variable not set")
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    client = _async_clients.get(loop) if loop is not None else None
+    if client is not None:
+        return client
     try:
-        if not api_key:
-            logger.warning("OPENAI_API_KEY environment variable not set")
-        else:
-            logger.info("OPENAI_API_KEY environment variable found")
-            client = OpenAI(api_key=api_key)
-            logger.info("OpenAI client initialized successfully")
-            return client
+        options = _http_client_options()
+        client = AsyncOpenAI(api_key=api_key, http_client=httpx.AsyncClient(**options))
     except Exception as e:
-        logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-    return None
\ No newline at end of file
+        logger.error(f"Failed to initialize async OpenAI client: {str(e)}")
+        return None
+    if loop is not None:
+        with _lock:
+            client = _async_clients.setdefault(loop, client)
+        logger.info(f"Async OpenAI client initialized (http2={options['http2']})")
+    return client
+
+
+def is_transient_openai_error(error: BaseException) -> bool:
+    """Rate limits, timeouts, connection errors and 5xx responses; 4xx and bad output are permanent."""
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return False
+
+
+async def close_openai_clients() -> None:
+    """Close the pooled connections of the current loop's async client and the sync client."""
+    global _sync_client
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+    with _lock:
+        sync_client, _sync_client = _sync_client, None
+    if sync_client is not None:
+        sync_client.close()
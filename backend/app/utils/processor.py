@@ -9,61 +9,54 @@ from app.services.recommendations import generate_recommendations  # Your existi
 
 logger = get_logger(__name__)
 
-async def process_recommendations(search_id: str, opp_ids: List, user_profile: dict, user_id: str):
-    redis_conn = RedisClient.get_client()
-    
-    try:
-        logger.info(f"Processing recommendations for search {search_id}")
+RECS_TTL = 4 * 3600
 
-        # Convert opp_ids to opportunity dicts
-        opportunities = [{"id": opp_id} if isinstance(opp_id, (int, str)) else opp_id for opp_id in opp_ids]
 
-        batch_size = 3
-        for i in range(0, len(opportunities), batch_size):
-            if not await is_task_active(user_id, search_id):
-                logger.info(f"Task for search {search_id} no longer active, stopping.")
-                return
+class _TaskInactive(Exception):
+    """Raised from the batch callback to stop scoring a superseded search."""
+
 
-            batch = opportunities[i:i+batch_size]
-            try:
-                logger.info(f"Processing batch of {len(batch)} for search {search_id}")
-                recs = await generate_recommendations(
-                    company_url=user_profile.get("company_url", ""),
-                    company_description=user_profile.get("company_description", ""),
-                    opportunities=batch
-                )
+def _push_recommendations(redis_conn, key: str, json_recs: List[str]) -> None:
+    pipe = redis_conn.pipeline()
+    pipe.rpush(key, *json_recs)
+    pipe.expire(key, RECS_TTL)
+    pipe.execute()
 
-                if not await is_task_active(user_id, search_id):
-                    logger.info(f"Task for search {search_id} no longer active after batch, stopping.")
-                    return
 
-                if redis_conn:
-                    key = f"recs:{search_id}"
-                    recommendations = []
+async def process_recommendations(search_id: str, opp_ids: List, user_profile: dict, user_id: str):
+    redis_conn = RedisClient().get_client()
+    key = f"recs:{search_id}"
+
+    async def store_batch(recommendations: List[Dict]):
+        if not await is_task_active(user_id, search_id):
+            raise _TaskInactive()
+        # Each prompt's results are pushed as soon as it completes; opportunityIndex
+        # identifies the opportunity, so batches may land out of order
+        json_recs = [json.dumps(r) for r in recommendations]
+        if redis_conn and json_recs:
+            await asyncio.to_thread(_push_recommendations, redis_conn, key, json_recs)
+            logger.info(f"Stored batch of {len(recommendations)} recommendations for search {search_id}")
 
-                    if isinstance(recs, dict) and "recommendations" in recs:
-                        recommendations = recs["recommendations"]
-                    elif isinstance(recs, list):
-                        recommendations = recs
+    try:
+        logger.info(f"Processing recommendations for search {search_id}")
 
-                    # Adjust opportunityIndex for batch offset
-                    for r in recommendations:
-                        if "opportunityIndex" in r:
-                            r["opportunityIndex"] += i
+        # Convert opp_ids to opportunity dicts
+        opportunities = [{"id": opp_id} if isinstance(opp_id, (int, str)) else opp_id for opp_id in opp_ids]
 
-                    # Push all recommendations at once for performance
-                    json_recs = [json.dumps(r) for r in recommendations]
-                    if json_recs:
-                        await redis_conn.rpush(key, *json_recs)
-                        await redis_conn.expire(key, 4 * 3600)
-                        logger.info(f"Stored batch of {len(recommendations)} recommendations for search {search_id}")
+        if not await is_task_active(user_id, search_id):
+            logger.info(f"Task for search {search_id} no longer active, stopping.")
+            return
 
-            except asyncio.CancelledError:
-                logger.info(f"Batch processing for search {search_id} was cancelled")
-                raise
-            except Exception as e:
-                logger.error(f"Error processing batch for search {search_id}: {e}", exc_info=True)
+        await generate_recommendations(
+            company_url=user_profile.get("company_url", ""),
+            company_description=user_profile.get("company_description", ""),
+            opportunities=opportunities,
+            on_batch=store_batch,
+            user_id=user_id if user_id != "anon" else None,
+        )
 
+    except _TaskInactive:
+        logger.info(f"Task for search {search_id} no longer active after batch, stopping.")
     except asyncio.CancelledError:
         logger.info(f"Recommendation processing for search {search_id} was cancelled")
         raise
@@ -0,0 +1,349 @@
+"""
+Parallel HTTP Range downloader for large static files (the SAM.gov CSV extracts).
+
+The file is split into fixed-size chunks that are fetched concurrently into a
+preallocated ``<dest>.part`` file. Finished chunks are recorded in a JSON sidecar
+(``<dest>.download.json``), so an interrupted run only re-fetches what is missing.
+The sidecar also keeps the ETag / Last-Modified of the completed file; when the
+server reports the same validators the download is skipped entirely.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import requests
+
+try:
+    from app.utils.logger import get_logger
+except ImportError:
+    from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_MB", "16")) * 1024 * 1024
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "60"))
+DOWNLOAD_MAX_RETRIES = int(os.getenv("DOWNLOAD_MAX_RETRIES", "4"))
+
+STREAM_BLOCK_SIZE = 1024 * 1024
+_PLAIN_MD5_ETAG = re.compile(r"^[0-9a-f]{32}$")
+
+
+class DownloadError(Exception):
+    """The download could not be completed or failed validation."""
+
+
+def _state_path(dest: str) -> str:
+    return f"{dest}.download.json"
+
+
+def _part_path(dest: str) -> str:
+    return f"{dest}.part"
+
+
+def _load_state(dest: str) -> Dict[str, Any]:
+    try:
+        with open(_state_path(dest), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(dest: str, state: Dict[str, Any]) -> None:
+    # Write-then-rename so a crash never leaves a half-written sidecar
+    tmp = f"{_state_path(dest)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, _state_path(dest))
+
+
+def _file_digests(path: str) -> Dict[str, str]:
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(STREAM_BLOCK_SIZE), b""):
+            md5.update(block)
+            sha256.update(block)
+    return {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
+
+
+def _preallocate(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+
+def probe(url: str, session: requests.Session, timeout: float = DOWNLOAD_TIMEOUT) -> Dict[str, Any]:
+    """HEAD the URL and return size, range support and cache validators."""
+    response = session.head(url, allow_redirects=True, timeout=timeout)
+    response.raise_for_status()
+    length = response.headers.get("Content-Length")
+    return {
+        "url": response.url,
+        "size": int(length) if length and length.isdigit() else None,
+        "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "s3": response.headers.get("Server", "") == "AmazonS3",
+    }
+
+
+def _same_version(state: Dict[str, Any], remote: Dict[str, Any]) -> bool:
+    if remote["size"] is not None and state.get("size") != remote["size"]:
+        return False
+    if remote["etag"]:
+        return state.get("etag") == remote["etag"]
+    if remote["last_modified"]:
+        return state.get("last_modified") == remote["last_modified"]
+    return False
+
+
+def _chunk_ranges(size: int, chunk_size: int) -> List[List[int]]:
+    return [[start, min(start + chunk_size, size) - 1] for start in range(0, size, chunk_size)]
+
+
+def _fetch_chunk(
+    session: requests.Session,
+    url: str,
+    part: str,
+    start: int,
+    end: int,
+    validator: Optional[str],
+    timeout: float,
+    max_retries: int,
+) -> None:
+    headers = {"Range": f"bytes={start}-{end}"}
+    if validator:
+        # If the file changed since the probe the server answers 200 with the new body
+        headers["If-Range"] = validator
+    expected = end - start + 1
+
+    for attempt in range(max_retries + 1):
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 200:
+                    raise DownloadError(f"{url} changed during download (range {start}-{end} answered 200)")
+                if response.status_code != 206:
+                    response.raise_for_status()
+                    raise DownloadError(f"Unexpected HTTP {response.status_code} for range {start}-{end}")
+                content_range = response.headers.get("Content-Range", "")
+                if not content_range.startswith(f"bytes {start}-{end}/"):
+                    raise DownloadError(f"Range {start}-{end} answered with Content-Range '{content_range}'")
+
+                written = 0
+                with open(part, "r+b") as f:
+                    f.seek(start)
+                    for block in response.iter_content(STREAM_BLOCK_SIZE):
+                        f.write(block)
+                        written += len(block)
+                if written != expected:
+                    raise requests.exceptions.ContentDecodingError(
+                        f"Range {start}-{end}: received {written} of {expected} bytes"
+                    )
+                return
+        except DownloadError:
+            raise
+        except requests.exceptions.RequestException as e:
+            if attempt >= max_retries:
+                raise DownloadError(f"Range {start}-{end} failed after {attempt + 1} attempts: {e}") from e
+            delay = 2 ** attempt
+            logger.warning(f"Range {start}-{end} attempt {attempt + 1} failed ({e}); retrying in {delay}s")
+            time.sleep(delay)
+
+
+def _fetch_whole(session: requests.Session, url: str, part: str, timeout: float) -> None:
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(part, "wb") as f:
+            for block in response.iter_content(STREAM_BLOCK_SIZE):
+                f.write(block)
+
+
+def _validate(path: str, remote: Dict[str, Any], expected_sha256: Optional[str]) -> Dict[str, str]:
+    actual_size = os.path.getsize(path)
+    if remote["size"] is not None and actual_size != remote["size"]:
+        raise DownloadError(f"Size mismatch: expected {remote['size']} bytes, got {actual_size}")
+
+    digests = _file_digests(path)
+    if expected_sha256 and digests["sha256"] != expected_sha256.lower():
+        raise DownloadError(f"SHA-256 mismatch: expected {expected_sha256}, got {digests['sha256']}")
+    # A single-part S3 upload's ETag is the object's MD5 (multipart ETags carry a "-N" suffix)
+    etag = (remote["etag"] or "").strip('"').lower()
+    if remote.get("s3") and _PLAIN_MD5_ETAG.match(etag) and digests["md5"] != etag:
+        raise DownloadError(f"MD5 mismatch against ETag: expected {etag}, got {digests['md5']}")
+    return digests
+
+
+def download_file(
+    url: str,
+    dest: str,
+    workers: int = DOWNLOAD_WORKERS,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    expected_sha256: Optional[str] = None,
+    timeout: float = DOWNLOAD_TIMEOUT,
+    max_retries: int = DOWNLOAD_MAX_RETRIES,
+    force: bool = False,
+    session: Optional[requests.Session] = None,
+) -> Dict[str, Any]:
+    """
+    Download `url` to `dest` with parallel Range requests.
+
+    Skips the transfer when `dest` is a completed earlier download whose ETag /
+    Last-Modified still match the server. Falls back to a single streamed GET
+    when the server does not advertise byte ranges or a length. The result is
+    validated against the advertised size, `expected_sha256` when given, and
+    the ETag when it is a plain MD5; a failed check raises DownloadError.
+
+    Returns {"status": "downloaded" | "unchanged", "bytes", "chunks_fetched",
+    "seconds", "sha256", "etag", "last_modified"}.
+    """
+    started = time.time()
+    own_session = session is None
+    if own_session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(workers, 10))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    try:
+        remote = probe(url, session, timeout)
+        state = _load_state(dest)
+
+        if (
+            not force
+            and state.get("complete")
+            and os.path.exists(dest)
+            and os.path.getsize(dest) == state.get("size")
+            and _same_version(state, remote)
+        ):
+            logger.info(f"{dest} is up to date (ETag {remote['etag']}, Last-Modified {remote['last_modified']})")
+            return {
+                "status": "unchanged",
+                "bytes": state["size"],
+                "chunks_fetched": 0,
+                "seconds": round(time.time() - started, 2),
+                "sha256": state.get("sha256"),
+                "etag": remote["etag"],
+                "last_modified": remote["last_modified"],
+            }
+
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        part = _part_path(dest)
+        chunks_fetched = 0
+
+        if remote["ranges"] and remote["size"]:
+            ranges = _chunk_ranges(remote["size"], chunk_size)
+            resumable = (
+                not state.get("complete")
+                and state.get("url") == url
+                and state.get("chunk_size") == chunk_size
+                and _same_version(state, remote)
+                and os.path.exists(part)
+                and os.path.getsize(part) == remote["size"]
+            )
+            done = set(state.get("done", [])) if resumable else set()
+            if not resumable:
+                _preallocate(part, remote["size"])
+            state = {
+                "url": url,
+                "size": remote["size"],
+                "etag": remote["etag"],
+                "last_modified": remote["last_modified"],
+                "chunk_size": chunk_size,
+                "done": sorted(done),
+                "complete": False,
+            }
+            _save_state(dest, state)
+
+            pending = [i for i in range(len(ranges)) if i not in done]
+            if done:
+                logger.info(f"Resuming {dest}: {len(done)} of {len(ranges)} chunks already on disk")
+            # If-Range needs a strong ETag; fall back to the date otherwise
+            etag = remote["etag"]
+            validator = etag if etag and not etag.startswith("W/") else remote["last_modified"]
+            state_lock = threading.Lock()
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                futures = {
+                    pool.submit(
+                        _fetch_chunk, session, url, part, ranges[i][0], ranges[i][1],
+                        validator, timeout, max_retries,
+                    ): i
+                    for i in pending
+                }
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                        with state_lock:
+                            done.add(futures[future])
+                            state["done"] = sorted(done)
+                            _save_state(dest, state)
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+            chunks_fetched = len(pending)
+        else:
+            logger.info(f"{url} does not support ranges; downloading in one stream")
+            _fetch_whole(session, url, part, timeout)
+            chunks_fetched = 1
+            state = {"url": url, "etag": remote["etag"], "last_modified": remote["last_modified"]}
+
+        try:
+            digests = _validate(part, remote, expected_sha256)
+        except DownloadError:
+            # A corrupt file cannot be resumed; start clean next time
+            for path in (part, _state_path(dest)):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        os.replace(part, dest)
+        size = os.path.getsize(dest)
+        _save_state(dest, {
+            "url": url,
+            "size": size,
+            "etag": remote["etag"],
+            "last_modified": remote["last_modified"],
+            "sha256": digests["sha256"],
+            "complete": True,
+        })
+
+        seconds = round(time.time() - started, 2)
+        logger.info(f"Downloaded {size} bytes to {dest} in {seconds}s ({chunks_fetched} chunk(s))")
+        return {
+            "status": "downloaded",
+            "bytes": size,
+            "chunks_fetched": chunks_fetched,
+            "seconds": seconds,
+            "sha256": digests["sha256"],
+            "etag": remote["etag"],
+            "last_modified": remote["last_modified"],
+        }
+    finally:
+        if own_session:
+            session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel ranged file download")
+    parser.add_argument("--url", required=True, help="File URL")
+    parser.add_argument("--dest", required=True, help="Destination path")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="Concurrent range requests")
+    parser.add_argument("--sha256", help="Expected SHA-256 of the file")
+    parser.add_argument("--force", action="store_true", help="Download even if the server copy is unchanged")
+    args = parser.parse_args()
+
+    result = download_file(args.url, args.dest, workers=args.workers, expected_sha256=args.sha256, force=args.force)
+    print(json.dumps(result))
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+try:
+    from app.utils.logger import get_logger
+except ImportError:
+    from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` units refill per second up to `capacity`.
+    `acquire(n)` waits until n units are available and takes them.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Process-wide buckets may outlive an event loop (one asyncio.run per cron job)
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        # Oversized requests would never fit; let them through once the bucket is full
+        amount = min(amount, self.capacity)
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so nothing is granted for roughly `seconds` (e.g. on Retry-After)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class ModelRateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one model."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: Optional[int] = None):
+        self.requests = TokenBucket(requests_per_minute / 60.0, capacity=max(1, requests_per_minute // 6))
+        self.tokens = (
+            TokenBucket(tokens_per_minute / 60.0, capacity=max(1, tokens_per_minute // 6))
+            if tokens_per_minute
+            else None
+        )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        await self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+
+
+def get_model_rate_limiter(model: str, requests_per_minute: int, tokens_per_minute: Optional[int] = None) -> ModelRateLimiter:
+    """Process-wide limiter per model, so concurrent stages share one budget."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = ModelRateLimiter(requests_per_minute, tokens_per_minute)
+        _limiters[model] = limiter
+    return limiter
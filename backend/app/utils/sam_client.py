@@ -0,0 +1,216 @@
+import asyncio
+import os
+import random
+import ssl
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import certifi
+
+try:
+    from app.utils.logger import get_logger
+    from app.utils.rate_limiter import TokenBucket
+except ImportError:
+    from utils.logger import get_logger
+    from utils.rate_limiter import TokenBucket
+
+logger = get_logger(__name__)
+
+# Overridable so the ETL jobs can run against a replay server (tests/etl_replay.py)
+SAM_SEARCH_URL = os.getenv("SAM_SEARCH_URL", "https://api.sam.gov/prod/opportunities/v2/search")
+
+# Request rate and burst for our SAM.gov API key; keep below the account quota
+SAM_API_RATE_PER_SECOND = float(os.getenv("SAM_API_RATE_PER_SECOND", "2"))
+SAM_API_BURST = int(os.getenv("SAM_API_BURST", "5"))
+SAM_API_CONCURRENCY = int(os.getenv("SAM_API_CONCURRENCY", "4"))
+# Hard stop for requests in one run (0 = unlimited); the daily quota is shared by every job
+SAM_API_MAX_REQUESTS = int(os.getenv("SAM_API_MAX_REQUESTS", "0"))
+SAM_API_MAX_RETRIES = int(os.getenv("SAM_API_MAX_RETRIES", "5"))
+# Longest single wait on 429/5xx, whatever Retry-After says
+SAM_API_MAX_BACKOFF = float(os.getenv("SAM_API_MAX_BACKOFF", "300"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SamQuotaExhausted(Exception):
+    """The per-run request budget (SAM_API_MAX_REQUESTS) is used up."""
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class SamClient:
+    """
+    SAM.gov API client sharing one pooled aiohttp session.
+
+    Every request passes a token-bucket limiter and a concurrency semaphore.
+    429 and 5xx responses are retried with exponential backoff (honouring
+    Retry-After, capped at SAM_API_MAX_BACKOFF), and a 429 pauses the shared
+    bucket so concurrent callers back off together instead of piling on.
+
+    Use as an async context manager:
+
+        async with SamClient() as sam:
+            descriptions = await sam.fetch_descriptions(urls)
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rate_per_second: float = SAM_API_RATE_PER_SECOND,
+        burst: int = SAM_API_BURST,
+        max_concurrency: int = SAM_API_CONCURRENCY,
+        max_retries: int = SAM_API_MAX_RETRIES,
+        max_backoff: float = SAM_API_MAX_BACKOFF,
+        max_requests: int = SAM_API_MAX_REQUESTS,
+        timeout: float = 60.0,
+        cache=None,
+    ):
+        if api_key is None:
+            try:
+                from app.config.settings import SAM_API_KEY as api_key
+            except ImportError:
+                from config.settings import SAM_API_KEY as api_key
+        self.api_key = api_key
+        self.bucket = TokenBucket(rate_per_second, capacity=burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.max_requests = max_requests
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Optional DescriptionCache consulted before any description request
+        self.cache = cache
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "cache_hits": 0}
+
+    async def __aenter__(self) -> "SamClient":
+        ssl_context = ssl.create_default_context(cafile=certifi.where())
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, ssl=ssl_context)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return min(2 ** attempt, self.max_backoff) + random.uniform(0, 1)
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        """
+        GET url with the API key added. Returns (status, parsed JSON or None).
+        Retries 429/5xx and connection errors; other statuses are returned as is.
+        """
+        if self._session is None:
+            raise RuntimeError("SamClient must be used as an async context manager")
+        if not self.api_key:
+            raise RuntimeError("SAM.gov API key not configured")
+        params = dict(params or {})
+        params["api_key"] = self.api_key
+
+        for attempt in range(self.max_retries + 1):
+            if self.max_requests and self.stats["requests"] >= self.max_requests:
+                raise SamQuotaExhausted(f"SAM.gov request budget of {self.max_requests} used up")
+            retry_after = None
+            async with self._semaphore:
+                await self.bucket.acquire()
+                self.stats["requests"] += 1
+                try:
+                    async with self._session.get(url, params=params) as response:
+                        if response.status == 200:
+                            return 200, await response.json(content_type=None)
+                        if response.status not in RETRY_STATUSES:
+                            self.stats["failed"] += 1
+                            logger.error(f"SAM.gov request failed: HTTP {response.status} - {(await response.text())[:300]}")
+                            return response.status, None
+                        status = response.status
+                        retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status = None
+                    logger.warning(f"SAM.gov request error: {e!r}")
+
+            if attempt >= self.max_retries:
+                break
+            delay = self._backoff(attempt, retry_after)
+            self.stats["retries"] += 1
+            if status == 429:
+                self.stats["rate_limited"] += 1
+                self.bucket.pause(delay)
+            logger.warning(f"SAM.gov returned {status or 'a connection error'}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        return status or 0, None
+
+    async def search(self, params: Dict[str, Any]) -> Tuple[int, Any]:
+        return await self.get_json(SAM_SEARCH_URL, params)
+
+    async def fetch_description(self, description_url: str, version: Optional[str] = None) -> str:
+        """
+        Description text for a notice's description URL; '' when it can't be fetched.
+        With a cache, a fresh entry for the same version is returned without a request.
+        """
+        if not description_url:
+            return ""
+        if self.cache is not None:
+            cached = self.cache.get(description_url, version=version)
+            # Empty entries (written before empty bodies were rejected) count as misses
+            if cached:
+                self.stats["cache_hits"] += 1
+                return cached
+        try:
+            status, data = await self.get_json(description_url)
+        except SamQuotaExhausted as e:
+            logger.warning(str(e))
+            return ""
+        except Exception as e:
+            logger.error(f"Error fetching description from SAM.gov: {str(e)}")
+            return ""
+        if status != 200 or not isinstance(data, dict):
+            return ""
+        description = data.get("description", "") or ""
+        # An empty body is not cached, so the next run asks again
+        if self.cache is not None and description:
+            self.cache.put(description_url, description, version=version)
+        return description
+
+    async def fetch_descriptions(
+        self,
+        description_urls: Sequence[Optional[str]],
+        versions: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[str]:
+        """Fetch many descriptions concurrently; result order matches the input, identical URLs fetched once."""
+        versions = versions or [None] * len(description_urls)
+        unique: Dict[str, Optional[str]] = {}
+        for url, version in zip(description_urls, versions):
+            if url:
+                unique.setdefault(url, version)
+        fetched = await asyncio.gather(*(self.fetch_description(u, v) for u, v in unique.items()))
+        by_url = dict(zip(unique, fetched))
+        logger.info(
+            f"Fetched {sum(1 for d in fetched if d)}/{len(unique)} descriptions "
+            f"({self.stats['cache_hits']} from cache, {self.stats['requests']} requests, "
+            f"{self.stats['rate_limited']} rate-limited, {self.stats['failed']} failed)"
+        )
+        return [by_url.get(u, "") if u else "" for u in description_urls]
@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import threading
+from typing import Dict, Optional
+
+try:
+    from app.utils.logger import get_logger
+except ImportError:
+    from utils.logger import get_logger
+
+try:
+    from app.config.settings import (
+        EMBEDDING_MODEL, EMBEDDING_MMAP_WEIGHTS, EMBEDDING_WEIGHTS_CACHE_DIR,
+        EMBEDDING_BACKEND, EMBEDDING_ONNX_QUANTIZE, EMBEDDING_ONNX_THREADS,
+    )
+except ImportError:
+    from config.settings import (
+        EMBEDDING_MODEL, EMBEDDING_MMAP_WEIGHTS, EMBEDDING_WEIGHTS_CACHE_DIR,
+        EMBEDDING_BACKEND, EMBEDDING_ONNX_QUANTIZE, EMBEDDING_ONNX_THREADS,
+    )
+
+logger = get_logger(__name__)
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+WARMUP_TEXT = "cybersecurity services for federal agencies"
+
+_model = None
+_model_lock = threading.Lock()
+_metrics: Dict[str, Optional[float]] = {
+    "model_name": None,
+    "backend": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "rss_before_load_mb": None,
+    "rss_after_load_mb": None,
+    "weights_mb": None,
+    "mmap_weights": False,
+    "loaded_pid": None,
+}
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MiB (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except Exception:
+        return None
+
+
+def _mmap_weights_path(model_name: str) -> str:
+    safe_name = model_name.replace("/", "__")
+    return os.path.join(EMBEDDING_WEIGHTS_CACHE_DIR, f"{safe_name}.pt")
+
+
+def _attach_mmap_weights(model, model_name: str) -> bool:
+    """
+    Swap the model's parameters for tensors backed by an mmapped weights file.
+
+    File-backed pages live in the OS page cache, so every worker that maps the same
+    file (forked or not) shares one physical copy instead of holding its own.
+    The file is written once from the freshly loaded model on first use.
+    """
+    import torch
+
+    path = _mmap_weights_path(model_name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(model.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote mmap-able weights for {model_name} to {path}")
+
+    # safetensors' loader copies tensors out of its mapping; torch's mmap loader keeps them file-backed
+    state_dict = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+    return True
+
+
+def _load_onnx_model(model_name: str, rss_before: Optional[float], start: float):
+    try:
+        from app.utils.onnx_encoder import load_onnx_encoder
+    except ImportError:
+        from utils.onnx_encoder import load_onnx_encoder
+
+    model = load_onnx_encoder(
+        model_name,
+        EMBEDDING_WEIGHTS_CACHE_DIR,
+        quantized=EMBEDDING_ONNX_QUANTIZE,
+        intra_op_threads=EMBEDDING_ONNX_THREADS,
+    )
+    _metrics.update({
+        "model_name": model_name,
+        "backend": "onnx-int8" if EMBEDDING_ONNX_QUANTIZE else "onnx",
+        "load_seconds": round(time.perf_counter() - start, 3),
+        "rss_before_load_mb": rss_before,
+        "rss_after_load_mb": current_rss_mb(),
+        "mmap_weights": False,
+        "loaded_pid": os.getpid(),
+    })
+    logger.info(
+        f"Loaded ONNX embedding model {model_name} ({_metrics['backend']}) in {_metrics['load_seconds']}s "
+        f"(rss {_metrics['rss_after_load_mb']} MiB)"
+    )
+    return model
+
+
+def _load_model():
+    model_name = EMBEDDING_MODEL or DEFAULT_MODEL_NAME
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            return _load_onnx_model(model_name, rss_before, start)
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable for {model_name}, falling back to torch: {e}")
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+
+    mmap_weights = False
+    if EMBEDDING_MMAP_WEIGHTS:
+        try:
+            mmap_weights = _attach_mmap_weights(model, model_name)
+        except Exception as e:
+            logger.warning(f"Falling back to in-memory weights for {model_name}: {e}")
+
+    weights_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    _metrics.update({
+        "model_name": model_name,
+        "backend": "torch",
+        "load_seconds": round(time.perf_counter() - start, 3),
+        "rss_before_load_mb": rss_before,
+        "rss_after_load_mb": current_rss_mb(),
+        "weights_mb": round(weights_bytes / (1024 * 1024), 1),
+        "mmap_weights": mmap_weights,
+        "loaded_pid": os.getpid(),
+    })
+    logger.info(
+        f"Loaded embedding model {model_name} in {_metrics['load_seconds']}s "
+        f"(weights {_metrics['weights_mb']} MiB, mmap={mmap_weights}, rss {_metrics['rss_after_load_mb']} MiB)"
+    )
+    return model
+
+
+def get_model():
+    """Return the process-wide sentence transformer, loading it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _load_model()
+    return _model
+
+
+def preload_model(warmup: bool = True):
+    """
+    Load the model ahead of the first request and run one warm-up encode so the
+    first user does not pay for lazy initialisation of the tokenizer and kernels.
+    """
+    model = get_model()
+    if warmup and _metrics["warmup_seconds"] is None:
+        start = time.perf_counter()
+        model.encode(WARMUP_TEXT)
+        _metrics["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Embedding model warm-up encode took {_metrics['warmup_seconds']}s")
+    return model
+
+
+def get_model_metrics() -> Dict[str, Optional[float]]:
+    """Load/warm-up timings and memory figures for the embedding model in this process."""
+    metrics = dict(_metrics)
+    metrics["loaded"] = _model is not None
+    metrics["pid"] = os.getpid()
+    metrics["rss_mb"] = current_rss_mb()
+    return metrics
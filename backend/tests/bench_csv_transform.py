@@ -0,0 +1,90 @@
+"""
+Row-by-row (iterrows + process_csv_row) vs column-wise (transform_csv_frame)
+CSV transformation on a synthetic extract.
+
+Usage (from backend/):
+    python -m tests.bench_csv_transform --rows 50000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from app.services.cron.csv_import_sam_gov import (
+    ALLOWED_NAICS_CODES,
+    CSV_USECOLS,
+    process_csv_row,
+    transform_csv_frame,
+)
+
+
+def write_fixture(path, rows, seed=7):
+    rng = random.Random(seed)
+    naics = ALLOWED_NAICS_CODES + ["561720", "236220", "336411"]
+    records = []
+    for i in range(rows):
+        contact = rng.random() < 0.8
+        records.append({
+            "NoticeId": f"{i:032x}",
+            "Sol#": f"SOL-{i}",
+            "Title": f"Opportunity {i} " + "x" * rng.randint(10, 300),
+            "Department/Ind.Agency": "DEPT OF DEFENSE.DEPT OF THE ARMY",
+            "Sub-Tier": "DEPT OF THE ARMY",
+            "NaicsCode": rng.choice(naics),
+            "PostedDate": f"2025-09-{rng.randint(1, 28):02d} 22:48:51.482-04",
+            "ResponseDeadLine": f"2025-10-{rng.randint(1, 28):02d}T17:00:00-04:00",
+            "Description": "Lorem ipsum dolor sit amet. " * rng.randint(1, 20),
+            "Active": rng.choice(["Yes", "No"]),
+            "PrimaryContactTitle": "Contracting Officer" if contact else None,
+            "PrimaryContactFullname": "Jane Doe" if contact else None,
+            "PrimaryContactEmail": "jane.doe@example.gov" if contact else None,
+            "PrimaryContactPhone": "555-0100" if contact else None,
+            "PrimaryContactFax": None,
+            "SecondaryContactTitle": None,
+            "SecondaryContactFullname": "John Roe" if rng.random() < 0.3 else None,
+            "SecondaryContactEmail": None,
+            "SecondaryContactPhone": None,
+            "SecondaryContactFax": None,
+        })
+    pd.DataFrame(records, columns=CSV_USECOLS).to_csv(path, index=False)
+
+
+def row_by_row(df):
+    out = []
+    for _, row in df.iterrows():
+        processed = process_csv_row(row.to_dict())
+        if processed:
+            out.append(processed)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fixture.csv")
+        write_fixture(path, args.rows)
+        df = pd.read_csv(path, dtype=str)
+
+    start = time.perf_counter()
+    slow = row_by_row(df)
+    slow_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = transform_csv_frame(df)
+    fast_s = time.perf_counter() - start
+
+    assert fast == slow, "column-wise transform diverged from process_csv_row"
+    print(f"rows={len(df)} kept={len(fast)}")
+    print(f"iterrows + process_csv_row: {slow_s:.2f}s")
+    print(f"transform_csv_frame:        {fast_s:.2f}s")
+    print(f"speedup: {slow_s / fast_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
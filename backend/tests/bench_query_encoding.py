@@ -0,0 +1,62 @@
+"""
+Per-query encode latency and memory for the torch and ONNX int8 embedding backends.
+
+Usage (from backend/):
+    python -m tests.bench_query_encoding --runs 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.utils.onnx_encoder import load_onnx_encoder
+from app.utils.sentence_transformer import current_rss_mb
+
+QUERIES = [
+    "cybersecurity",
+    "web development",
+    "cloud migration services for the Department of Defense",
+    "zero trust architecture assessment",
+    "data analytics and machine learning platform",
+]
+
+
+def bench(name, model, runs):
+    for q in QUERIES:  # warm-up
+        model.encode(q)
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        model.encode(QUERIES[i % len(QUERIES)])
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(
+        f"{name:10s} p50={statistics.median(timings):7.2f}ms "
+        f"p95={timings[int(len(timings) * 0.95) - 1]:7.2f}ms "
+        f"mean={statistics.mean(timings):7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query encoding backends")
+    parser.add_argument("--model", default=os.getenv("EMBEDDINGMODELBIZ") or "all-MiniLM-L6-v2")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rss_start = current_rss_mb()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        onnx_model = load_onnx_encoder(args.model, cache_dir, quantized=True)
+        rss_onnx = current_rss_mb()
+        bench("onnx-int8", onnx_model, args.runs)
+
+        from sentence_transformers import SentenceTransformer
+        torch_model = SentenceTransformer(args.model, device="cpu")
+        rss_torch = current_rss_mb()
+        bench("torch", torch_model, args.runs)
+
+    print(f"RSS: start={rss_start}MiB after onnx={rss_onnx}MiB after torch={rss_torch}MiB")
+
+
+if __name__ == "__main__":
+    main()
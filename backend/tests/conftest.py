@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Set before any test imports a module that creates a file logger, so test runs
+# don't write app.log / csv_importer.log into the tree
+os.environ.setdefault("LOG_DIR_BIZ", tempfile.mkdtemp(prefix="bizradar-test-logs-"))
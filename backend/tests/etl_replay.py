@@ -0,0 +1,492 @@
+"""
+Record/replay fixtures for running the ETL jobs offline.
+
+A recording is a directory of upstream responses:
+
+    manifest.json                       naics codes, notice count, origin
+    sam/search/<naics>/<offset>.json    SAM.gov search pages
+    sam/noticedesc/<notice_id>.json     SAM.gov description responses
+    freelancer/<page>.html              Freelancer listing pages
+    ContractOpportunitiesFullCSV.csv    CSV extract sample
+
+ReplayServer serves a recording over HTTP together with a fake OpenAI API
+(chat completions and embeddings) that answers after a configurable latency and
+counts every call, so a job pointed at it via SAM_SEARCH_URL, FREELANCER_BASE_URL
+and OPENAI_BASE_URL runs end to end with no network access.
+
+Usage (from backend/):
+    python -m tests.etl_replay synth --out /tmp/etl-recording --notices 2000
+    python -m tests.etl_replay record --out /tmp/etl-recording --days 7 --max-notices 500 \\
+        --csv-source ContractOpportunitiesFullCSV.csv
+    python -m tests.etl_replay serve --recording /tmp/etl-recording --openai-latency-ms 400
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import os
+import random
+import struct
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SAM_ORIGIN = "https://api.sam.gov"
+SEARCH_PATH = "/prod/opportunities/v2/search"
+NOTICEDESC_PATH = "/prod/opportunities/v1/noticedesc"
+FREELANCER_PATH = "/freelancer"
+FREELANCER_ORIGIN = "https://www.freelancer.com/search/projects?projectLanguages=en&projectSkills=305&page="
+CSV_NAME = "ContractOpportunitiesFullCSV.csv"
+
+# NAICS codes the sam_gov and CSV jobs keep
+NAICS_CODES = ["541512", "541611", "541519", "541715", "518210"]
+PAGE_SIZE = 1000
+EMBEDDING_DIMENSIONS = 1536
+
+# Extract columns the CSV import reads
+CSV_COLUMNS = [
+    "NoticeId", "Sol#", "Title", "Department/Ind.Agency", "Sub-Tier", "NaicsCode",
+    "PostedDate", "ResponseDeadLine", "Description", "Active",
+    "PrimaryContactTitle", "PrimaryContactFullname", "PrimaryContactEmail",
+    "PrimaryContactPhone", "PrimaryContactFax",
+    "SecondaryContactTitle", "SecondaryContactFullname", "SecondaryContactEmail",
+    "SecondaryContactPhone", "SecondaryContactFax",
+]
+
+FREELANCER_CARD = """
+<div class="JobSearchCard-item">
+  <div class="JobSearchCard-primary">
+    <a class="JobSearchCard-primary-heading-link" href="/projects/python/{slug}">{title}</a>
+    <span class="JobSearchCard-primary-heading-days">{days} days left</span>
+    <p class="JobSearchCard-primary-description">{details}</p>
+    <a class="JobSearchCard-primary-tagsLink" href="#">Python</a>
+    <a class="JobSearchCard-primary-tagsLink" href="#">Web Scraping</a>
+  </div>
+  <div class="JobSearchCard-secondary-price">${price} <span>Avg Bid</span></div>
+  <div class="JobSearchCard-secondary-entry">{bids} <span>Bids</span></div>
+</div>
+"""
+
+
+def _write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def load_manifest(recording_dir):
+    with open(os.path.join(recording_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def synthesize(out_dir, notices=2000, freelancer_pages=10, cards_per_page=20, seed=7):
+    """Write a deterministic synthetic recording; deadlines are in the future so every job keeps the rows."""
+    rng = random.Random(seed)
+    today = date.today()
+    by_naics = {code: [] for code in NAICS_CODES}
+    csv_rows = []
+
+    for i in range(notices):
+        notice_id = f"{i:032x}"
+        naics = NAICS_CODES[i % len(NAICS_CODES)]
+        posted = today - timedelta(days=rng.randint(0, 60))
+        deadline = today + timedelta(days=rng.randint(1, 90))
+        department = rng.choice([
+            "DEPT OF DEFENSE.DEPT OF THE ARMY.AMC",
+            "HOMELAND SECURITY, DEPARTMENT OF.US CUSTOMS AND BORDER PROTECTION",
+            "VETERANS AFFAIRS, DEPARTMENT OF.VETERANS AFFAIRS, DEPARTMENT OF",
+        ])
+        title = f"Opportunity {i} " + rng.choice(["cloud migration", "IT support", "data analytics", "cyber"])
+        description = " ".join(
+            rng.choice(["Contractor shall provide", "services for", "the Government", "including", "support",
+                        "software", "maintenance", "per the PWS.", "Offerors must", "be registered in SAM."])
+            for _ in range(rng.randint(40, 400))
+        )
+        contact = {
+            "type": "primary", "title": "Contracting Officer", "fullName": f"Officer {i % 97}",
+            "email": f"officer{i % 97}@example.gov", "phone": "555-0100", "fax": None,
+        }
+        by_naics[naics].append({
+            "noticeId": notice_id,
+            "title": title,
+            "solicitationNumber": f"SOL-{i}",
+            "fullParentPathName": department,
+            "postedDate": posted.isoformat(),
+            "type": "Solicitation",
+            "naicsCode": naics,
+            "responseDeadLine": f"{deadline.isoformat()}T17:00:00-04:00",
+            "active": "Yes",
+            "description": f"{SAM_ORIGIN}{NOTICEDESC_PATH}?noticeid={notice_id}",
+            "pointOfContact": [contact],
+            "uiLink": f"https://sam.gov/opp/{notice_id}/view",
+        })
+        _write_json(os.path.join(out_dir, "sam", "noticedesc", f"{notice_id}.json"), {"description": description})
+        csv_rows.append({
+            "NoticeId": notice_id,
+            "Sol#": f"SOL-{i}",
+            "Title": title,
+            "Department/Ind.Agency": department.split(".")[0],
+            "Sub-Tier": ".".join(department.split(".")[1:]),
+            "NaicsCode": naics,
+            "PostedDate": f"{posted.isoformat()} 10:00:00.000-04",
+            "ResponseDeadLine": f"{deadline.isoformat()}T17:00:00-04:00",
+            "Description": description,
+            "Active": "Yes",
+            "PrimaryContactTitle": contact["title"],
+            "PrimaryContactFullname": contact["fullName"],
+            "PrimaryContactEmail": contact["email"],
+            "PrimaryContactPhone": contact["phone"],
+        })
+
+    for naics, opportunities in by_naics.items():
+        for offset in range(0, max(len(opportunities), 1), PAGE_SIZE):
+            page = opportunities[offset:offset + PAGE_SIZE]
+            _write_json(
+                os.path.join(out_dir, "sam", "search", naics, f"{offset}.json"),
+                {"totalRecords": len(opportunities), "limit": PAGE_SIZE, "offset": offset, "opportunitiesData": page},
+            )
+
+    with open(os.path.join(out_dir, CSV_NAME), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(csv_rows)
+
+    os.makedirs(os.path.join(out_dir, "freelancer"), exist_ok=True)
+    for page in range(1, freelancer_pages + 1):
+        cards = "".join(
+            FREELANCER_CARD.format(
+                slug=f"job-{page}-{n}", title=f"scrape tender data {page}-{n}", days=rng.randint(1, 7),
+                details="Need a scraper for public tenders. " * rng.randint(1, 5),
+                price=rng.randint(30, 1500), bids=rng.randint(0, 80),
+            )
+            for n in range(cards_per_page)
+        )
+        with open(os.path.join(out_dir, "freelancer", f"{page}.html"), "w", encoding="utf-8") as f:
+            f.write(f"<html><body>{cards}</body></html>")
+
+    _write_json(os.path.join(out_dir, "manifest.json"), {
+        "origin": "synthetic",
+        "created_at": datetime.utcnow().isoformat(),
+        "naics": NAICS_CODES,
+        "notices": notices,
+        "freelancer_pages": freelancer_pages,
+    })
+    return out_dir
+
+
+async def _record_sam(out_dir, naics_codes, days, max_notices):
+    # Imported here so synth/serve work without the app's dependencies
+    from app.utils.sam_client import SamClient
+
+    posted_to = date.today()
+    posted_from = posted_to - timedelta(days=days)
+    notices = []
+    async with SamClient() as sam:
+        for naics in naics_codes:
+            offset = 0
+            while True:
+                status, data = await sam.search({
+                    "ncode": naics,
+                    "postedFrom": posted_from.strftime("%m/%d/%Y"),
+                    "postedTo": posted_to.strftime("%m/%d/%Y"),
+                    "limit": PAGE_SIZE,
+                    "offset": offset,
+                    "ptype": "o,k,p,r,s",
+                })
+                if status != 200 or not isinstance(data, dict):
+                    raise RuntimeError(f"SAM.gov search failed for NAICS {naics} (offset {offset}): HTTP {status}")
+                page = data.get("opportunitiesData", [])
+                if max_notices:
+                    page = page[:max(0, max_notices - len(notices))]
+                    data["opportunitiesData"] = page
+                _write_json(os.path.join(out_dir, "sam", "search", naics, f"{offset}.json"), data)
+                notices.extend(page)
+                if len(page) < PAGE_SIZE or (max_notices and len(notices) >= max_notices):
+                    break
+                offset += PAGE_SIZE
+
+        urls = [opp.get("description") for opp in notices]
+        descriptions = await sam.fetch_descriptions(urls)
+    for opp, description in zip(notices, descriptions):
+        if opp.get("noticeId") and opp.get("description"):
+            _write_json(
+                os.path.join(out_dir, "sam", "noticedesc", f"{opp['noticeId']}.json"), {"description": description}
+            )
+    return len(notices)
+
+
+async def _record_freelancer(out_dir, pages):
+    import aiohttp
+
+    os.makedirs(os.path.join(out_dir, "freelancer"), exist_ok=True)
+    async with aiohttp.ClientSession(headers={"User-Agent": "Mozilla/5.0"}) as session:
+        for page in range(1, pages + 1):
+            async with session.get(f"{FREELANCER_ORIGIN}{page}") as response:
+                response.raise_for_status()
+                body = await response.text()
+            with open(os.path.join(out_dir, "freelancer", f"{page}.html"), "w", encoding="utf-8") as f:
+                f.write(body)
+            await asyncio.sleep(1)
+
+
+def _record_csv(out_dir, csv_source, rows):
+    from app.services.cron.csv_import_sam_gov import iter_filtered_csv
+
+    written = 0
+    with open(os.path.join(out_dir, CSV_NAME), "w", encoding="utf-8", newline="") as f:
+        for chunk in iter_filtered_csv(csv_source):
+            chunk = chunk.iloc[:rows - written]
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += len(chunk)
+            if written >= rows:
+                break
+    return written
+
+
+def record(out_dir, naics_codes=NAICS_CODES, days=7, max_notices=None, freelancer_pages=10,
+           csv_source=None, csv_rows=5000):
+    """Capture live SAM.gov pages and descriptions, Freelancer pages and a filtered CSV sample (needs SAMAPIKEY)."""
+    notices = asyncio.run(_record_sam(out_dir, naics_codes, days, max_notices))
+    if freelancer_pages:
+        asyncio.run(_record_freelancer(out_dir, freelancer_pages))
+    csv_written = _record_csv(out_dir, csv_source, csv_rows) if csv_source else 0
+    _write_json(os.path.join(out_dir, "manifest.json"), {
+        "origin": "recorded",
+        "created_at": datetime.utcnow().isoformat(),
+        "naics": list(naics_codes),
+        "notices": notices,
+        "freelancer_pages": freelancer_pages,
+        "csv_rows": csv_written,
+    })
+    return out_dir
+
+
+def _fake_summary(text):
+    digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+    due = date.today() + timedelta(days=int(digest[:2], 16) % 90 + 1)
+    return {"summary": {
+        "sponsor": "Replay Agency",
+        "objective": f"Deliver the services described in notice {digest[:8]}.",
+        "goal": "Provide the requested capability on schedule.",
+        "eligibility": "Registered in SAM; small business set-aside.",
+        "key_facts": "Firm fixed price; base year plus options.",
+        "due_date": due.isoformat(),
+        "budget": f"${int(digest[2:6], 16) * 100:,}",
+    }}
+
+
+def _fake_vector(text, dimensions):
+    rng = random.Random(hashlib.md5(text.encode("utf-8")).digest())
+    return [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    server_version = "ETLReplay"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _file(self, *parts):
+        path = os.path.join(self.server.recording_dir, *parts)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        replay = self.server.replay
+        if url.path == SEARCH_PATH:
+            replay.count("sam_search")
+            replay.sleep(replay.sam_latency)
+            body = self._file("sam", "search", params.get("ncode", ""), f"{int(params.get('offset', 0))}.json")
+            if body is None:
+                body = json.dumps({"totalRecords": 0, "opportunitiesData": []})
+            # Description links must come back to this server
+            self._send(200, body.replace(SAM_ORIGIN, replay.base_url))
+        elif url.path == NOTICEDESC_PATH:
+            replay.count("sam_description")
+            replay.sleep(replay.sam_latency)
+            body = self._file("sam", "noticedesc", f"{params.get('noticeid', '')}.json")
+            self._send(200, body) if body is not None else self._send(404, '{"error": "not recorded"}')
+        elif url.path == FREELANCER_PATH:
+            replay.count("freelancer_page")
+            body = self._file("freelancer", f"{int(params.get('page', 0))}.html")
+            self._send(200, body or "<html><body></body></html>", "text/html")
+        else:
+            self._send(404, '{"error": "unknown path"}')
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        replay = self.server.replay
+        path = urlsplit(self.path).path
+        if path.endswith("/chat/completions"):
+            replay.count("openai_chat")
+            replay.sleep(replay.openai_latency)
+            prompt = request["messages"][-1]["content"]
+            self._send(200, json.dumps({
+                "id": f"chatcmpl-replay-{replay.counts['openai_chat']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "replay"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": json.dumps(_fake_summary(prompt))},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 120,
+                          "total_tokens": len(prompt) // 4 + 120},
+            }))
+        elif path.endswith("/embeddings"):
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            replay.count("openai_embeddings")
+            replay.count("openai_embedding_inputs", len(inputs))
+            replay.sleep(replay.openai_latency)
+            dimensions = request.get("dimensions") or EMBEDDING_DIMENSIONS
+            data = []
+            for i, text in enumerate(inputs):
+                vector = _fake_vector(str(text), dimensions)
+                if request.get("encoding_format") == "base64":
+                    vector = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+            self._send(200, json.dumps({
+                "object": "list", "data": data, "model": request.get("model", "replay"),
+                "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+            }))
+        else:
+            self._send(404, '{"error": "unknown path"}')
+
+
+class ReplayServer:
+    """
+    Serve a recording and a fake OpenAI API on localhost.
+
+        with ReplayServer(recording_dir, openai_latency_ms=400) as replay:
+            env = replay.env()
+            ...
+            replay.snapshot()  # {"sam_search": 5, "openai_chat": 2000, ...}
+
+    Latencies are drawn uniformly from [latency, latency + jitter] per request.
+    """
+
+    def __init__(self, recording_dir, openai_latency_ms=0, openai_jitter_ms=0, sam_latency_ms=0, port=0):
+        self.recording_dir = recording_dir
+        self.openai_latency = (openai_latency_ms / 1000, openai_jitter_ms / 1000)
+        self.sam_latency = (sam_latency_ms / 1000, 0.0)
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _ReplayHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.recording_dir = recording_dir
+        self._httpd.replay = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    @staticmethod
+    def sleep(latency):
+        base, jitter = latency
+        if base or jitter:
+            time.sleep(base + random.uniform(0, jitter))
+
+    def env(self):
+        """Environment that points the jobs at this server instead of the live services."""
+        return {
+            "SAM_SEARCH_URL": f"{self.base_url}{SEARCH_PATH}",
+            "SAMAPIKEY": "replay",
+            "FREELANCER_BASE_URL": f"{self.base_url}{FREELANCER_PATH}?page=",
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAIAPIKEYBIZ": "replay",
+            "OPENAI_API_KEY": "replay",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    synth = sub.add_parser("synth", help="Write a synthetic recording")
+    synth.add_argument("--out", required=True)
+    synth.add_argument("--notices", type=int, default=2000)
+    synth.add_argument("--freelancer-pages", type=int, default=10)
+
+    rec = sub.add_parser("record", help="Record live SAM.gov/Freelancer responses (needs SAMAPIKEY)")
+    rec.add_argument("--out", required=True)
+    rec.add_argument("--naics", default=",".join(NAICS_CODES))
+    rec.add_argument("--days", type=int, default=7)
+    rec.add_argument("--max-notices", type=int)
+    rec.add_argument("--freelancer-pages", type=int, default=10)
+    rec.add_argument("--csv-source", help="Full SAM.gov extract to sample the CSV fixture from")
+    rec.add_argument("--csv-rows", type=int, default=5000)
+
+    serve = sub.add_parser("serve", help="Serve a recording until interrupted")
+    serve.add_argument("--recording", required=True)
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--openai-latency-ms", type=float, default=0)
+    serve.add_argument("--openai-jitter-ms", type=float, default=0)
+    serve.add_argument("--sam-latency-ms", type=float, default=0)
+
+    args = parser.parse_args()
+    if args.command == "synth":
+        synthesize(args.out, notices=args.notices, freelancer_pages=args.freelancer_pages)
+        print(f"Wrote synthetic recording to {args.out}")
+    elif args.command == "record":
+        naics = [c.strip() for c in args.naics.split(",") if c.strip()]
+        record(args.out, naics, args.days, args.max_notices, args.freelancer_pages, args.csv_source, args.csv_rows)
+        print(f"Wrote recording to {args.out}")
+    else:
+        with ReplayServer(args.recording, args.openai_latency_ms, args.openai_jitter_ms,
+                          args.sam_latency_ms, port=args.port) as replay:
+            for key, value in replay.env().items():
+                print(f"export {key}={value}")
+            try:
+                while True:
+                    time.sleep(60)
+            except KeyboardInterrupt:
+                print(json.dumps(replay.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+-- Tables the ETL jobs write, for a throwaway local Postgres used by tests/bench_etl.py.
+-- Mirrors supabase/migrations (base tables from 20250902193716 plus the 202610* ETL
+-- migrations) without the Supabase roles, RLS and unrelated tables, and adds the
+-- embedding columns that exist in production. Needs pgvector.
+CREATE EXTENSION IF NOT EXISTS vector;
+
+DROP TABLE IF EXISTS ai_enhanced_opportunities, ai_enhanced_opportunities_history,
+    sam_gov, sam_gov_history, etl_history, freelancer_data_table, sam_sync_state CASCADE;
+DROP SEQUENCE IF EXISTS sam_gov_id_seq, etl_history_id_seq, freelancer_data_table_id_seq;
+
+CREATE SEQUENCE sam_gov_id_seq;
+CREATE SEQUENCE etl_history_id_seq;
+CREATE SEQUENCE freelancer_data_table_id_seq;
+
+CREATE TABLE ai_enhanced_opportunities (
+    id integer PRIMARY KEY DEFAULT nextval('sam_gov_id_seq'),
+    notice_id varchar(100) UNIQUE,
+    solicitation_number varchar(100),
+    title varchar(255) NOT NULL,
+    department varchar(255),
+    naics_code integer,
+    published_date date,
+    response_date date,
+    description text,
+    url varchar(512),
+    active boolean DEFAULT true,
+    created_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    additional_description text,
+    sub_departments text,
+    point_of_contact json,
+    expected_outcome varchar,
+    funding text,
+    key_facts varchar,
+    eligibility varchar,
+    objective varchar,
+    due_date date,
+    description_hash text,
+    row_hash text,
+    embedding_text text,
+    embedding vector(1536),
+    embedding_model text,
+    embedding_version integer,
+    embedding_attempts integer NOT NULL DEFAULT 0,
+    embedding_last_error text,
+    embedding_last_attempt_at timestamptz,
+    embedding_quarantined_at timestamptz
+);
+
+CREATE INDEX idx_ai_enhanced_opportunities_embedding_queue
+    ON ai_enhanced_opportunities (id)
+    WHERE embedding IS NULL AND embedding_quarantined_at IS NULL;
+
+CREATE TABLE ai_enhanced_opportunities_history (
+    id integer PRIMARY KEY,
+    notice_id varchar(100),
+    solicitation_number varchar(100),
+    title varchar(255) NOT NULL,
+    department varchar(255),
+    naics_code integer,
+    published_date date,
+    response_date date,
+    description text,
+    url varchar(512),
+    active boolean DEFAULT true,
+    created_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    additional_description text,
+    archived_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    archived_by varchar(100) DEFAULT 'system',
+    sub_departments text,
+    point_of_contact json,
+    expected_outcome varchar,
+    funding text,
+    key_facts varchar,
+    eligibility varchar,
+    objective varchar,
+    due_date date
+);
+
+CREATE TABLE sam_gov (
+    id integer PRIMARY KEY DEFAULT nextval('sam_gov_id_seq'),
+    notice_id varchar(100) UNIQUE,
+    solicitation_number varchar(100),
+    title varchar(255) NOT NULL,
+    department varchar(255),
+    naics_code integer,
+    published_date date,
+    response_date date,
+    description text,
+    url varchar(512),
+    active boolean DEFAULT true,
+    created_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    additional_description text,
+    sub_departments text[],
+    contact_info text,
+    row_hash text
+);
+
+CREATE TABLE sam_gov_history (
+    id integer PRIMARY KEY,
+    notice_id varchar(100),
+    solicitation_number varchar(100),
+    title varchar(255) NOT NULL,
+    department varchar(255),
+    naics_code integer,
+    published_date date,
+    response_date date,
+    description text,
+    url varchar(512),
+    active boolean DEFAULT true,
+    created_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    updated_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    additional_description text,
+    archived_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    archived_by varchar(100) DEFAULT 'system'
+);
+
+CREATE TABLE etl_history (
+    id integer PRIMARY KEY DEFAULT nextval('etl_history_id_seq'),
+    time_fetched timestamp DEFAULT CURRENT_TIMESTAMP,
+    total_records integer DEFAULT 0,
+    sam_gov_count integer DEFAULT 0,
+    sam_gov_new_count integer DEFAULT 0,
+    freelancer_count integer DEFAULT 0,
+    freelancer_new_count integer DEFAULT 0,
+    status varchar(50),
+    created_at timestamp DEFAULT CURRENT_TIMESTAMP,
+    trigger_type varchar(20) DEFAULT 'manual',
+    pipeline_metrics jsonb
+);
+
+CREATE TABLE freelancer_data_table (
+    id integer PRIMARY KEY DEFAULT nextval('freelancer_data_table_id_seq'),
+    job_url text UNIQUE,
+    title text,
+    published_date text,
+    skills_required text,
+    price_budget text,
+    bids_so_far text,
+    additional_details text,
+    record_id text,
+    trigger_type text
+);
+
+CREATE TABLE sam_sync_state (
+    source text NOT NULL,
+    naics_code text NOT NULL,
+    last_posted_to date NOT NULL,
+    max_posted_date date,
+    updated_at timestamptz NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source, naics_code)
+);
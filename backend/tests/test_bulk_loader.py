@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+# Postgres with pgvector, e.g. the pgvector/pgvector image; the schema is recreated
+DB_URL = os.environ.get("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DB_URL, reason="TEST_DATABASE_URL not set")
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay", "schema.sql")
+
+
+@pytest.fixture
+def conn():
+    connection = psycopg2.connect(DB_URL)
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        schema = f.read()
+    with connection, connection.cursor() as cursor:
+        cursor.execute(schema)
+    yield connection
+    connection.close()
+
+
+def _row(notice_id):
+    return {
+        "notice_id": notice_id, "solicitation_number": f"SOL-{notice_id}", "title": f"Notice {notice_id}",
+        "department": "DOD", "naics_code": 541511, "published_date": "2026-10-01",
+        "response_date": "2026-11-01", "description": "Build a portal", "url": "https://sam.gov", "active": True,
+    }
+
+
+def _active(conn, notice_id):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT active FROM ai_enhanced_opportunities WHERE notice_id = %s", (notice_id,))
+        return cursor.fetchone()[0]
+
+
+def test_deactivated_notice_is_reactivated_when_it_returns(conn):
+    from app.services.cron.bulk_loader import bulk_upsert_opportunities, deactivate_missing_opportunities
+
+    bulk_upsert_opportunities([_row("A"), _row("B")], connection=conn)
+    assert deactivate_missing_opportunities(["A"], connection=conn)["marked_inactive"] == 1
+    assert _active(conn, "B") is False
+
+    result = bulk_upsert_opportunities([_row("A"), _row("B")], connection=conn)
+
+    assert result["replaced"] == 1
+    assert _active(conn, "B") is True
+    assert bulk_upsert_opportunities([_row("A"), _row("B")], connection=conn)["inserted"] == 0
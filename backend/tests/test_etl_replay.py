@@ -0,0 +1,79 @@
+import asyncio
+import base64
+import json
+import struct
+import urllib.request
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from tests.etl_replay import ReplayServer, load_manifest, synthesize
+
+
+@pytest.fixture
+def replay(tmp_path):
+    synthesize(str(tmp_path), notices=12, freelancer_pages=2, cards_per_page=3)
+    with ReplayServer(str(tmp_path)) as server:
+        yield server
+
+
+def _post(replay, path, payload):
+    request = urllib.request.Request(
+        f"{replay.base_url}{path}", data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def test_sam_pages_and_descriptions_replay(replay, tmp_path, monkeypatch):
+    from app.utils.sam_client import SamClient
+
+    manifest = load_manifest(str(tmp_path))
+    naics = manifest["naics"][0]
+    search_url = replay.env()["SAM_SEARCH_URL"]
+
+    async def fetch():
+        async with SamClient(api_key="replay", rate_per_second=100, burst=10) as sam:
+            status, data = await sam.get_json(search_url, {"ncode": naics, "offset": 0})
+            opportunities = data["opportunitiesData"]
+            descriptions = await sam.fetch_descriptions([o["description"] for o in opportunities])
+            _, empty = await sam.get_json(search_url, {"ncode": naics, "offset": 1000})
+            return status, opportunities, descriptions, empty
+
+    status, opportunities, descriptions, empty = asyncio.run(fetch())
+
+    assert status == 200
+    assert len(opportunities) == 12 // len(manifest["naics"]) + 1
+    assert all(o["description"].startswith(replay.base_url) for o in opportunities)
+    assert all(descriptions)
+    assert empty["opportunitiesData"] == []
+    assert replay.snapshot() == {"sam_search": 2, "sam_description": len(opportunities)}
+
+
+def test_fake_openai_chat_and_embeddings(replay):
+    chat = _post(replay, "/v1/chat/completions", {
+        "model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "description: build a portal"}],
+    })
+    summary = json.loads(chat["choices"][0]["message"]["content"])
+    assert set(summary["summary"]) >= {"objective", "goal", "eligibility", "key_facts", "due_date", "budget"}
+
+    floats = _post(replay, "/v1/embeddings", {"model": "m", "input": ["a", "b"], "dimensions": 8})
+    packed = _post(replay, "/v1/embeddings", {"model": "m", "input": "a", "dimensions": 8, "encoding_format": "base64"})
+
+    assert [d["index"] for d in floats["data"]] == [0, 1]
+    decoded = struct.unpack("<8f", base64.b64decode(packed["data"][0]["embedding"]))
+    assert decoded == pytest.approx(floats["data"][0]["embedding"], rel=1e-6)
+    assert replay.snapshot() == {"openai_chat": 1, "openai_embeddings": 2, "openai_embedding_inputs": 3}
+
+
+def test_freelancer_pages_replay(replay):
+    for module in ("lxml", "pandas", "psycopg2"):
+        pytest.importorskip(module)
+    from app.services.cron.freelancer import parse_listing_page
+
+    url = replay.env()["FREELANCER_BASE_URL"]
+    with urllib.request.urlopen(f"{url}1") as response:
+        assert len(parse_listing_page(response.read().decode())) == 3
+    with urllib.request.urlopen(f"{url}3") as response:
+        assert parse_listing_page(response.read().decode()) == []
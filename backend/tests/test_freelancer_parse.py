@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("aiohttp")
+pytest.importorskip("pandas")
+pytest.importorskip("psycopg2")
+
+from app.services.cron.freelancer import parse_listing_page, process_data
+
+PAGE = """
+<html><body>
+<div class="JobSearchCard-item ">
+  <div class="JobSearchCard-primary">
+    <a class="JobSearchCard-primary-heading-link" href="/projects/python/scrape-gov-data">
+      scrape gov data
+    </a>
+    <span class="JobSearchCard-primary-heading-days">6 days left</span>
+    <p class="JobSearchCard-primary-description">Need a   scraper
+      for public   tenders.</p>
+    <a class="JobSearchCard-primary-tagsLink" href="#">Python</a>
+    <a class="JobSearchCard-primary-tagsLink" href="#">Web Scraping</a>
+  </div>
+  <div class="JobSearchCard-secondary-price">$250 <span>Avg Bid</span></div>
+  <div class="JobSearchCard-secondary-entry">14 <span>Bids</span></div>
+</div>
+<div class="JobSearchCard-item">
+  <span class="JobSearchCard-primary-heading-days">3 hours left</span>
+</div>
+<div class="JobSearchCard-item-other"></div>
+</body></html>
+"""
+
+
+def test_parse_listing_page_extracts_cards():
+    projects = parse_listing_page(PAGE)
+
+    assert len(projects) == 2
+    first, second = projects
+    assert first == {
+        "Job URL": "https://www.freelancer.com/projects/python/scrape-gov-data",
+        "Title": "scrape gov data",
+        "Published Date": "6 days left",
+        "Skills Required": "Python, Web Scraping",
+        "Price/Budget": "$250",
+        "Bids so Far": "14",
+        "Additional Details": "Need a scraper for public tenders.",
+    }
+    assert second["Job URL"] is None
+    assert second["Price/Budget"] == "No Price"
+    assert second["Skills Required"] == "No Skills Listed"
+
+
+def test_parse_listing_page_empty():
+    assert parse_listing_page("") == []
+    assert parse_listing_page("<html><body><p>No results</p></body></html>") == []
+
+
+def test_process_data_cleans_numeric_columns():
+    df = process_data(parse_listing_page(PAGE))
+
+    assert df.loc[0, "Price/Budget"] == 250.0
+    assert df.loc[0, "Bids so Far"] == 14.0
+    assert df.loc[0, "Hours Left"] == 144
+    assert df.loc[0, "Title"] == "Scrape Gov Data"
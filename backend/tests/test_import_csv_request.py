@@ -0,0 +1,59 @@
+import csv
+import io
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("psycopg2")
+
+from app.utils.import_csv_request import ChunkStream, clean_chunk, iter_csv_blocks
+
+NAN = float("nan")
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1 << 20, -1])
+def test_chunk_stream_reads_blocks_in_order(size):
+    blocks = ["abc", "", "defgh", "i"]
+    stream = ChunkStream(blocks)
+
+    out = []
+    while True:
+        piece = stream.read(size)
+        if not piece:
+            break
+        assert size < 0 or len(piece) <= size
+        out.append(piece)
+
+    assert "".join(out) == "abcdefghi"
+    assert stream.read(size) == ""
+
+
+def test_clean_chunk_counts_and_sanitises():
+    chunk = pd.DataFrame({
+        "NoticeId": [" a1 ", NAN, "  ", "b2", "c3", "d4"],
+        "Description": ["first", "orphan", "no id", NAN, "   ", "nul\x00byte"],
+    })
+    skipped = {"empty_notice_id": 0, "empty_description": 0}
+
+    cleaned = clean_chunk(chunk, skipped)
+
+    assert cleaned["NoticeId"].tolist() == ["a1", "d4"]
+    assert cleaned["Description"].tolist() == ["first", "nulbyte"]
+    assert skipped == {"empty_notice_id": 3, "empty_description": 1}
+
+
+def test_iter_csv_blocks_round_trips_through_csv():
+    chunks = [
+        pd.DataFrame({"NoticeId": ["a1"], "Description": ['quote " and, comma\nnewline']}),
+        pd.DataFrame({"NoticeId": [NAN], "Description": ["dropped"]}, dtype=object),
+        pd.DataFrame({"NoticeId": ["b2"], "Description": ["plain"]}),
+    ]
+    skipped = {"empty_notice_id": 0, "empty_description": 0}
+    stats = {"rows_read": 0, "rows_staged": 0}
+
+    payload = ChunkStream(iter_csv_blocks(chunks, skipped, stats)).read()
+    rows = list(csv.reader(io.StringIO(payload)))
+
+    assert rows == [["a1", 'quote " and, comma\nnewline'], ["b2", "plain"]]
+    assert stats == {"rows_read": 3, "rows_staged": 2}
+    assert skipped["empty_notice_id"] == 1
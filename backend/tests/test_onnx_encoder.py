@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+import numpy as np
+
+from sentence_transformers import SentenceTransformer
+from app.utils.onnx_encoder import load_onnx_encoder
+
+MODEL_NAME = os.getenv("EMBEDDINGMODELBIZ") or "all-MiniLM-L6-v2"
+# int8 dynamic quantization keeps query embeddings within this cosine of the fp32 model
+MIN_COSINE = 0.98
+
+
+@pytest.fixture(scope="module")
+def queries():
+    return [
+        "cybersecurity",
+        "web development",
+        "cloud migration services for the Department of Defense",
+        "zero trust architecture assessment",
+        "NAICS 541512 computer systems design",
+        "data analytics and machine learning platform",
+        "help desk and IT service management support",
+        "penetration testing and vulnerability scanning",
+        "small business set-aside software modernization",
+        "FedRAMP authorized SaaS for records management",
+    ]
+
+
+@pytest.fixture(scope="module")
+def torch_model():
+    return SentenceTransformer(MODEL_NAME, device="cpu")
+
+
+@pytest.fixture(scope="module")
+def onnx_model():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        yield load_onnx_encoder(MODEL_NAME, cache_dir, quantized=True)
+
+
+def _cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_onnx_int8_matches_torch(queries, torch_model, onnx_model):
+    expected = torch_model.encode(queries)
+    actual = onnx_model.encode(queries)
+    assert actual.shape == expected.shape
+    cosines = [_cosine(a, b) for a, b in zip(actual, expected)]
+    assert min(cosines) >= MIN_COSINE, f"Lowest cosine agreement {min(cosines):.4f}"
+
+
+def test_onnx_single_query_matches_batch(queries, onnx_model):
+    single = onnx_model.encode(queries[2])
+    batch = onnx_model.encode(queries)
+    assert single.ndim == 1
+    assert _cosine(single, batch[2]) > 0.9999
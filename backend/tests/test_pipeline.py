@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.services.cron.pipeline import Pipeline, PipelineError, Stage, _percentile
+
+
+def _run(pipeline, source, **kwargs):
+    return asyncio.run(pipeline.run(source, **kwargs))
+
+
+def test_stages_fan_out_batch_and_count(tmp_path):
+    batches = []
+
+    async def fetch(page):
+        await asyncio.sleep(0)
+        return [f"{page}-{i}" for i in range(3)]
+
+    def load(rows):
+        batches.append(len(rows))
+        return rows
+
+    pipeline = Pipeline("test", [
+        Stage("fetch", fetch, workers=3, fan_out=True),
+        Stage("upper", str.upper, workers=2),
+        Stage("load", load, batch_size=4),
+    ], checkpoint_dir=str(tmp_path))
+    summary = _run(pipeline, range(5), collect=True)
+
+    assert summary["status"] == "success"
+    assert summary["records_in"] == 5
+    assert summary["records_out"] == 15
+    assert sorted(summary["outputs"]) == sorted(f"{p}-{i}".upper() for p in range(5) for i in range(3))
+    assert sum(batches) == 15 and max(batches) <= 4
+    stages = summary["stages"]
+    assert list(stages) == ["source", "fetch", "upper", "load"]
+    assert (stages["fetch"]["records_in"], stages["fetch"]["records_out"]) == (5, 15)
+    assert stages["upper"]["calls"] == 15
+    assert stages["load"]["calls"] == len(batches)
+    assert all(stage["finished"] for stage in stages.values())
+
+
+def test_none_drops_and_skip_errors():
+    def check(n):
+        if n == 3:
+            raise ValueError("bad row")
+        return n if n % 2 else None
+
+    pipeline = Pipeline("test", [Stage("check", check, on_error="skip")], checkpoint_dir=None)
+    summary = _run(pipeline, [1, 2, 3, 4, 5], collect=True)
+
+    assert summary["outputs"] == [1, 5]
+    assert summary["stages"]["check"]["errors"] == 1
+
+
+def test_failure_raises_with_summary(tmp_path):
+    def boom(n):
+        if n == 2:
+            raise RuntimeError("stage broke")
+        return n
+
+    pipeline = Pipeline("test", [Stage("boom", boom)], queue_size=1, checkpoint_dir=str(tmp_path))
+    with pytest.raises(PipelineError) as excinfo:
+        _run(pipeline, range(100))
+
+    assert excinfo.value.summary["status"] == "failed"
+    assert "stage broke" in excinfo.value.summary["error"]
+    assert (tmp_path / "test").is_dir()
+
+
+def test_resume_skips_finished_keys(tmp_path):
+    seen = []
+
+    def work(item):
+        seen.append(item["id"])
+        if item["id"] == "c" and len(seen) < 4:
+            raise RuntimeError("interrupted")
+        return item
+
+    def make():
+        return Pipeline("resume", [Stage("work", work, skip_done=True)],
+                        key=lambda item: item["id"], checkpoint_dir=str(tmp_path))
+
+    items = [{"id": k} for k in "abcd"]
+    with pytest.raises(PipelineError):
+        _run(make(), items, run_id="r1")
+    assert seen == ["a", "b", "c"]
+
+    summary = _run(make(), items, run_id="r1", resume=True)
+
+    assert seen[3:] == ["c", "d"]
+    assert summary["resumed_items"] == 2
+    assert summary["stages"]["work"]["skipped_done"] == 2
+    assert summary["records_out"] == 2
+
+
+def test_blocking_iterator_source():
+    def gen():
+        yield from range(3)
+
+    pipeline = Pipeline("test", [Stage("double", lambda n: n * 2)], checkpoint_dir=None)
+    summary = _run(pipeline, gen(), collect=True)
+
+    assert summary["outputs"] == [0, 2, 4]
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert _percentile(values, 50) == 50.0
+    assert _percentile(values, 95) == 95.0
+    assert _percentile([], 95) == 0.0
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from app.utils.ranged_download import DownloadError, download_file
+
+PAYLOAD = os.urandom(300_000) + b"tail"
+CHUNK = 64 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "TestServer"
+
+    def log_message(self, *args):
+        pass
+
+    def _common_headers(self, body_len):
+        state = self.server.state
+        if state["ranges"]:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(body_len))
+        self.send_header("ETag", state["etag"])
+        self.send_header("Last-Modified", "Mon, 01 Sep 2025 00:00:00 GMT")
+
+    def do_HEAD(self):
+        self.server.state["requests"].append(("HEAD", None))
+        self.send_response(200)
+        self._common_headers(len(self.server.state["body"]))
+        self.end_headers()
+
+    def do_GET(self):
+        state = self.server.state
+        body = state["body"]
+        range_header = self.headers.get("Range")
+        self.server.state["requests"].append(("GET", range_header))
+        match = re.match(r"bytes=(\d+)-(\d+)", range_header or "")
+        if_range = self.headers.get("If-Range")
+        if state["ranges"] and match and (if_range is None or if_range == state["etag"]):
+            start, end = int(match.group(1)), int(match.group(2))
+            if state["fail_ranges"] and start in state["fail_ranges"]:
+                state["fail_ranges"].discard(start)
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            chunk = body[start:end + 1]
+            if state["corrupt"]:
+                chunk = bytes(len(chunk))
+            self.send_response(206)
+            self._common_headers(len(chunk))
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+            self.end_headers()
+            self.wfile.write(chunk)
+            return
+        self.send_response(200)
+        self._common_headers(len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.state = {
+        "body": PAYLOAD,
+        "etag": '"v1"',
+        "ranges": True,
+        "corrupt": False,
+        "fail_ranges": set(),
+        "requests": [],
+    }
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}/ContractOpportunitiesFullCSV.csv"
+
+
+def _range_gets(httpd):
+    return [r for method, r in httpd.state["requests"] if method == "GET"]
+
+
+def test_parallel_download_and_unchanged_skip(server, tmp_path):
+    dest = str(tmp_path / "extract.csv")
+    sha = hashlib.sha256(PAYLOAD).hexdigest()
+
+    result = download_file(_url(server), dest, workers=4, chunk_size=CHUNK, expected_sha256=sha)
+
+    assert result["status"] == "downloaded"
+    assert result["chunks_fetched"] == 5
+    assert open(dest, "rb").read() == PAYLOAD
+    assert all(r and r.startswith("bytes=") for r in _range_gets(server))
+    assert not os.path.exists(dest + ".part")
+
+    server.state["requests"].clear()
+    again = download_file(_url(server), dest, workers=4, chunk_size=CHUNK)
+
+    assert again["status"] == "unchanged"
+    assert again["sha256"] == sha
+    assert _range_gets(server) == []
+
+    server.state["etag"] = '"v2"'
+    changed = download_file(_url(server), dest, workers=4, chunk_size=CHUNK)
+    assert changed["status"] == "downloaded"
+
+
+def test_resume_fetches_only_missing_chunks(server, tmp_path):
+    dest = str(tmp_path / "extract.csv")
+    server.state["fail_ranges"] = {CHUNK * 2}
+
+    with pytest.raises(DownloadError):
+        download_file(_url(server), dest, workers=2, chunk_size=CHUNK, max_retries=0)
+
+    state = json.load(open(dest + ".download.json"))
+    assert state["complete"] is False
+    assert 2 not in state["done"]
+    already = len(state["done"])
+
+    server.state["requests"].clear()
+    result = download_file(_url(server), dest, workers=2, chunk_size=CHUNK)
+
+    assert result["chunks_fetched"] == 5 - already
+    assert len(_range_gets(server)) == 5 - already
+    assert open(dest, "rb").read() == PAYLOAD
+
+
+def test_retry_recovers_from_transient_errors(server, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.utils.ranged_download.time.sleep", lambda s: None)
+    dest = str(tmp_path / "extract.csv")
+    server.state["fail_ranges"] = {0, CHUNK * 3}
+
+    result = download_file(_url(server), dest, workers=3, chunk_size=CHUNK, max_retries=2)
+
+    assert result["status"] == "downloaded"
+    assert open(dest, "rb").read() == PAYLOAD
+
+
+def test_checksum_mismatch_discards_file(server, tmp_path):
+    dest = str(tmp_path / "extract.csv")
+    server.state["corrupt"] = True
+
+    with pytest.raises(DownloadError, match="SHA-256"):
+        download_file(
+            _url(server), dest, chunk_size=CHUNK,
+            expected_sha256=hashlib.sha256(PAYLOAD).hexdigest(),
+        )
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".download.json")
+
+
+def test_file_changing_mid_download_is_rejected(server, tmp_path):
+    dest = str(tmp_path / "extract.csv")
+    original = _Handler.do_HEAD
+
+    def head_then_change(handler):
+        original(handler)
+        server.state["etag"] = '"v2"'
+
+    _Handler.do_HEAD = head_then_change
+    try:
+        with pytest.raises(DownloadError, match="changed"):
+            download_file(_url(server), dest, chunk_size=CHUNK, max_retries=0)
+    finally:
+        _Handler.do_HEAD = original
+
+
+def test_falls_back_to_single_stream_without_ranges(server, tmp_path):
+    dest = str(tmp_path / "extract.csv")
+    server.state["ranges"] = False
+
+    result = download_file(_url(server), dest, chunk_size=CHUNK)
+
+    assert result["chunks_fetched"] == 1
+    assert _range_gets(server) == [None]
+    assert open(dest, "rb").read() == PAYLOAD
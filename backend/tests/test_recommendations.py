@@ -0,0 +1,147 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+
+from app.services.recommendations import generate_recommendations
+
+
+class FakeCompletions:
+    """Answers multi-opportunity prompts with one match per opportunityIndex in the prompt."""
+
+    def __init__(self, delay=0.05, drop_index=None):
+        self.delay = delay
+        self.drop_index = drop_index
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        indexes = [int(i) for i in re.findall(r"opportunityIndex: (\d+)", kwargs["messages"][1]["content"])]
+        matches = [
+            {"opportunityIndex": i, "matchScore": 60 + i, "title": f"t{i}", "description": "d", "matchReason": "r",
+             "keyInsights": ["a", "b", "c"], "matchCriteria": []}
+            for i in indexes if i != self.drop_index
+        ]
+        message = SimpleNamespace(content=json.dumps({"matches": matches}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+def test_batches_prompts_with_bounded_concurrency_and_streams_batches():
+    completions = FakeCompletions(drop_index=4)
+    streamed = []
+
+    async def on_batch(recs):
+        streamed.append([r["opportunityIndex"] for r in recs])
+
+    opportunities = [{"id": n, "title": f"Opp {n}", "description": "x"} for n in range(10)]
+    result = asyncio.run(generate_recommendations(
+        "https://example.com", "We build portals", opportunities,
+        opportunities_per_prompt=3, max_concurrency=2, on_batch=on_batch, client=_client(completions),
+    ))
+
+    recs = result["recommendations"]
+    assert len(completions.calls) == 4
+    assert completions.max_in_flight == 2
+    assert all(call["response_format"]["type"] == "json_schema" for call in completions.calls)
+    assert sorted(map(tuple, streamed)) == [(0, 1, 2), (3, 4, 5), (6, 7, 8), (9,)]
+    assert [r["opportunityIndex"] for r in recs] == list(range(10))
+    assert recs[3]["matchScore"] == 63
+    assert recs[4]["title"] == "Fallback Result"
+
+
+def test_callback_error_cancels_remaining_prompts():
+    completions = FakeCompletions()
+
+    class Stop(Exception):
+        pass
+
+    async def on_batch(recs):
+        raise Stop()
+
+    opportunities = [{"id": n, "title": f"Opp {n}"} for n in range(6)]
+    with pytest.raises(Stop):
+        asyncio.run(generate_recommendations(
+            "", "desc", opportunities, opportunities_per_prompt=1, max_concurrency=1,
+            on_batch=on_batch, client=_client(completions),
+        ))
+    assert len(completions.calls) < len(opportunities)
+
+
+class MemoryMatchCache:
+    def __init__(self):
+        self.rows = {}
+
+    def get_many(self, user_id, profile_version, opportunity_ids):
+        return {o: self.rows[(user_id, profile_version, o)] for o in opportunity_ids if (user_id, profile_version, o) in self.rows}
+
+    def put_many(self, user_id, profile_version, entries):
+        for opportunity_id, rec in entries:
+            self.rows[(user_id, profile_version, opportunity_id)] = rec
+
+
+def test_match_cache_scores_only_unscored_pairs_per_profile():
+    completions = FakeCompletions(drop_index=1)
+    cache = MemoryMatchCache()
+    opportunities = [{"id": f"opp-{n}", "title": f"Opp {n}"} for n in range(4)]
+
+    def run(opps, description="We build portals"):
+        return asyncio.run(generate_recommendations(
+            "", description, opps, opportunities_per_prompt=2,
+            client=_client(completions), user_id="user-1", cache=cache,
+        ))["recommendations"]
+
+    run(opportunities[:3])
+    assert len(cache.rows) == 2  # the fallback for opp-1 is not cached
+    assert len(completions.calls) == 2
+
+    recs = run(list(reversed(opportunities)))
+    scored = [int(i) for call in completions.calls[2:]
+              for i in re.findall(r"opportunityIndex: (\d+)", call["messages"][1]["content"])]
+    assert sorted(scored) == [0, 2]  # opp-3 and opp-1, by their new positions
+    assert recs[3]["opportunityIndex"] == 3 and recs[3]["matchScore"] == 60
+    assert recs[1]["id"] == "rec-1" and recs[1]["matchScore"] == 62
+
+    calls = len(completions.calls)
+    run(opportunities[:1], description="We build portals and apps")
+    assert len(completions.calls) == calls + 1
+
+
+def test_unparseable_reply_is_not_cached():
+    class GarbledCompletions:
+        def __init__(self):
+            self.calls = 0
+
+        async def create(self, **kwargs):
+            self.calls += 1
+            message = SimpleNamespace(content="Sorry, I can't produce JSON right now.")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    completions = GarbledCompletions()
+    cache = MemoryMatchCache()
+
+    def run():
+        return asyncio.run(generate_recommendations(
+            "", "We build portals", [{"id": "opp-0", "title": "Opp 0"}], opportunities_per_prompt=1,
+            client=_client(completions), user_id="user-1", cache=cache,
+        ))["recommendations"]
+
+    assert run()[0]["title"] == "Partial Match"
+    assert cache.rows == {}
+    run()
+    assert completions.calls == 2
@@ -0,0 +1,13 @@
+-- Content-addressed embedding cache shared by opportunity imports and profile updates.
+-- content_hash = sha256(model || '\n' || embedding_text)
+CREATE TABLE IF NOT EXISTS public.embedding_cache (
+    content_hash TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    embedding vector(1536) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.embedding_cache ENABLE ROW LEVEL SECURITY;
+
+-- Only the service role (backend jobs and API) reads or writes the cache
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.embedding_cache TO service_role;
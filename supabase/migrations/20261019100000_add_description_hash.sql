@@ -0,0 +1,5 @@
+-- Summary ledger: hash of the summarized description (sha256(model || '\n' || text)).
+-- The CSV import reuses objective/expected_outcome/eligibility/key_facts/due_date/funding
+-- when the hash is unchanged instead of calling the LLM again.
+ALTER TABLE public.ai_enhanced_opportunities
+    ADD COLUMN IF NOT EXISTS description_hash TEXT;
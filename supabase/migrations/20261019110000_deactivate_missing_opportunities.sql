@@ -0,0 +1,27 @@
+-- Anti-join deactivation for the CSV import when it runs without direct DB access:
+-- every active opportunity whose notice_id is not in feed_ids is marked inactive in one statement.
+CREATE OR REPLACE FUNCTION public.deactivate_missing_opportunities(feed_ids TEXT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    IF feed_ids IS NULL OR cardinality(feed_ids) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    UPDATE ai_enhanced_opportunities e
+    SET active = FALSE, updated_at = CURRENT_TIMESTAMP
+    WHERE e.active
+      AND NOT EXISTS (SELECT 1 FROM unnest(feed_ids) AS f(notice_id) WHERE f.notice_id = e.notice_id);
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.deactivate_missing_opportunities(TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.deactivate_missing_opportunities(TEXT[]) TO service_role;
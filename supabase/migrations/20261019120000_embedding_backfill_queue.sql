@@ -0,0 +1,17 @@
+-- Queue state for the embedding backfill worker (services/cron/embedding_backfill.py).
+-- Rows with embedding IS NULL are claimed with FOR UPDATE SKIP LOCKED; after
+-- BACKFILL_MAX_ATTEMPTS failures a row is quarantined and no longer claimed.
+ALTER TABLE public.ai_enhanced_opportunities
+    ADD COLUMN IF NOT EXISTS embedding_attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS embedding_last_error TEXT,
+    ADD COLUMN IF NOT EXISTS embedding_last_attempt_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS embedding_quarantined_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_ai_enhanced_opportunities_embedding_queue
+    ON public.ai_enhanced_opportunities (id)
+    WHERE embedding IS NULL AND embedding_quarantined_at IS NULL;
+
+-- Release quarantined rows for another round, e.g. after fixing the cause:
+--   UPDATE ai_enhanced_opportunities
+--   SET embedding_quarantined_at = NULL, embedding_attempts = 0
+--   WHERE embedding_quarantined_at IS NOT NULL;
@@ -0,0 +1,13 @@
+-- High-water marks for incremental SAM.gov API syncs (services/cron/sync_state.py).
+CREATE TABLE IF NOT EXISTS public.sam_sync_state (
+    source TEXT NOT NULL,
+    naics_code TEXT NOT NULL,
+    last_posted_to DATE NOT NULL,
+    max_posted_date DATE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source, naics_code)
+);
+
+ALTER TABLE public.sam_sync_state ENABLE ROW LEVEL SECURITY;
+
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.sam_sync_state TO service_role;
@@ -0,0 +1,8 @@
+-- Content hash used by the bulk loader (services/cron/bulk_loader.py) to detect changed
+-- rows: md5 of the row's content columns, computed in SQL on the typed values.
+-- Rows written before this column existed are hashed on the fly until next replaced.
+ALTER TABLE public.ai_enhanced_opportunities
+    ADD COLUMN IF NOT EXISTS row_hash TEXT;
+
+ALTER TABLE public.sam_gov
+    ADD COLUMN IF NOT EXISTS row_hash TEXT;
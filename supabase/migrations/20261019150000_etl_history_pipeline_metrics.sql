@@ -0,0 +1,4 @@
+-- Per-stage pipeline metrics (records in/out, errors, p50/p95 latency) written by
+-- services/cron/update_etl_history.record_pipeline_run, keyed by pipeline name.
+ALTER TABLE public.etl_history
+    ADD COLUMN IF NOT EXISTS pipeline_metrics JSONB;
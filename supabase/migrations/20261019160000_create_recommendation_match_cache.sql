@@ -0,0 +1,16 @@
+-- AI match results per user, profile version and opportunity, so a pair already
+-- scored for the current profile is never sent to the LLM again.
+-- profile_hash = sha256 over the profile text the scoring prompt sees
+CREATE TABLE IF NOT EXISTS public.recommendation_match_cache (
+    user_id TEXT NOT NULL,
+    profile_hash TEXT NOT NULL,
+    opportunity_id TEXT NOT NULL,
+    recommendation JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, profile_hash, opportunity_id)
+);
+
+ALTER TABLE public.recommendation_match_cache ENABLE ROW LEVEL SECURITY;
+
+-- Only the service role (backend API) reads or writes the cache
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.recommendation_match_cache TO service_role;
@@ -0,0 +1,29 @@
+-- active is one of the columns row_hash covers (services/cron/bulk_loader.py), so a
+-- deactivated row must drop its stored hash: otherwise a notice that reappears in the
+-- feed stages the same hash as the stored row and is never marked active again.
+-- A NULL row_hash is recomputed on the fly by the loader's change check.
+CREATE OR REPLACE FUNCTION public.deactivate_missing_opportunities(feed_ids TEXT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    IF feed_ids IS NULL OR cardinality(feed_ids) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    UPDATE ai_enhanced_opportunities e
+    SET active = FALSE, row_hash = NULL, updated_at = CURRENT_TIMESTAMP
+    WHERE e.active
+      AND NOT EXISTS (SELECT 1 FROM unnest(feed_ids) AS f(notice_id) WHERE f.notice_id = e.notice_id);
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.deactivate_missing_opportunities(TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.deactivate_missing_opportunities(TEXT[]) TO service_role;